@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+File: benchmark.py
+Purpose: Measure API latency and throughput in-process and fail on regressions against a stored baseline
+Privacy: Runs entirely offline; results are written to local files only.
+
+Usage:
+    python benchmark.py [--model PATH] [--save-baseline] [--tolerance 0.25]
+
+Without --model the app is driven with a stub model that generates at
+fixed, configurable speeds, so the numbers isolate framework, queueing
+and serialization overhead and are comparable across runs and machines.
+With --model a real GGUF is loaded and prefill/decode speed, time to
+first token and peak RSS are recorded as well.
+
+Results are written to benchmarks/latest-<mode>.json and compared with
+benchmarks/baseline.json; the exit status is 1 if any tracked metric is
+worse than the baseline by more than the tolerance. The baseline is local
+to the machine (it is not checked in): the first run of each mode saves
+its results as the baseline instead of comparing.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BENCHMARK_DIR = Path(__file__).resolve().parent / "benchmarks"
+BASELINE_PATH = BENCHMARK_DIR / "baseline.json"
+
+# Around 60 prompt tokens after the system prompt, like a short chat message
+BENCH_PROMPT = (
+    "Summarize the main risks of storing customer records in spreadsheets and suggest three "
+    "practical steps a small office could take this week to reduce them."
+)
+
+# Metrics compared with the baseline: (dotted path in a scenario result, higher is better)
+TRACKED_METRICS = [
+    ("throughput_rps", True),
+    ("latency_ms.p50", False),
+    ("latency_ms.p99", False),
+    ("first_byte_ms.p50", False),
+    ("overhead_ms.p50", False),
+    ("overhead_ms.p99", False),
+    ("prefill_tokens_per_second", True),
+    ("decode_tokens_per_second", True),
+    ("time_to_first_token_ms.p50", False),
+    ("peak_rss_mb", False),
+]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile, or None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def distribution_ms(values: List[float]) -> Optional[Dict[str, float]]:
+    """p50/p90/p99/max of durations in seconds, in milliseconds"""
+    if not values:
+        return None
+    return {
+        name: round(percentile(values, pct) * 1000, 2)
+        for name, pct in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process"""
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return round(peak / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        import psutil
+
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / 1024 ** 2, 1)
+
+
+async def asgi_request(app, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Send one request straight to an ASGI app
+
+    No sockets or HTTP client are involved, so the timings cover only the
+    app: routing, validation, the handler and response serialization.
+    ``first_byte`` is when the first body chunk was sent (for streaming
+    responses, the first generated token).
+    """
+    payload = json.dumps(body).encode("utf-8") if body is not None else b""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("ascii"),
+        "query_string": query.encode("ascii"),
+        "root_path": "",
+        "headers": [
+            (b"host", b"benchmark"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode("ascii")),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    request_sent = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        # The client never disconnects; wait until the response is done
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    status = None
+    first_byte = None
+    parts: List[bytes] = []
+
+    async def send(message):
+        nonlocal status, first_byte
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and message.get("body"):
+            if first_byte is None:
+                first_byte = time.perf_counter()
+            parts.append(message["body"])
+
+    start = time.perf_counter()
+    try:
+        await app(scope, receive, send)
+    finally:
+        finished.set()
+    end = time.perf_counter()
+    return {
+        "status": status,
+        "latency": end - start,
+        "first_byte": (first_byte or end) - start,
+        "body": b"".join(parts),
+    }
+
+
+def _response_metadata(result: Dict[str, Any], stream: bool) -> Optional[Dict[str, Any]]:
+    """Generation metadata from a /generate response body (the final frame when streaming)"""
+    try:
+        if stream:
+            frame = json.loads(result["body"].splitlines()[-1])
+            return frame.get("metadata") if frame.get("type") == "done" else None
+        return json.loads(result["body"]).get("metadata")
+    except (ValueError, IndexError):
+        return None
+
+
+async def run_scenario(
+    app,
+    name: str,
+    method: str,
+    path: str,
+    body: Optional[Dict[str, Any]],
+    requests: int,
+    concurrency: int,
+    stream: bool = False
+) -> Dict[str, Any]:
+    """
+    Send ``requests`` requests from ``concurrency`` closed-loop clients
+
+    Each client sends its next request as soon as the previous one
+    finishes. ``overhead_ms`` is the client-side latency minus the
+    generation time the runner reports: everything the API adds around
+    the model.
+    """
+    results: List[Dict[str, Any]] = []
+    remaining = iter(range(requests))
+
+    async def client():
+        for _ in remaining:
+            results.append(await asgi_request(app, method, path, body))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    ok = [r for r in results if r["status"] == 200]
+    # (result, generation metadata) for successful generations
+    generations = [(r, m) for r, m in ((r, _response_metadata(r, stream)) for r in ok) if m] if body else []
+    metadata = [m for _, m in generations]
+    summary: Dict[str, Any] = {
+        "requests": len(results),
+        "concurrency": concurrency,
+        "errors": sum(r["status"] not in (200, 429) for r in results),
+        "rejected": sum(r["status"] == 429 for r in results),
+        "throughput_rps": round(len(ok) / wall, 2) if wall > 0 else None,
+        "latency_ms": distribution_ms([r["latency"] for r in ok]),
+    }
+    if stream:
+        summary["first_byte_ms"] = distribution_ms([r["first_byte"] for r in ok])
+    if metadata:
+        summary["overhead_ms"] = distribution_ms([max(0.0, r["latency"] - m["timings"]["total"]) for r, m in generations])
+        summary["queue_wait_ms"] = distribution_ms([m["timings"]["queue_wait"] for m in metadata])
+        summary["time_to_first_token_ms"] = distribution_ms([m["timings"]["time_to_first_token"] for m in metadata])
+        for key in ("prefill_tokens_per_second", "decode_tokens_per_second"):
+            rates = [m["timings"][key] for m in metadata if m["timings"].get(key)]
+            summary[key] = round(statistics.median(rates), 2) if rates else None
+    print(f"   {name:<22} {_describe(summary)}")
+    return summary
+
+
+def _describe(summary: Dict[str, Any]) -> str:
+    latency = summary["latency_ms"] or {}
+    parts = [f"p50 {latency.get('p50', 0):>8.1f} ms", f"p99 {latency.get('p99', 0):>8.1f} ms",
+             f"{summary['throughput_rps'] or 0:>7.1f} req/s"]
+    if summary.get("overhead_ms"):
+        parts.append(f"overhead p50 {summary['overhead_ms']['p50']:.2f} ms")
+    if summary["errors"] or summary["rejected"]:
+        parts.append(f"{summary['errors']} errors, {summary['rejected']} rejected")
+    return ", ".join(parts)
+
+
+async def health_under_load(app, generate_body: Dict[str, Any], requests: int, concurrency: int) -> Dict[str, Any]:
+    """Latency of /api/health while ``concurrency`` clients keep the model busy"""
+    stop = False
+
+    async def load():
+        while not stop:
+            await asgi_request(app, "POST", "/api/generate", generate_body)
+
+    loaders = [asyncio.create_task(load()) for _ in range(concurrency)]
+    # Let the queue fill before measuring
+    await asyncio.sleep(0.2)
+    try:
+        return await run_scenario(app, f"health_under_load_c{concurrency}", "GET", "/api/health", None, requests, 1)
+    finally:
+        stop = True
+        await asyncio.gather(*loaders, return_exceptions=True)
+
+
+async def run_benchmarks(app, runner, args) -> Dict[str, Any]:
+    """Run every scenario against ``app`` with ``runner`` registered as the default model"""
+    from dependencies import set_llm_runner
+
+    set_llm_runner(runner)
+    body = {"prompt": BENCH_PROMPT, "max_tokens": args.max_tokens, "bypass_cache": True}
+    scenarios: Dict[str, Any] = {}
+    try:
+        # Untimed requests so lazy initialization is not measured
+        await asgi_request(app, "POST", "/api/generate", body)
+        await asgi_request(app, "GET", "/api/health")
+        scenarios["health_idle"] = await run_scenario(app, "health_idle", "GET", "/api/health", None, args.requests * 5, 1)
+        for concurrency in args.concurrency:
+            name = f"generate_c{concurrency}"
+            scenarios[name] = await run_scenario(
+                app, name, "POST", "/api/generate", body, args.requests * concurrency, concurrency
+            )
+        scenarios["stream_c1"] = await run_scenario(
+            app, "stream_c1", "POST", "/api/generate/stream?format=ndjson", body, args.requests, 1, stream=True
+        )
+        busiest = max(args.concurrency)
+        scenarios[f"health_under_load_c{busiest}"] = await health_under_load(app, body, args.requests * 2, busiest)
+    finally:
+        set_llm_runner(None)
+    return scenarios
+
+
+def _lookup(result: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = result
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value if isinstance(value, (int, float)) else None
+
+
+def compare_to_baseline(
+    scenarios: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.25,
+    slack_ms: float = 5.0
+) -> List[str]:
+    """
+    Tracked metrics that are worse than the baseline
+
+    A metric regresses when it is worse by more than ``tolerance``
+    (relative); millisecond metrics also get ``slack_ms`` of absolute
+    headroom, so sub-millisecond timings do not fail on scheduler noise.
+    Scenarios or metrics missing on either side are skipped.
+
+    Returns:
+        One message per regression (empty if there are none)
+    """
+    regressions = []
+    for name, result in scenarios.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        for path, higher_is_better in TRACKED_METRICS:
+            current, expected = _lookup(result, path), _lookup(reference, path)
+            if current is None or expected is None:
+                continue
+            if higher_is_better:
+                regressed = current < expected * (1 - tolerance)
+            else:
+                slack = slack_ms if path.endswith(("_ms.p50", "_ms.p90", "_ms.p99", "_ms.max")) else 0.0
+                regressed = current > expected * (1 + tolerance) + slack
+            if regressed:
+                regressions.append(f"{name} {path}: {current} (baseline {expected})")
+    return regressions
+
+
+async def _stub_runner(args):
+    from stub_llm import create_stub_runner
+
+    return create_stub_runner(args.prefill_rate, args.decode_rate, max_queue_depth=max(args.concurrency))
+
+
+async def _model_runner(args):
+    from llm_runner import LLMRunner
+
+    runner = LLMRunner(args.model)
+    await runner.initialize(max_retries=1)
+    if not runner.is_initialized:
+        raise RuntimeError(runner.last_error or "Model failed to load")
+    return runner
+
+
+async def benchmark(args) -> Dict[str, Any]:
+    import main
+
+    # Per-request log lines would dominate the output and the timings
+    logging.getLogger().setLevel(logging.WARNING)
+    runner = await (_model_runner(args) if args.model else _stub_runner(args))
+    try:
+        scenarios = await run_benchmarks(main.app, runner, args)
+    finally:
+        await runner.cleanup()
+    if args.model:
+        scenarios["model"] = {"peak_rss_mb": peak_rss_mb()}
+    return scenarios
+
+
+def _parse_concurrency(value: str) -> List[int]:
+    levels = sorted({int(v) for v in value.split(",") if v.strip()})
+    if not levels or levels[0] < 1:
+        raise argparse.ArgumentTypeError("concurrency levels must be positive integers")
+    return levels
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the MONAD API with a stub or real model")
+    parser.add_argument("--model", help="GGUF model to benchmark, a path or a file in the models directory (default: stub model)")
+    parser.add_argument("--requests", type=int, help="Requests per client in each scenario (default 20, 3 with --model)")
+    parser.add_argument("--concurrency", type=_parse_concurrency, help="Comma-separated client counts (default 1,4,8, 1,2 with --model)")
+    parser.add_argument("--max-tokens", type=int, default=32, help="Tokens generated per request")
+    parser.add_argument("--prefill-rate", type=float, default=2000.0, help="Stub prompt speed (tokens/s)")
+    parser.add_argument("--decode-rate", type=float, default=200.0, help="Stub generation speed (tokens/s)")
+    parser.add_argument("--output", type=Path, help="Results file (default benchmarks/latest-<mode>.json)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Baseline to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--slack-ms", type=float, default=5.0, help="Allowed absolute regression of latency percentiles")
+    args = parser.parse_args()
+
+    if args.model and not os.path.exists(args.model):
+        from paths import get_models_dir
+
+        # A bare file name refers to the models directory
+        args.model = str(get_models_dir() / args.model)
+    mode = "model" if args.model else "stub"
+    args.requests = args.requests or (3 if args.model else 20)
+    args.concurrency = args.concurrency or ([1, 2] if args.model else [1, 4, 8])
+
+    print("🚀 MONAD Benchmark")
+    print("=" * 40)
+    if args.model and not os.path.exists(args.model):
+        print(f"❌ Model file not found: {args.model}")
+        return 1
+    print(f"   Mode: {mode}" + (f" ({args.model})" if args.model else
+                                f" (prefill {args.prefill_rate:.0f} tok/s, decode {args.decode_rate:.0f} tok/s)"))
+    print()
+
+    try:
+        scenarios = asyncio.run(benchmark(args))
+    except ImportError as e:
+        print(f"❌ {e}. Install dependencies with: pip install -r requirements.txt")
+        return 1
+
+    report = {
+        "mode": mode,
+        "created_at": datetime.now().isoformat(),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "settings": {
+            "model": args.model,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "max_tokens": args.max_tokens,
+            **({} if args.model else {"prefill_rate": args.prefill_rate, "decode_rate": args.decode_rate}),
+        },
+        "scenarios": scenarios,
+    }
+    output = args.output or BENCHMARK_DIR / f"latest-{mode}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\n📄 Results written to {output}")
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if mode not in baselines and not args.save_baseline:
+        # Timings only compare on the same machine, so the first run sets the baseline
+        print(f"⚠️ No {mode} baseline in {args.baseline} yet")
+        args.save_baseline = True
+    if args.save_baseline:
+        baselines[mode] = report
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(baselines, indent=2) + "\n")
+        print(f"✅ Saved as the {mode} baseline in {args.baseline}")
+        return 0
+
+    if baselines[mode]["machine"]["cpus"] != report["machine"]["cpus"]:
+        print("⚠️ CPU count differs from the baseline's; run with --save-baseline on this machine")
+    if baselines[mode]["settings"] != report["settings"]:
+        print("⚠️ Settings differ from the baseline's; comparison may not be meaningful")
+    regressions = compare_to_baseline(scenarios, baselines[mode]["scenarios"], args.tolerance, args.slack_ms)
+    if regressions:
+        print(f"\n❌ {len(regressions)} metrics regressed beyond {args.tolerance:.0%}:")
+        for regression in regressions:
+            print(f"   {regression}")
+        return 1
+    print(f"\n✅ No regressions against the baseline ({args.tolerance:.0%} tolerance)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+File: calibrate.py
+Purpose: Benchmark thread counts and batch sizes on this machine and write a tuning profile
+Privacy: Runs entirely offline; the profile is written to the local app data directory.
+
+Usage:
+    python calibrate.py [--model PATH] [--dry-run]
+
+The profile supplies defaults for MODEL_N_THREADS, MODEL_N_THREADS_BATCH,
+MODEL_N_BATCH, MODEL_N_UBATCH and CONTEXT_LENGTH; environment variables
+still override it.
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from tuning import detect_hardware, save_profile
+
+# Plain prose so the tokenizer produces typical text tokens
+BENCH_TEXT = (
+    "The quick brown fox jumps over the lazy dog while the committee reviews the quarterly "
+    "report, discusses budget allocations, and plans the next release of the offline assistant. "
+)
+BENCH_CONTEXT = 2048
+BATCH_SIZES = (128, 256, 512, 1024)
+# RAM left for the OS and other applications when sizing the context window
+HEADROOM_BYTES = int(1.5 * 1024 ** 3)
+MAX_CONTEXT = 32768
+MIN_CONTEXT = 2048
+
+
+def thread_candidates(hardware: Dict[str, Any]) -> List[int]:
+    """Thread counts worth measuring: half the cores, physical, performance and logical cores"""
+    physical = hardware["physical_cores"]
+    logical = hardware["logical_cores"]
+    counts = {max(1, physical // 2), physical, logical}
+    if hardware.get("performance_cores"):
+        counts.add(hardware["performance_cores"])
+    return sorted(c for c in counts if 1 <= c <= logical)
+
+
+def bench(model_path: str, n_threads: int, n_threads_batch: int, n_batch: int,
+          prompt_tokens: int, decode_tokens: int) -> Dict[str, Any]:
+    """Measure prefill and single-token decode throughput for one configuration"""
+    from llama_cpp import Llama
+
+    llm = Llama(
+        model_path=model_path,
+        n_ctx=BENCH_CONTEXT,
+        n_threads=n_threads,
+        n_threads_batch=n_threads_batch,
+        n_batch=n_batch,
+        n_ubatch=n_batch,
+        verbose=False,
+        n_gpu_layers=0,
+    )
+    text_tokens = llm.tokenize(BENCH_TEXT.encode("utf-8"), add_bos=False)
+    tokens = (text_tokens * (prompt_tokens // len(text_tokens) + 1))[:prompt_tokens]
+
+    # Untimed pass so page faults and buffer allocation are not measured
+    llm.reset()
+    llm.eval(tokens[:16])
+
+    llm.reset()
+    start = time.perf_counter()
+    llm.eval(tokens)
+    prefill = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for token in tokens[:decode_tokens]:
+        llm.eval([token])
+    decode = time.perf_counter() - start
+
+    metadata = dict(getattr(llm, "metadata", None) or {})
+    del llm
+    return {
+        "n_threads": n_threads,
+        "n_threads_batch": n_threads_batch,
+        "n_batch": n_batch,
+        "prefill_tokens_per_second": round(len(tokens) / prefill, 2),
+        "decode_tokens_per_second": round(decode_tokens / decode, 2),
+        "metadata": metadata,
+    }
+
+
+def recommended_context(model_path: str, metadata: Dict[str, str], hardware: Dict[str, Any]) -> Optional[int]:
+    """Largest power-of-two context whose f16 KV cache fits in the RAM left after the weights"""
+    arch = metadata.get("general.architecture")
+    try:
+        n_layer = int(metadata[f"{arch}.block_count"])
+        n_embd = int(metadata[f"{arch}.embedding_length"])
+        n_head = int(metadata[f"{arch}.attention.head_count"])
+        n_head_kv = int(metadata.get(f"{arch}.attention.head_count_kv", n_head))
+        trained = int(metadata.get(f"{arch}.context_length", MAX_CONTEXT))
+    except (KeyError, ValueError, ZeroDivisionError):
+        return None
+
+    kv_bytes_per_token = 2 * n_layer * (n_embd // n_head * n_head_kv) * 2
+    free = hardware["memory_available_gb"] * 1024 ** 3 - os.path.getsize(model_path) - HEADROOM_BYTES
+    context = MIN_CONTEXT
+    while context * 2 <= min(trained, MAX_CONTEXT) and context * 2 * kv_bytes_per_token <= free:
+        context *= 2
+    return context
+
+
+def calibrate(model_path: str, prompt_tokens: int, decode_tokens: int) -> Dict[str, Any]:
+    """Run the benchmark sweep and return a tuning profile"""
+    hardware = detect_hardware()
+    print(f"🖥️  {hardware['physical_cores']} physical / {hardware['logical_cores']} logical cores"
+          f" ({hardware['performance_cores'] or 'unknown'} performance),"
+          f" {hardware['memory_available_gb']:.1f} of {hardware['memory_total_gb']:.1f} GB RAM available")
+
+    results = []
+
+    print("\n🧵 Sweeping thread counts (n_batch=512)...")
+    for threads in thread_candidates(hardware):
+        result = bench(model_path, threads, threads, 512, prompt_tokens, decode_tokens)
+        results.append(result)
+        print(f"   {threads:>3} threads: prefill {result['prefill_tokens_per_second']:>8.1f} tok/s,"
+              f" decode {result['decode_tokens_per_second']:>6.2f} tok/s")
+
+    n_threads = max(results, key=lambda r: r["decode_tokens_per_second"])["n_threads"]
+    n_threads_batch = max(results, key=lambda r: r["prefill_tokens_per_second"])["n_threads_batch"]
+
+    print(f"\n📦 Sweeping n_batch (threads={n_threads}, batch threads={n_threads_batch})...")
+    batch_results = []
+    for n_batch in BATCH_SIZES:
+        result = bench(model_path, n_threads, n_threads_batch, n_batch, prompt_tokens, decode_tokens)
+        batch_results.append(result)
+        print(f"   n_batch {n_batch:>5}: prefill {result['prefill_tokens_per_second']:>8.1f} tok/s")
+    results.extend(batch_results)
+    n_batch = max(batch_results, key=lambda r: r["prefill_tokens_per_second"])["n_batch"]
+
+    profile = {
+        "created_at": datetime.now().isoformat(),
+        "model_path": model_path,
+        "hardware": hardware,
+        "n_threads": n_threads,
+        "n_threads_batch": n_threads_batch,
+        "n_batch": n_batch,
+        "n_ubatch": n_batch,
+        "results": [{k: v for k, v in r.items() if k != "metadata"} for r in results],
+    }
+    context = recommended_context(model_path, results[0]["metadata"], hardware)
+    if context:
+        profile["context_size"] = context
+    return profile
+
+
+def main() -> int:
+    """Calibrate and write the profile"""
+    load_dotenv()
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Tune llama.cpp thread counts and batch size for this machine")
+    parser.add_argument("--model", default=Config.MODEL_PATH, help="GGUF model to benchmark")
+    parser.add_argument("--prompt-tokens", type=int, default=256, help="Prompt length for the prefill benchmark")
+    parser.add_argument("--decode-tokens", type=int, default=32, help="Tokens timed in the decode benchmark")
+    parser.add_argument("--dry-run", action="store_true", help="Print the profile without saving it")
+    args = parser.parse_args()
+
+    print("🚀 MONAD Hardware Calibration")
+    print("=" * 40)
+
+    if not os.path.exists(args.model):
+        print(f"❌ Model file not found: {args.model}")
+        print("   Please download the model following MODEL_SETUP.md instructions")
+        return 1
+
+    try:
+        profile = calibrate(args.model, args.prompt_tokens, args.decode_tokens)
+    except ImportError:
+        print("❌ llama_cpp is not installed. Install it with: pip install -r requirements.txt")
+        return 1
+
+    print("\n" + "=" * 40)
+    print("📊 Tuned settings")
+    print("=" * 40)
+    for key in ("n_threads", "n_threads_batch", "n_batch", "n_ubatch", "context_size"):
+        if key in profile:
+            print(f"   {key}: {profile[key]}")
+
+    if args.dry_run:
+        print("\n(dry run, profile not saved)")
+        return 0
+
+    path = save_profile(profile)
+    print(f"\n✅ Profile written to {path}")
+    print("   Restart the backend to apply it. Environment variables still take precedence.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
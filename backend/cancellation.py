@@ -0,0 +1,49 @@
+"""
+File: cancellation.py
+Purpose: Cooperative cancellation and deadlines for generation requests
+"""
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+# Stop reasons reported for generations that ended early; their partial output is never cached
+CANCEL_REASONS = ("cancelled", "deadline")
+
+
+class CancelToken:
+    """
+    Flag checked by the inference thread between generated tokens
+
+    Set from the event loop with ``cancel()`` (e.g. when the client
+    disconnects) or implicitly once ``timeout_ms`` has elapsed since the
+    token was created. A token with a ``parent`` is also cancelled when
+    the parent is.
+    """
+
+    def __init__(self, timeout_ms: Optional[int] = None, parent: Optional["CancelToken"] = None):
+        self._event = threading.Event()
+        self.deadline = time.monotonic() + timeout_ms / 1000 if timeout_ms else None
+        self.parent = parent
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def reason(self) -> Optional[str]:
+        """``cancelled``, ``deadline`` or None while generation may continue"""
+        if self._event.is_set():
+            return "cancelled"
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return "deadline"
+        return self.parent.reason if self.parent else None
+
+
+async def cancel_on_disconnect(request, token: CancelToken, interval: float = 0.25):
+    """Cancel ``token`` once the HTTP client behind ``request`` has gone away"""
+    while token.reason is None:
+        if await request.is_disconnected():
+            token.cancel()
+            return
+        await asyncio.sleep(interval)
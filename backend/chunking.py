@@ -0,0 +1,63 @@
+"""
+File: chunking.py
+Purpose: Split extracted context text into overlapping chunks for retrieval
+"""
+
+import re
+from typing import List, NamedTuple
+
+# Break points, best first: paragraph, line, sentence end, then any whitespace
+_BREAKS = [re.compile(r"\n\s*\n"), re.compile(r"\n"), re.compile(r"[.!?]\s"), re.compile(r"\s")]
+
+
+class Chunk(NamedTuple):
+    """A span of a document's text; ``start`` is its character offset"""
+    index: int
+    start: int
+    text: str
+
+
+def _break_point(text: str, start: int, end: int, min_end: int) -> int:
+    """Last natural break in text[min_end:end], or ``end`` if there is none"""
+    window = text[min_end:end]
+    for pattern in _BREAKS:
+        matches = list(pattern.finditer(window))
+        if matches:
+            return min_end + matches[-1].end()
+    return end
+
+
+def chunk_text(text: str, max_chars: int = 1200, overlap: int = 200) -> List[Chunk]:
+    """
+    Split ``text`` into chunks of at most ``max_chars`` characters
+
+    Chunks end at the best available break (paragraph, line, sentence,
+    word) in their second half, and each chunk after the first starts
+    ``overlap`` characters before the previous one ended, so a passage cut
+    at a boundary still appears whole in one of the two chunks.
+    Whitespace-only chunks are skipped.
+    """
+    if max_chars <= 0:
+        raise ValueError("max_chars must be positive")
+    overlap = max(0, min(overlap, max_chars // 2))
+
+    chunks: List[Chunk] = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + max_chars, length)
+        if end < length:
+            end = _break_point(text, start, end, start + max_chars // 2)
+        piece = text[start:end]
+        if piece.strip():
+            chunks.append(Chunk(len(chunks), start, piece))
+        if end >= length:
+            break
+        next_start = end - overlap
+        if overlap:
+            # Start the overlap on a word boundary
+            space = re.search(r"\s", text[next_start:end])
+            if space:
+                next_start += space.end()
+        start = max(next_start, start + 1)
+    return chunks
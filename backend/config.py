@@ -6,16 +6,18 @@ Purpose: Configuration settings for MONAD backend
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-from paths import get_models_dir, get_app_data_dir, ensure_app_dirs
+from paths import get_models_dir
+from tuning import load_profile, resolve_affinity
 
 # Load environment variables
 load_dotenv()
 
+SPECULATIVE_MODES = ("off", "prompt_lookup", "draft_model")
+
 class Config:
     """Configuration class for MONAD backend"""
     
-    # Model configuration
-    ensure_app_dirs()
+    # Model configuration (directories are created at startup, not on import)
     _models_dir = get_models_dir()
     MODEL_FILENAME = "phi-3-medium-128k-instruct-q4_k_m.gguf"
     _env_model = os.getenv("MODEL_PATH")
@@ -24,8 +26,35 @@ class Config:
         MODEL_PATH = str(_model_candidate if _model_candidate.is_absolute() else _models_dir / _model_candidate)
     else:
         MODEL_PATH = str(_models_dir / MODEL_FILENAME)
-    MODEL_CONTEXT_SIZE = int(os.getenv("CONTEXT_LENGTH", "4096"))
-    MODEL_N_THREADS = int(os.getenv("MODEL_N_THREADS", "4"))
+    # Machine-specific defaults measured by calibrate.py; environment variables still win
+    _profile = load_profile()
+    MODEL_CONTEXT_SIZE = int(os.getenv("CONTEXT_LENGTH", str(_profile.get("context_size", 4096))))
+    MODEL_N_THREADS = int(os.getenv("MODEL_N_THREADS", str(_profile.get("n_threads", 4))))
+    # Threads for prompt evaluation, which keeps scaling past the physical core count
+    MODEL_N_THREADS_BATCH = int(os.getenv("MODEL_N_THREADS_BATCH", str(_profile.get("n_threads_batch", MODEL_N_THREADS))))
+    # Pin the inference thread: empty = no pinning, "auto" = profiled performance cores, or e.g. "0-7"
+    INFERENCE_CPU_AFFINITY = resolve_affinity(os.getenv("INFERENCE_CPU_AFFINITY", ""), _profile)
+    # Weight loading: mmap pages weights in lazily, mlock pins them so they are never swapped out
+    MODEL_USE_MMAP = os.getenv("MODEL_USE_MMAP", "true").lower() == "true"
+    MODEL_USE_MLOCK = os.getenv("MODEL_USE_MLOCK", "false").lower() == "true"
+    # Prompt tokens evaluated per batch (logical) and per compute pass (physical)
+    MODEL_N_BATCH = int(os.getenv("MODEL_N_BATCH", str(_profile.get("n_batch", 512))))
+    MODEL_N_UBATCH = int(os.getenv("MODEL_N_UBATCH", str(_profile.get("n_ubatch", 512))))
+    # Tokens generated by a throwaway request after load (0 disables the warmup)
+    MODEL_WARMUP_TOKENS = int(os.getenv("MODEL_WARMUP_TOKENS", "8"))
+    # Speculative decoding: "off", "prompt_lookup" (drafts copied from the prompt) or "draft_model"
+    SPECULATIVE_DECODING = os.getenv("SPECULATIVE_DECODING", "off").lower()
+    # Tokens proposed per draft, and longest n-gram looked up in the prompt
+    SPECULATIVE_DRAFT_TOKENS = int(os.getenv("SPECULATIVE_DRAFT_TOKENS", "10"))
+    SPECULATIVE_NGRAM_SIZE = int(os.getenv("SPECULATIVE_NGRAM_SIZE", "2"))
+    # Small GGUF with the same vocabulary as the main model, for SPECULATIVE_DECODING=draft_model
+    _env_draft_model = os.getenv("DRAFT_MODEL_PATH", "")
+    DRAFT_MODEL_PATH = (
+        str(Path(_env_draft_model) if Path(_env_draft_model).is_absolute() else _models_dir / _env_draft_model)
+        if _env_draft_model else ""
+    )
+    # RAM for all loaded models together (0 = 75% of physical memory)
+    MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
     
     # Server configuration
     HOST = os.getenv("HOST", "0.0.0.0")
@@ -38,6 +67,45 @@ class Config:
     TOP_P = float(os.getenv("TOP_P", "0.9"))
     REPEAT_PENALTY = float(os.getenv("REPEAT_PENALTY", "1.1"))
     
+    # Inference queue (requests waiting behind the one being generated)
+    MAX_QUEUE_DEPTH = int(os.getenv("MAX_QUEUE_DEPTH", "8"))
+    # Prompts accepted by one /api/generate/batch request
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "64"))
+    
+    # Reuse the evaluated system prompt KV state across requests and restarts
+    PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE", "true").lower() == "true"
+    
+    # KV state kept in RAM for conversation sessions; colder sessions spill to disk
+    SESSION_MEMORY_MB = int(os.getenv("SESSION_MEMORY_MB", "1024"))
+    
+    # Cache for deterministic generations (temperature 0 or fixed seed)
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "true").lower() == "true"
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+    RESPONSE_CACHE_MAX_MB = int(os.getenv("RESPONSE_CACHE_MAX_MB", "64"))
+    RESPONSE_CACHE_MAX_AGE_HOURS = float(os.getenv("RESPONSE_CACHE_MAX_AGE_HOURS", "168"))
+    
+    # Worker processes parsing uploaded PDF/DOCX/TXT files into plain text
+    CONTEXT_EXTRACTION_WORKERS = int(os.getenv("CONTEXT_EXTRACTION_WORKERS", "2"))
+    # Extracted text is split into chunks of this many characters for retrieval
+    CONTEXT_CHUNK_CHARS = int(os.getenv("CONTEXT_CHUNK_CHARS", "1200"))
+    CONTEXT_CHUNK_OVERLAP = int(os.getenv("CONTEXT_CHUNK_OVERLAP", "200"))
+    # Passages retrieved for a generation request with context_ids (packed to fit the context window)
+    CONTEXT_RETRIEVAL_CHUNKS = int(os.getenv("CONTEXT_RETRIEVAL_CHUNKS", "8"))
+    # Length of each summary generated when summarizing a context file (map and reduce steps)
+    SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "256"))
+    # GGUF embedding model for semantic search over context files (empty = disabled)
+    _env_embedding_model = os.getenv("EMBEDDING_MODEL_PATH", "")
+    EMBEDDING_MODEL_PATH = (
+        str(Path(_env_embedding_model) if Path(_env_embedding_model).is_absolute() else _models_dir / _env_embedding_model)
+        if _env_embedding_model else ""
+    )
+    EMBEDDING_N_THREADS = int(os.getenv("EMBEDDING_N_THREADS", "2"))
+    # Vectors indexed before search switches from exhaustive to coarse-quantized
+    EMBEDDING_IVF_THRESHOLD = int(os.getenv("EMBEDDING_IVF_THRESHOLD", "20000"))
+    
+    # Seconds between background system samples used by /api/health
+    HEALTH_SAMPLE_INTERVAL = float(os.getenv("HEALTH_SAMPLE_INTERVAL", "5"))
+    
     # CORS settings
     CORS_ORIGINS = [
         "http://localhost:1420",  # Tauri dev
@@ -60,4 +128,25 @@ class Config:
         if not (0.0 <= cls.TEMPERATURE <= 2.0):
             raise ValueError("TEMPERATURE must be between 0.0 and 2.0")
         
+        if cls.MODEL_N_BATCH <= 0 or cls.MODEL_N_UBATCH <= 0:
+            raise ValueError("MODEL_N_BATCH and MODEL_N_UBATCH must be positive")
+        
+        if cls.MAX_QUEUE_DEPTH < 0:
+            raise ValueError("MAX_QUEUE_DEPTH must not be negative")
+        
+        if cls.CONTEXT_CHUNK_CHARS <= 0 or cls.CONTEXT_CHUNK_OVERLAP < 0:
+            raise ValueError("CONTEXT_CHUNK_CHARS must be positive and CONTEXT_CHUNK_OVERLAP not negative")
+        
+        if not (0 < cls.SUMMARY_MAX_TOKENS <= cls.MODEL_CONTEXT_SIZE // 4):
+            raise ValueError("SUMMARY_MAX_TOKENS must be positive and at most a quarter of MODEL_CONTEXT_SIZE")
+        
+        if cls.SPECULATIVE_DECODING not in SPECULATIVE_MODES:
+            raise ValueError(f"SPECULATIVE_DECODING must be one of {', '.join(SPECULATIVE_MODES)}")
+        
+        if cls.SPECULATIVE_DRAFT_TOKENS <= 0 or cls.SPECULATIVE_NGRAM_SIZE <= 0:
+            raise ValueError("SPECULATIVE_DRAFT_TOKENS and SPECULATIVE_NGRAM_SIZE must be positive")
+        
+        if cls.SPECULATIVE_DECODING == "draft_model" and not os.path.exists(cls.DRAFT_MODEL_PATH):
+            raise FileNotFoundError(f"Draft model file not found: {cls.DRAFT_MODEL_PATH or '(DRAFT_MODEL_PATH is empty)'}")
+        
         return True
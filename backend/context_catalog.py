@@ -0,0 +1,229 @@
+"""
+File: context_catalog.py
+Purpose: SQLite catalog of context files and their stored objects
+Privacy: The catalog is stored in the local app data directory only.
+"""
+
+import base64
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Columns the listing can be sorted by; each has an index together with context_id
+SORT_COLUMNS = ("uploaded_at", "filename", "file_size")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL,
+    extraction_status TEXT NOT NULL DEFAULT 'pending',
+    extraction_error TEXT,
+    index_status TEXT NOT NULL DEFAULT 'pending',
+    chunks INTEGER,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contexts (
+    context_id TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL REFERENCES objects (sha256),
+    filename TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    file_size INTEGER NOT NULL,
+    text_preview TEXT NOT NULL DEFAULT '',
+    uploaded_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contexts_sha256 ON contexts (sha256);
+CREATE INDEX IF NOT EXISTS contexts_uploaded_at ON contexts (uploaded_at, context_id);
+CREATE INDEX IF NOT EXISTS contexts_filename ON contexts (filename, context_id);
+CREATE INDEX IF NOT EXISTS contexts_file_size ON contexts (file_size, context_id);
+"""
+
+_SELECT = """
+    SELECT c.context_id, c.sha256, c.filename, c.file_type, c.file_size, c.text_preview, c.uploaded_at,
+           o.extraction_status, o.extraction_error, o.index_status, o.chunks, o.updated_at
+    FROM contexts c JOIN objects o ON o.sha256 = c.sha256
+"""
+_FIELDS = (
+    "context_id", "sha256", "filename", "file_type", "file_size", "text_preview", "uploaded_at",
+    "extraction_status", "extraction_error", "index_status", "chunks", "updated_at",
+)
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def encode_cursor(sort_value: Any, context_id: str) -> str:
+    """Opaque cursor pointing just after a listed row"""
+    return base64.urlsafe_b64encode(json.dumps([sort_value, context_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        sort_value, context_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return sort_value, context_id
+
+
+class ContextCatalog:
+    """
+    Context file metadata and object reference counts in SQLite
+
+    ``contexts`` holds one row per context id (the original filename,
+    size, type and upload time) and ``objects`` one row per stored file
+    content with its reference count and extraction/indexing status.
+    Lookups and deletes are primary-key operations, and listings are
+    keyset-paginated over indexed sort columns, so their cost does not
+    grow with the number of files. The database runs in WAL mode, so
+    listing never waits for an upload being recorded.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def add(self, ref: Dict[str, Any]) -> int:
+        """
+        Record a context id for an object, creating the object row if needed
+
+        Returns:
+            The object's reference count after adding
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO objects (sha256, size, refcount, updated_at) VALUES (?, ?, 1, ?)
+                   ON CONFLICT (sha256) DO UPDATE SET refcount = refcount + 1""",
+                (ref["sha256"], ref["file_size"], _now())
+            )
+            self._conn.execute(
+                """INSERT INTO contexts (context_id, sha256, filename, file_type, file_size, text_preview, uploaded_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (ref["context_id"], ref["sha256"], ref["filename"], ref["file_type"],
+                 ref["file_size"], ref.get("text_preview", ""), ref["uploaded_at"])
+            )
+            return self._conn.execute("SELECT refcount FROM objects WHERE sha256 = ?", (ref["sha256"],)).fetchone()[0]
+
+    def get(self, context_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(_SELECT + " WHERE c.context_id = ?", (context_id,)).fetchone()
+        return dict(zip(_FIELDS, row)) if row else None
+
+    def delete(self, context_id: str) -> Optional[Tuple[str, int]]:
+        """
+        Remove a context id
+
+        Returns:
+            (object hash, references left), or None if the id is unknown;
+            the object row is removed when no references are left
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT sha256 FROM contexts WHERE context_id = ?", (context_id,)).fetchone()
+            if row is None:
+                return None
+            sha256 = row[0]
+            self._conn.execute("DELETE FROM contexts WHERE context_id = ?", (context_id,))
+            self._conn.execute("UPDATE objects SET refcount = refcount - 1 WHERE sha256 = ?", (sha256,))
+            remaining = self._conn.execute("SELECT refcount FROM objects WHERE sha256 = ?", (sha256,)).fetchone()[0]
+            if remaining <= 0:
+                self._conn.execute("DELETE FROM objects WHERE sha256 = ?", (sha256,))
+            return sha256, max(remaining, 0)
+
+    def has_object(self, sha256: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM objects WHERE sha256 = ?", (sha256,)).fetchone() is not None
+
+    def context_ids_for(self, sha256: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT context_id FROM contexts WHERE sha256 = ? ORDER BY uploaded_at, context_id", (sha256,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def set_status(
+        self,
+        sha256: str,
+        extraction: Optional[str] = None,
+        extraction_error: Optional[str] = None,
+        index: Optional[str] = None,
+        chunks: Optional[int] = None
+    ):
+        """Update the processing status of an object (unknown hashes are ignored)"""
+        updates = {"updated_at": _now()}
+        if extraction is not None:
+            updates["extraction_status"] = extraction
+            updates["extraction_error"] = extraction_error
+        if index is not None:
+            updates["index_status"] = index
+        if chunks is not None:
+            updates["chunks"] = chunks
+        assignments = ", ".join(f"{column} = ?" for column in updates)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE objects SET {assignments} WHERE sha256 = ?", (*updates.values(), sha256))
+
+    def list(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        sort: str = "uploaded_at",
+        descending: bool = True
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of context files
+
+        Args:
+            limit: Page size
+            cursor: ``next_cursor`` of the previous page
+            sort: One of SORT_COLUMNS (ties are ordered by context id)
+            descending: Newest / largest / Z first
+
+        Returns:
+            The rows and the cursor for the next page (None on the last page)
+
+        Raises:
+            ValueError: For an unknown sort column or malformed cursor
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by {sort}")
+        direction = "DESC" if descending else "ASC"
+        sql = _SELECT
+        params: list = []
+        if cursor:
+            sort_value, context_id = decode_cursor(cursor)
+            sql += f" WHERE (c.{sort}, c.context_id) {'<' if descending else '>'} (?, ?)"
+            params.extend([sort_value, context_id])
+        sql += f" ORDER BY c.{sort} {direction}, c.context_id {direction} LIMIT ?"
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        items = [dict(zip(_FIELDS, row)) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last[sort], last["context_id"])
+        return items, next_cursor
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM contexts").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            references = self._conn.execute("SELECT COUNT(*) FROM contexts").fetchone()[0]
+            objects, object_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects"
+            ).fetchone()
+        return {"references": references, "objects": objects, "object_bytes": object_bytes}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
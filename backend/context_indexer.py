@@ -0,0 +1,269 @@
+"""
+File: context_indexer.py
+Purpose: Chunk extracted context text and keep the retrieval indexes up to date
+Privacy: Chunks and embeddings are stored next to the context files, on this device only.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional
+
+from chunking import chunk_text
+from extraction import read_text
+from lexical_index import LexicalIndex
+
+if TYPE_CHECKING:
+    from embedding_index import Embedder
+
+logger = logging.getLogger(__name__)
+
+# Chunks embedded per llama.cpp call; small so queries don't wait long behind indexing
+EMBED_BATCH_SIZE = 16
+# Documents whose chunk lists are kept in memory for search results
+_CHUNK_CACHE_SIZE = 64
+# Reciprocal rank fusion constant; damps the influence of the very top ranks
+_RRF_K = 60
+
+
+def chunks_path_for(source: Path) -> Path:
+    """Where the chunks of ``source``'s extracted text are stored"""
+    return source.with_name(source.name + ".chunks.json")
+
+
+class ContextIndexer:
+    """
+    Background indexing of context files once their text is extracted
+
+    Each stored file (keyed by its content hash, the object file name) is
+    split into chunks saved next to it, added to the BM25 ``LexicalIndex``
+    and embedded into the ``EmbeddingIndex`` when an embedding model is
+    configured. Indexing runs
+    on one background thread in submission order; searches run on the
+    caller's thread.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        source_for: Callable[[str], Path],
+        embedder: Optional["Embedder"] = None,
+        chunk_chars: int = 1200,
+        chunk_overlap: int = 200,
+        ivf_threshold: int = 20000,
+        on_indexed: Optional[Callable[[str, int], None]] = None
+    ):
+        self.directory = Path(directory)
+        self.source_for = source_for
+        self.embedder = embedder
+        self.chunk_chars = chunk_chars
+        self.chunk_overlap = chunk_overlap
+        # Called with (doc_key, chunk count) after a file is indexed
+        self.on_indexed = on_indexed
+        self.lexical = LexicalIndex(self.directory / "lexical.db")
+        self.embeddings = None
+        if embedder:
+            # Imported here: numpy is only needed once semantic search is configured
+            from embedding_index import EmbeddingIndex
+
+            self.embeddings = EmbeddingIndex(self.directory / "embeddings", embedder.name, ivf_threshold)
+        self._queue: "queue.Queue[Optional[Path]]" = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._chunk_cache: "OrderedDict[str, List[str]]" = OrderedDict()
+
+    def submit(self, source: Path):
+        """Queue ``source`` for indexing (no-op if already indexed or queued)"""
+        doc_key = source.name
+        with self._lock:
+            if self._stopping or doc_key in self._pending or self.is_indexed(doc_key):
+                return
+            self._pending.add(doc_key)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="context-indexer", daemon=True)
+                self._thread.start()
+        self._queue.put(source)
+
+    def is_indexed(self, doc_key: str) -> bool:
+        if not chunks_path_for(self.source_for(doc_key)).exists() or doc_key not in self.lexical:
+            return False
+        return self.embeddings is None or doc_key in self.embeddings
+
+    def status(self, doc_key: str) -> Dict[str, Any]:
+        """Indexing state of a stored file"""
+        chunks = self.chunks(doc_key)
+        return {
+            "status": "pending" if doc_key in self._pending else ("indexed" if self.is_indexed(doc_key) else "not_indexed"),
+            "chunks": len(chunks) if chunks is not None else None,
+            "keyword_indexed": doc_key in self.lexical,
+            "embedded": self.embeddings is not None and doc_key in self.embeddings,
+        }
+
+    def _run(self):
+        while True:
+            source = self._queue.get()
+            if source is None:
+                return
+            try:
+                self._index(source)
+            except Exception as e:
+                logger.error(f"Error indexing context file: {str(e)}")
+            finally:
+                with self._lock:
+                    self._pending.discard(source.name)
+
+    def _index(self, source: Path):
+        doc_key = source.name
+        start = time.perf_counter()
+        chunks = self.chunks(doc_key)
+        if chunks is None:
+            text = read_text(source)
+            if text is None:
+                return
+            chunks = [chunk.text for chunk in chunk_text(text, self.chunk_chars, self.chunk_overlap)]
+            if not source.exists():
+                return
+            path = chunks_path_for(source)
+            tmp_path = path.with_name(path.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(chunks, f)
+            os.replace(tmp_path, path)
+
+        if doc_key not in self.lexical and source.exists():
+            self.lexical.add(doc_key, chunks)
+
+        if self.embeddings is not None and doc_key not in self.embeddings and chunks:
+            vectors = []
+            for i in range(0, len(chunks), EMBED_BATCH_SIZE):
+                if self._stopping:
+                    return
+                vectors.extend(self.embedder.embed(chunks[i:i + EMBED_BATCH_SIZE]))
+            # The file may have been deleted while it was being embedded
+            if source.exists():
+                self.embeddings.add(doc_key, vectors)
+        logger.info(f"🧩 Indexed {len(chunks)} chunks in {time.perf_counter() - start:.2f}s")
+        if self.on_indexed and source.exists():
+            self.on_indexed(doc_key, len(chunks))
+
+    def chunks(self, doc_key: str) -> Optional[List[str]]:
+        """Chunk texts of a stored file, or None if it has not been chunked"""
+        with self._lock:
+            if doc_key in self._chunk_cache:
+                self._chunk_cache.move_to_end(doc_key)
+                return self._chunk_cache[doc_key]
+        try:
+            with open(chunks_path_for(self.source_for(doc_key)), "r", encoding="utf-8") as f:
+                chunks = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._chunk_cache[doc_key] = chunks
+            while len(self._chunk_cache) > _CHUNK_CACHE_SIZE:
+                self._chunk_cache.popitem(last=False)
+        return chunks
+
+    def remove(self, doc_key: str):
+        """Drop a deleted file from the indexes"""
+        with self._lock:
+            self._chunk_cache.pop(doc_key, None)
+        self.lexical.delete(doc_key)
+        if self.embeddings is not None:
+            self.embeddings.delete(doc_key)
+
+    def lexical_search(
+        self,
+        query: str,
+        k: int = 10,
+        doc_keys: Optional[Iterable[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Chunks ranked by BM25 keyword relevance to ``query`` (blocking)"""
+        return [
+            {"doc_key": doc_key, "chunk": chunk, "score": score, "snippet": snippet}
+            for doc_key, chunk, score, snippet in self.lexical.search(query, k, doc_keys)
+        ]
+
+    def semantic_search(
+        self,
+        query: str,
+        k: int = 5,
+        doc_keys: Optional[Iterable[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Chunks most similar in meaning to ``query`` (blocking)
+
+        Returns an empty list when no embedding model is configured.
+        """
+        if self.embeddings is None:
+            return []
+        vector = self.embedder.embed([query])[0]
+        results = []
+        for doc_key, chunk, score in self.embeddings.search(vector, k, doc_keys):
+            chunks = self.chunks(doc_key)
+            if chunks is not None and chunk < len(chunks):
+                results.append({"doc_key": doc_key, "chunk": chunk, "score": score, "text": chunks[chunk]})
+        return results
+
+    def hybrid_search(
+        self,
+        query: str,
+        k: int = 8,
+        doc_keys: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Chunks relevant to ``query`` by keyword and meaning (blocking)
+
+        Lexical and semantic rankings are merged with reciprocal rank
+        fusion. When ``doc_keys`` is given and neither ranking finds
+        anything (e.g. "summarize this"), the documents' chunks are
+        returned in reading order instead.
+
+        Returns:
+            Dicts with ``doc_key``, ``chunk``, ``score`` and ``text``, best first
+        """
+        fused: Dict[tuple, float] = {}
+        for ranking in (self.lexical_search(query, 2 * k, doc_keys), self.semantic_search(query, 2 * k, doc_keys)):
+            for rank, hit in enumerate(ranking):
+                key = (hit["doc_key"], hit["chunk"])
+                fused[key] = fused.get(key, 0.0) + 1.0 / (_RRF_K + rank + 1)
+
+        if not fused and doc_keys:
+            ordered = []
+            for doc_key in doc_keys:
+                ordered.extend((doc_key, chunk) for chunk in range(len(self.chunks(doc_key) or [])))
+            fused = {key: 0.0 for key in ordered[:k]}
+
+        results = []
+        for (doc_key, chunk), score in sorted(fused.items(), key=lambda item: -item[1])[:k]:
+            chunks = self.chunks(doc_key)
+            if chunks is not None and chunk < len(chunks):
+                results.append({"doc_key": doc_key, "chunk": chunk, "score": score, "text": chunks[chunk]})
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "lexical": self.lexical.stats(),
+            "embedding_model": self.embedder.name if self.embedder else None,
+            "embeddings": self.embeddings.stats() if self.embeddings is not None else None,
+        }
+
+    def shutdown(self):
+        """Stop the indexing thread; queued files are indexed again on next submit"""
+        with self._lock:
+            self._stopping = True
+            thread = self._thread
+        if thread:
+            self._queue.put(None)
+            thread.join(timeout=5)
+        self.lexical.close()
+        if self.embeddings is not None:
+            self.embeddings.close()
+        if self.embedder:
+            self.embedder.close()
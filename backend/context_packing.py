@@ -0,0 +1,147 @@
+"""
+File: context_packing.py
+Purpose: Fit retrieved context chunks into the model's context window using real token counts
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from prompts import build_context_prompt, build_passage
+
+logger = logging.getLogger(__name__)
+
+# Tokens held back for differences between counting pieces separately and the joined prompt
+_SAFETY_TOKENS = 8
+_PASSAGE_SLACK_TOKENS = 2
+
+
+class Tokenizer:
+    """
+    Token counts from a model's vocabulary
+
+    Loads the GGUF with ``vocab_only``, a separate lightweight ``Llama``
+    that holds no weights or KV cache, so counting never waits for (or
+    touches) the instance generating on the inference thread.
+    """
+
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+        self._llm = None
+        self._lock = threading.Lock()
+
+    def count(self, text: str) -> int:
+        """Number of tokens in ``text`` without a BOS token (blocking)"""
+        with self._lock:
+            if self._llm is None:
+                # Imported here: loading the llama.cpp shared library is slow and only needed now
+                from llama_cpp import Llama
+
+                self._llm = Llama(model_path=self.model_path, vocab_only=True, verbose=False)
+            return len(self._llm.tokenize(text.encode("utf-8"), add_bos=False, special=True))
+
+
+_tokenizers: Dict[str, Tokenizer] = {}
+_tokenizers_lock = threading.Lock()
+
+
+def get_tokenizer(model_path: str) -> Tokenizer:
+    """Shared tokenizer for a model file"""
+    with _tokenizers_lock:
+        if model_path not in _tokenizers:
+            _tokenizers[model_path] = Tokenizer(model_path)
+        return _tokenizers[model_path]
+
+
+class TokenCountCache:
+    """LRU cache of passage token counts keyed by (model, document, chunk)"""
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._counts: "OrderedDict[Tuple[str, str, int], int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str, int]) -> Optional[int]:
+        with self._lock:
+            count = self._counts.get(key)
+            if count is None:
+                self.misses += 1
+                return None
+            self._counts.move_to_end(key)
+            self.hits += 1
+            return count
+
+    def put(self, key: Tuple[str, str, int], count: int):
+        with self._lock:
+            self._counts[key] = count
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+
+
+# Counts depend only on the model and the stored chunk text, which never changes for a key
+token_count_cache = TokenCountCache()
+
+
+def pack_context(
+    tokenizer: Tokenizer,
+    question: str,
+    chunks: List[Dict[str, Any]],
+    n_ctx: int,
+    max_tokens: int,
+    cache: TokenCountCache = token_count_cache
+) -> Dict[str, Any]:
+    """
+    Build a prompt with as many retrieved chunks as fit the context window
+
+    The system prompt, question and ``max_tokens`` of output are reserved
+    first; chunks are then added in rank order while their token counts
+    fit the remainder (a chunk that does not fit is skipped in favour of
+    smaller, lower-ranked ones). Chunk counts are cached per model, so
+    repeat packing only tokenizes the question.
+
+    Args:
+        tokenizer: Tokenizer of the model that will generate
+        question: The user's prompt
+        chunks: Ranked chunks with ``doc_key``, ``chunk``, ``text`` and ``source`` (a label)
+        n_ctx: Context window size in tokens
+        max_tokens: Tokens reserved for the response
+
+    Returns:
+        ``prompt`` plus ``used`` (the packed chunks), ``dropped`` (count),
+        ``context_tokens`` and ``budget_tokens``
+    """
+    base_tokens = tokenizer.count(build_context_prompt(question, [build_passage(0, "", "")]))
+    budget = n_ctx - max_tokens - base_tokens - _SAFETY_TOKENS
+
+    passages: List[str] = []
+    used: List[Dict[str, Any]] = []
+    context_tokens = 0
+    for chunk in chunks:
+        number = len(passages) + 1
+        passage = build_passage(number, chunk["source"], chunk["text"])
+        key = (tokenizer.model_path, chunk["doc_key"], chunk["chunk"])
+        # Counted without the source label and number, which are short and counted separately
+        text_tokens = cache.get(key)
+        if text_tokens is None:
+            text_tokens = tokenizer.count(chunk["text"].strip())
+            cache.put(key, text_tokens)
+        tokens = text_tokens + tokenizer.count(f"[{number}] {chunk['source']}") + _PASSAGE_SLACK_TOKENS
+        if context_tokens + tokens > budget:
+            continue
+        passages.append(passage)
+        used.append(chunk)
+        context_tokens += tokens
+
+    if len(used) < len(chunks):
+        logger.info(f"✂️ Packed {len(used)} of {len(chunks)} context chunks into {max(budget, 0)} tokens")
+    return {
+        "prompt": build_context_prompt(question, passages),
+        "used": used,
+        "dropped": len(chunks) - len(used),
+        "context_tokens": context_tokens,
+        "budget_tokens": max(budget, 0),
+    }
@@ -0,0 +1,183 @@
+"""
+File: context_store.py
+Purpose: Content-addressed storage of context files with reference-counted deletion
+Privacy: Files are stored in the local app data directory only.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from context_catalog import ContextCatalog
+
+logger = logging.getLogger(__name__)
+
+# Context ids are generated uuids; other strings are rejected before reaching the catalog
+_CONTEXT_ID = re.compile(r"^[A-Za-z0-9-]{1,64}$")
+
+
+def valid_context_id(context_id: str) -> bool:
+    return bool(_CONTEXT_ID.match(context_id))
+
+
+class ContextStore:
+    """
+    Context files stored once per distinct content
+
+    Each file's bytes live in ``objects/<sha[:2]>/<sha>`` and every upload
+    is a context id recorded in the SQLite catalog with the upload's own
+    filename and metadata. Uploading a document that is already stored
+    only adds a catalog row; an object (and anything derived from it,
+    stored next to it with the same name prefix) is removed when its last
+    context id is deleted.
+
+    Loose ``<context_id>.<ext>`` files and JSON references left by earlier
+    versions are moved into the store when it is opened.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.incoming_dir = self.root / "incoming"
+        self._lock = threading.Lock()
+        for path in (self.objects_dir, self.incoming_dir):
+            path.mkdir(parents=True, exist_ok=True)
+        self.catalog = ContextCatalog(self.root / "catalog.db")
+        self._migrate_json_refs()
+        self._migrate_loose_files()
+
+    def object_path(self, sha256: str) -> Path:
+        return self.objects_dir / sha256[:2] / sha256
+
+    def incoming_path(self) -> Path:
+        """Unique temporary path for an upload being received"""
+        return self.incoming_dir / f"{uuid.uuid4()}.part"
+
+    def add(
+        self,
+        tmp_path: Path,
+        sha256: str,
+        size: int,
+        filename: str,
+        file_type: str,
+        text_preview: str,
+        context_id: Optional[str] = None,
+        uploaded_at: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Register a received file and return its context metadata
+
+        ``tmp_path`` is moved into the object store, or discarded if an
+        object with the same hash already exists.
+        """
+        ref = {
+            "context_id": context_id or str(uuid.uuid4()),
+            "sha256": sha256,
+            "filename": filename,
+            "file_type": file_type,
+            "file_size": size,
+            "text_preview": text_preview,
+            "uploaded_at": uploaded_at or datetime.utcnow().isoformat() + "Z",
+        }
+
+        with self._lock:
+            object_path = self.object_path(sha256)
+            deduplicated = object_path.exists()
+            if deduplicated:
+                tmp_path.unlink(missing_ok=True)
+            else:
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, object_path)
+            self.catalog.add(ref)
+
+        if deduplicated:
+            logger.info("♻️ Context file already stored, added a reference")
+        return dict(ref, deduplicated=deduplicated)
+
+    def get(self, context_id: str) -> Optional[Dict[str, Any]]:
+        """Catalog entry for a context id, or None"""
+        if not valid_context_id(context_id):
+            return None
+        return self.catalog.get(context_id)
+
+    def list(self, limit: int = 50, cursor: Optional[str] = None, sort: str = "uploaded_at", descending: bool = True):
+        """One page of catalog entries and the next page's cursor (see ContextCatalog.list)"""
+        return self.catalog.list(limit, cursor, sort, descending)
+
+    def context_ids_for(self, sha256: str) -> List[str]:
+        """Context ids referencing the object with this hash"""
+        return self.catalog.context_ids_for(sha256)
+
+    def set_status(self, sha256: str, **status):
+        """Record extraction/index status for an object (see ContextCatalog.set_status)"""
+        self.catalog.set_status(sha256, **status)
+
+    def delete(self, context_id: str) -> bool:
+        """Remove a context id, and its object once no context ids remain"""
+        if not valid_context_id(context_id):
+            return False
+        with self._lock:
+            deleted = self.catalog.delete(context_id)
+            if deleted is None:
+                return False
+            sha256, remaining = deleted
+            if remaining:
+                return True
+
+            # Last reference: drop the object and derived files
+            for path in self.object_path(sha256).parent.glob(f"{sha256}*"):
+                path.unlink(missing_ok=True)
+        logger.info("🗑️ Context object removed (no references left)")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Reference and object counts for status reporting"""
+        return self.catalog.stats()
+
+    def close(self):
+        self.catalog.close()
+
+    def _migrate_json_refs(self):
+        """Move JSON reference files from before the catalog existed into it"""
+        refs_dir = self.root / "refs"
+        if not refs_dir.is_dir():
+            return
+        for path in sorted(refs_dir.glob("*.json")):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    ref = json.load(f)
+                if self.catalog.get(ref["context_id"]) is None:
+                    self.catalog.add(ref)
+            except (OSError, ValueError, KeyError):
+                logger.warning(f"⚠️ Skipping unreadable context reference {path.name}")
+                continue
+            path.unlink()
+        for path in self.objects_dir.glob("*/*.meta.json"):
+            path.unlink(missing_ok=True)
+        if not any(refs_dir.iterdir()):
+            refs_dir.rmdir()
+        logger.info("📦 Moved context references into the catalog")
+
+    def _migrate_loose_files(self):
+        """Move ``<context_id>.<ext>`` files from before the store existed into it"""
+        for path in self.root.iterdir():
+            if not path.is_file() or path.name.startswith(".") or path.suffix.lower() not in (".pdf", ".docx", ".txt"):
+                continue
+            context_id, file_type = path.stem, path.suffix.lower()
+            if not valid_context_id(context_id):
+                continue
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            size = path.stat().st_size
+            uploaded_at = datetime.utcfromtimestamp(path.stat().st_mtime).isoformat() + "Z"
+            self.add(path, digest.hexdigest(), size, path.name, file_type, "", context_id=context_id, uploaded_at=uploaded_at)
+            logger.info(f"📦 Moved context file {path.name} into the content store")
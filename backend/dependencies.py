@@ -4,17 +4,89 @@ Purpose: Dependency injection for FastAPI routes
 """
 
 from fastapi import HTTPException
-from llm_runner import LLMRunner
-from typing import Optional
+from system_monitor import SystemMonitor
+from extraction import TextExtractor
+from config import Config
+from paths import get_data_dir
+from response_cache import ResponseCache
+from typing import Optional, TYPE_CHECKING
 
-# Global LLM runner instance
-_llm_runner: Optional[LLMRunner] = None
+if TYPE_CHECKING:
+    # Type-only import keeps route modules from pulling in the runner at import time
+    from llm_runner import LLMRunner
+    from model_registry import ModelRegistry
 
-def set_llm_runner(llm_runner: Optional[LLMRunner]):
+# Global LLM runner instance (the default model)
+_llm_runner: Optional["LLMRunner"] = None
+
+# Global model registry (None when no model is configured)
+_model_registry: Optional["ModelRegistry"] = None
+
+# Global background system sampler (created on first use)
+_system_monitor: Optional[SystemMonitor] = None
+
+# Global context text extractor (worker processes start on first job)
+_text_extractor: Optional[TextExtractor] = None
+
+# Global response cache shared by all loaded models (keys include the model fingerprint)
+_response_cache: Optional[ResponseCache] = None
+
+def set_llm_runner(llm_runner: Optional["LLMRunner"]):
     """Set the global LLM runner instance"""
     global _llm_runner
     _llm_runner = llm_runner
 
-def get_llm_runner() -> Optional[LLMRunner]:
+def get_llm_runner() -> Optional["LLMRunner"]:
     """Get the global LLM runner instance (returns None if not initialized)"""
     return _llm_runner
+
+def set_model_registry(model_registry: Optional["ModelRegistry"]):
+    """Set the global model registry"""
+    global _model_registry
+    _model_registry = model_registry
+
+def get_model_registry() -> Optional["ModelRegistry"]:
+    """Get the global model registry (returns None if not configured)"""
+    return _model_registry
+
+def get_system_monitor() -> SystemMonitor:
+    """Get the global system monitor, starting it on first use"""
+    global _system_monitor
+    if _system_monitor is None:
+        _system_monitor = SystemMonitor(interval=Config.HEALTH_SAMPLE_INTERVAL)
+        _system_monitor.start()
+    return _system_monitor
+
+def stop_system_monitor():
+    """Stop the global system monitor if it was started"""
+    global _system_monitor
+    if _system_monitor is not None:
+        _system_monitor.stop()
+        _system_monitor = None
+
+def get_text_extractor() -> TextExtractor:
+    """Get the global context text extractor"""
+    global _text_extractor
+    if _text_extractor is None:
+        _text_extractor = TextExtractor(max_workers=Config.CONTEXT_EXTRACTION_WORKERS)
+    return _text_extractor
+
+def stop_text_extractor():
+    """Stop the extraction worker processes if any were started"""
+    global _text_extractor
+    if _text_extractor is not None:
+        _text_extractor.shutdown()
+        _text_extractor = None
+
+def get_response_cache() -> ResponseCache:
+    """Get the response cache shared by every runner, opening it on first use"""
+    global _response_cache
+    cache_dir = get_data_dir() / "response_cache"
+    if _response_cache is None or _response_cache.cache_dir != cache_dir:
+        _response_cache = ResponseCache(
+            cache_dir,
+            max_entries=Config.RESPONSE_CACHE_MAX_ENTRIES,
+            max_bytes=Config.RESPONSE_CACHE_MAX_MB * 1024 * 1024,
+            max_age_seconds=Config.RESPONSE_CACHE_MAX_AGE_HOURS * 3600,
+        )
+    return _response_cache
@@ -0,0 +1,350 @@
+"""
+File: embedding_index.py
+Purpose: Local text embeddings and a memory-mapped vector index for context retrieval
+Privacy: Embeddings are computed and stored on this device only.
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_VECTORS_FILE = "vectors.f32"
+_META_FILE = "index.json"
+# Rows allocated when the vector file is first created; it doubles as needed
+_INITIAL_CAPACITY = 1024
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class EmbeddingIndex:
+    """
+    Cosine-similarity index over chunk embeddings, kept on disk
+
+    Unit-length vectors are stored as rows of a float32 matrix in a
+    memory-mapped file; ``index.json`` records the row range holding each
+    document's chunks, in chunk order. Adding a document appends rows, and deleting one marks
+    its rows as tombstones that are skipped by search and dropped by
+    ``compact()`` once they make up a quarter of the file.
+
+    Search is an exhaustive matrix-vector product. Once more than
+    ``ivf_threshold`` rows are live, a coarse quantizer (k-means centroids
+    with an inverted list per centroid) is built in memory and search only
+    scores the rows in the lists nearest the query.
+    """
+
+    def __init__(self, directory: Path, model: str = "", ivf_threshold: int = 20000, nprobe: int = 8):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.model = model
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        self.dim: Optional[int] = None
+        self._rows: List[Optional[Tuple[str, int]]] = []
+        self._doc_rows: Dict[str, List[int]] = {}
+        self._dead: Set[int] = set()
+        self._vectors: Optional[np.memmap] = None
+        self._quantizer: Optional["_CoarseQuantizer"] = None
+        self._load()
+
+    @property
+    def count(self) -> int:
+        """Number of rows written, including tombstones"""
+        return len(self._rows)
+
+    @property
+    def live_count(self) -> int:
+        return len(self._rows) - len(self._dead)
+
+    def __contains__(self, doc_key: str) -> bool:
+        return doc_key in self._doc_rows
+
+    def documents(self) -> List[str]:
+        return list(self._doc_rows)
+
+    def _load(self):
+        meta_path = self.directory / _META_FILE
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return
+        if meta.get("model") != self.model:
+            # Vectors from another embedding model are not comparable
+            logger.info("🔄 Embedding model changed, starting a new index")
+            self._reset_files()
+            return
+        self.dim = meta["dim"]
+        self._rows = [None] * meta["count"]
+        for doc_key, (start, length) in meta["documents"].items():
+            self._doc_rows[doc_key] = list(range(start, start + length))
+            for chunk in range(length):
+                self._rows[start + chunk] = (doc_key, chunk)
+        self._dead = {row for row, entry in enumerate(self._rows) if entry is None}
+        self._open_vectors(max(_INITIAL_CAPACITY, len(self._rows)))
+
+    def _reset_files(self):
+        for name in (_VECTORS_FILE, _META_FILE):
+            (self.directory / name).unlink(missing_ok=True)
+
+    def _open_vectors(self, capacity: int):
+        """Map the vector file, growing it to at least ``capacity`` rows"""
+        path = self.directory / _VECTORS_FILE
+        row_bytes = self.dim * 4
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        size = path.stat().st_size if path.exists() else 0
+        if size < capacity * row_bytes:
+            with open(path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+            size = capacity * row_bytes
+        self._vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(size // row_bytes, self.dim))
+
+    def _save_meta(self):
+        meta_path = self.directory / _META_FILE
+        tmp_path = meta_path.with_name(meta_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "model": self.model,
+                "dim": self.dim,
+                "count": self.count,
+                "documents": {key: [rows[0], len(rows)] for key, rows in self._doc_rows.items()},
+            }, f)
+        os.replace(tmp_path, meta_path)
+
+    def add(self, doc_key: str, vectors: np.ndarray):
+        """Index the chunk vectors of a document, replacing any previous ones"""
+        vectors = _normalize(vectors)
+        if vectors.ndim != 2 or not len(vectors):
+            return
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+            if doc_key in self._doc_rows:
+                self._tombstone(doc_key)
+
+            start = len(self._rows)
+            end = start + len(vectors)
+            if self._vectors is None or end > len(self._vectors):
+                capacity = _INITIAL_CAPACITY if self._vectors is None else len(self._vectors)
+                while capacity < end:
+                    capacity *= 2
+                self._open_vectors(capacity)
+            self._vectors[start:end] = vectors
+            self._vectors.flush()
+            self._rows.extend((doc_key, chunk) for chunk in range(len(vectors)))
+            self._doc_rows[doc_key] = list(range(start, end))
+            if self._quantizer:
+                self._quantizer.add(np.arange(start, end), vectors)
+            self._save_meta()
+
+    def delete(self, doc_key: str) -> bool:
+        """Remove a document's vectors; returns False if it was not indexed"""
+        with self._lock:
+            if doc_key not in self._doc_rows:
+                return False
+            self._tombstone(doc_key)
+            if self.count - self.live_count > max(_INITIAL_CAPACITY, self.count // 4):
+                self.compact()
+            else:
+                self._save_meta()
+            return True
+
+    def _tombstone(self, doc_key: str):
+        for row in self._doc_rows.pop(doc_key):
+            self._rows[row] = None
+            self._dead.add(row)
+
+    def compact(self):
+        """Rewrite the vector file without tombstoned rows"""
+        with self._lock:
+            live = [row for row, entry in enumerate(self._rows) if entry]
+            vectors = np.array(self._vectors[live]) if live else np.zeros((0, self.dim), dtype=np.float32)
+            rows = [self._rows[row] for row in live]
+
+            self._vectors = None
+            (self.directory / _VECTORS_FILE).unlink(missing_ok=True)
+            self._rows = rows
+            self._dead = set()
+            self._doc_rows = {}
+            for row, (doc_key, _) in enumerate(rows):
+                self._doc_rows.setdefault(doc_key, []).append(row)
+            self._open_vectors(max(_INITIAL_CAPACITY, len(rows)))
+            self._vectors[:len(rows)] = vectors
+            self._vectors.flush()
+            self._quantizer = None
+            self._save_meta()
+        logger.info(f"🧹 Compacted embedding index to {len(rows)} rows")
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 5,
+        doc_keys: Optional[Iterable[str]] = None
+    ) -> List[Tuple[str, int, float]]:
+        """
+        Top-``k`` chunks by cosine similarity to ``query``
+
+        Args:
+            query: Query embedding
+            k: Number of results
+            doc_keys: Only search these documents (always exhaustive)
+
+        Returns:
+            (document key, chunk index, score) tuples, best first
+        """
+        with self._lock:
+            if self.dim is None or not self._doc_rows:
+                return []
+            query = _normalize(query).reshape(-1)
+            if doc_keys is not None:
+                rows = [row for key in doc_keys for row in self._doc_rows.get(key, ())]
+                candidates = np.array(rows, dtype=np.int64)
+            elif self.live_count >= self.ivf_threshold:
+                candidates = self._coarse_quantizer().candidates(query, self.nprobe)
+                if self._dead:
+                    candidates = candidates[[row not in self._dead for row in candidates]]
+            else:
+                candidates = None
+
+            if candidates is None:
+                scores = self._vectors[:self.count] @ query
+                if self._dead:
+                    scores[np.fromiter(self._dead, dtype=np.int64)] = -np.inf
+                rows = np.arange(self.count)
+            else:
+                if not len(candidates):
+                    return []
+                scores = self._vectors[candidates] @ query
+                rows = candidates
+
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            results = []
+            for i in top:
+                if not np.isfinite(scores[i]):
+                    break
+                doc_key, chunk = self._rows[rows[i]]
+                results.append((doc_key, chunk, float(scores[i])))
+            return results
+
+    def _coarse_quantizer(self) -> "_CoarseQuantizer":
+        # Retrained once the index has doubled since the last training
+        if self._quantizer is None or self.live_count > 2 * self._quantizer.trained_on:
+            live = np.setdiff1d(np.arange(self.count), np.fromiter(self._dead, dtype=np.int64))
+            self._quantizer = _CoarseQuantizer.train(self._vectors, live)
+            logger.info(f"🧭 Built coarse index with {len(self._quantizer.centroids)} lists over {len(live)} rows")
+        return self._quantizer
+
+    def stats(self):
+        return {
+            "documents": len(self._doc_rows),
+            "vectors": self.live_count,
+            "tombstones": self.count - self.live_count,
+            "dim": self.dim,
+            "coarse_lists": len(self._quantizer.centroids) if self._quantizer else 0,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+
+
+class _CoarseQuantizer:
+    """Inverted lists of row numbers keyed by nearest k-means centroid"""
+
+    def __init__(self, centroids: np.ndarray, trained_on: int):
+        self.centroids = centroids
+        self.trained_on = trained_on
+        self.lists: List[List[int]] = [[] for _ in range(len(centroids))]
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, rows: np.ndarray, iterations: int = 10, seed: int = 0) -> "_CoarseQuantizer":
+        nlist = max(1, int(np.sqrt(len(rows))))
+        rng = np.random.default_rng(seed)
+        sample = rows if len(rows) <= 64 * nlist else rng.choice(rows, 64 * nlist, replace=False)
+        data = np.asarray(vectors[np.sort(sample)])
+        centroids = data[rng.choice(len(data), nlist, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(data @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = data[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        quantizer = cls(centroids, len(rows))
+        # Assign in blocks to bound memory on large indexes
+        for start in range(0, len(rows), 8192):
+            block = rows[start:start + 8192]
+            quantizer.add(block, np.asarray(vectors[block]))
+        return quantizer
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray):
+        for row, c in zip(rows, np.argmax(vectors @ self.centroids.T, axis=1)):
+            self.lists[c].append(int(row))
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        nprobe = min(nprobe, len(self.centroids))
+        nearest = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.array([row for c in nearest for row in self.lists[c]], dtype=np.int64)
+
+
+class Embedder:
+    """
+    Text embeddings from a local GGUF embedding model via llama.cpp
+
+    The model is loaded on first use with its own ``Llama`` instance, so it
+    never touches the generation model; calls are serialized because
+    llama.cpp is not re-entrant.
+    """
+
+    def __init__(self, model_path: str, n_threads: int = 2, n_ctx: int = 512):
+        self.model_path = model_path
+        self.n_threads = n_threads
+        self.n_ctx = n_ctx
+        self._llm = None
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return Path(self.model_path).name
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Unit-length embeddings, one row per text (blocking)"""
+        with self._lock:
+            if self._llm is None:
+                # Imported here: loading the llama.cpp shared library is slow and only needed now
+                from llama_cpp import Llama
+
+                logger.info(f"📦 Loading embedding model: {self.name}")
+                self._llm = Llama(
+                    model_path=self.model_path,
+                    embedding=True,
+                    n_ctx=self.n_ctx,
+                    n_threads=self.n_threads,
+                    verbose=False,
+                    n_gpu_layers=0,
+                )
+            return _normalize(self._llm.embed(texts, truncate=True))
+
+    def close(self):
+        with self._lock:
+            self._llm = None
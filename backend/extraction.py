@@ -0,0 +1,328 @@
+"""
+File: extraction.py
+Purpose: Extract plain text from context files (PDF, DOCX, TXT) in worker processes
+Privacy: Files are parsed locally; extracted text is written next to the stored file.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Characters of extracted text kept in the job status
+PREVIEW_CHARS = 500
+
+# Set in each worker process by _init_worker
+_progress_queue = None
+
+
+def text_path_for(source: Path) -> Path:
+    """Where the extracted text of ``source`` is stored"""
+    return source.with_name(source.name + ".txt")
+
+
+def stats_path_for(source: Path) -> Path:
+    """Where the character and page counts of the extracted text are stored"""
+    return source.with_name(source.name + ".txt.json")
+
+
+def _write_stats(source: Path, chars: int, pages: Optional[int]):
+    path = stats_path_for(source)
+    tmp_path = path.with_name(path.name + ".part")
+    tmp_path.write_text(json.dumps({"chars": chars, "pages": pages}), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _read_stats(source: Path) -> Dict[str, Any]:
+    """
+    Counts of text extracted earlier (e.g. before a restart)
+
+    Text extracted before counts were stored is counted once and the
+    counts written, so ``chars`` is always characters, never bytes.
+    """
+    try:
+        return json.loads(stats_path_for(source).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        pass
+    chars = 0
+    with open(text_path_for(source), "r", encoding="utf-8") as f:
+        for block in iter(lambda: f.read(1 << 20), ""):
+            chars += len(block)
+    try:
+        _write_stats(source, chars, None)
+    except OSError as e:
+        logger.warning(f"⚠️ Failed to store extracted text counts: {e}")
+    return {"chars": chars, "pages": None}
+
+
+def _completed_job(source: Path) -> Dict[str, Any]:
+    stats = _read_stats(source)
+    return {"status": "completed", "pages_done": stats["pages"], "pages_total": stats["pages"],
+            "chars": stats["chars"], "error": None}
+
+
+def _iter_pages(source: Path, file_type: str) -> Iterator[Tuple[int, int, str]]:
+    """Yield (page number, page count, text) for a file; DOCX has no pages, so paragraphs are used"""
+    if file_type == ".pdf":
+        from pypdf import PdfReader
+
+        reader = PdfReader(str(source))
+        total = len(reader.pages)
+        for number, page in enumerate(reader.pages, 1):
+            yield number, total, page.extract_text() or ""
+    elif file_type == ".docx":
+        import docx
+
+        paragraphs = docx.Document(str(source)).paragraphs
+        total = len(paragraphs)
+        for number, paragraph in enumerate(paragraphs, 1):
+            yield number, total, paragraph.text
+    else:
+        with open(source, "r", encoding="utf-8", errors="replace") as f:
+            yield 1, 1, f.read()
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _extract(job_key: str, source: str, file_type: str) -> Dict[str, Any]:
+    """Write the text of ``source`` to its text path (runs in a worker process)"""
+    destination = text_path_for(Path(source))
+    tmp_path = destination.with_name(destination.name + ".part")
+    chars = 0
+    pages = 0
+    last_report = 0.0
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            separator = "\n\n" if file_type == ".pdf" else "\n"
+            for number, total, text in _iter_pages(Path(source), file_type):
+                out.write(text)
+                out.write(separator)
+                # Everything written, so the count matches the stored text
+                chars += len(text) + len(separator)
+                pages = total
+                now = time.monotonic()
+                # Progress is throttled so long documents don't flood the queue
+                if _progress_queue is not None and (number == total or now - last_report > 0.2):
+                    _progress_queue.put((job_key, number, total))
+                    last_report = now
+        os.replace(tmp_path, destination)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    _write_stats(Path(source), chars, pages)
+    return {"chars": chars, "pages": pages}
+
+
+class TextExtractor:
+    """
+    Background text extraction with per-file job status
+
+    Parsing runs in a process pool, so large PDFs neither hold the GIL nor
+    delay request handling. Jobs are keyed by the stored file, so files
+    shared by several context ids are parsed once, and a file whose text
+    was already extracted completes immediately.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._progress = None
+        self._progress_thread: Optional[threading.Thread] = None
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        # Callbacks run with the source path and job status once its job finishes
+        self._callbacks: Dict[str, List[Callable[[Path, Dict[str, Any]], None]]] = {}
+        self._lock = threading.Lock()
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned workers don't inherit the inference thread or model memory
+            ctx = multiprocessing.get_context("spawn")
+            self._progress = ctx.Queue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(self._progress,)
+            )
+            self._progress_thread = threading.Thread(
+                target=self._drain_progress, name="extraction-progress", daemon=True
+            )
+            self._progress_thread.start()
+        return self._executor
+
+    def _start_job(self, key: str, file_type: str) -> Future:
+        """Queue an extraction, replacing the pool once if a worker died (caller holds the lock)"""
+        try:
+            return self._ensure_executor().submit(_extract, key, key, file_type)
+        except BrokenProcessPool:
+            logger.warning("⚠️ Extraction worker process died; starting new workers")
+            self._discard_executor()
+        try:
+            return self._ensure_executor().submit(_extract, key, key, file_type)
+        except BrokenProcessPool as e:
+            # Only this job fails; the next submit tries a new pool again
+            self._discard_executor()
+            future: Future = Future()
+            future.set_exception(e)
+            return future
+
+    def _discard_executor(self):
+        """Drop a broken pool without waiting for it (caller holds the lock)"""
+        executor, self._executor = self._executor, None
+        executor.shutdown(wait=False, cancel_futures=True)
+        # Ends its progress thread; the next pool gets a new queue
+        self._progress.put(None)
+
+    def submit(
+        self,
+        source: Path,
+        file_type: str,
+        on_complete: Optional[Callable[[Path, Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Start extracting ``source`` unless it is done or already running
+
+        ``on_complete`` is called with ``source`` and the final job status
+        (on a background thread) once the job has completed or failed,
+        immediately if the text is already available.
+
+        Returns:
+            The job status
+        """
+        key = str(source)
+        with self._lock:
+            job = self._valid_job(source)
+            if job and job["status"] in ("pending", "running"):
+                if on_complete:
+                    self._callbacks.setdefault(key, []).append(on_complete)
+                return dict(job)
+
+            if (job is None or job["status"] != "completed") and text_path_for(source).exists():
+                job = _completed_job(source)
+                self._jobs[key] = job
+            ready = job is not None and job["status"] == "completed"
+            if not ready:
+                # New file, or a retry after a failed job
+                job = {"status": "pending", "pages_done": 0, "pages_total": None, "chars": None,
+                       "error": None, "submitted_at": time.time()}
+                self._jobs[key] = job
+                if on_complete:
+                    self._callbacks.setdefault(key, []).append(on_complete)
+                future = self._start_job(key, file_type)
+            job = dict(job)
+
+        job.pop("submitted_at", None)
+        if ready:
+            if on_complete:
+                on_complete(source, dict(job))
+        else:
+            future.add_done_callback(lambda f: self._finish(key, f))
+        return job
+
+    def status(self, source: Path) -> Optional[Dict[str, Any]]:
+        """Status of the extraction job for ``source``, or None if none was started"""
+        with self._lock:
+            job = self._valid_job(source)
+            if job is None:
+                text_path = text_path_for(source)
+                if not text_path.exists():
+                    return None
+                job = _completed_job(source)
+            job = dict(job)
+            job.pop("submitted_at", None)
+        if job["status"] == "completed":
+            job["text_preview"] = read_text(source, PREVIEW_CHARS)
+        return job
+
+    def forget(self, source: Path):
+        """Drop the job of a deleted file, so the same content uploaded again is extracted again"""
+        with self._lock:
+            self._jobs.pop(str(source), None)
+            self._callbacks.pop(str(source), None)
+
+    def _valid_job(self, source: Path) -> Optional[Dict[str, Any]]:
+        """The job for ``source``, unless it completed and its text has since been removed (caller holds the lock)"""
+        job = self._jobs.get(str(source))
+        if job and job["status"] == "completed" and not text_path_for(source).exists():
+            del self._jobs[str(source)]
+            return None
+        return job
+
+    def _finish(self, key: str, future: Future):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                return
+            error = future.exception() if not future.cancelled() else RuntimeError("Extraction cancelled")
+            if error is None:
+                result = future.result()
+                # Progress messages may still be queued; the result is authoritative
+                job.update(status="completed", chars=result["chars"],
+                           pages_done=result["pages"], pages_total=result["pages"])
+            else:
+                if isinstance(error, ImportError):
+                    error = RuntimeError(f"Parser not installed ({error.name or error})")
+                job.update(status="failed", error=str(error))
+            job["duration"] = round(time.time() - job.pop("submitted_at", time.time()), 3)
+            callbacks = self._callbacks.pop(key, [])
+            final = dict(job)
+        if error is None:
+            logger.info(f"📄 Extracted {job['chars']} characters in {job['duration']}s")
+        else:
+            logger.warning(f"⚠️ Text extraction failed: {error}")
+        for callback in callbacks:
+            try:
+                callback(Path(key), final)
+            except Exception as e:
+                logger.error(f"Error handling extraction result: {str(e)}")
+
+    def _drain_progress(self):
+        progress = self._progress
+        while True:
+            try:
+                item = progress.get(timeout=0.5)
+            except queue.Empty:
+                if self._executor is None:
+                    return
+                continue
+            except (EOFError, OSError, ValueError):
+                return
+            if item is None:
+                return
+            key, done, total = item
+            with self._lock:
+                job = self._jobs.get(key)
+                if job and job["status"] in ("pending", "running"):
+                    job.update(status="running", pages_done=done, pages_total=total)
+
+    def shutdown(self):
+        """Stop the worker processes, abandoning queued jobs"""
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        executor.shutdown(wait=True, cancel_futures=True)
+        self._progress.put(None)
+        if self._progress_thread:
+            self._progress_thread.join(timeout=2)
+        self._progress.close()
+
+
+def read_text(source: Path, limit: Optional[int] = None) -> Optional[str]:
+    """Extracted text of ``source`` (the first ``limit`` characters), or None if not extracted yet"""
+    try:
+        with open(text_path_for(source), "r", encoding="utf-8") as f:
+            return f.read(limit) if limit else f.read()
+    except OSError:
+        return None
@@ -0,0 +1,45 @@
+"""
+File: hashing.py
+Purpose: Stable hashes used to key on-disk caches
+"""
+
+import hashlib
+import os
+from typing import Dict, Tuple
+
+# Bytes sampled from each end of a model file when fingerprinting
+_FINGERPRINT_SAMPLE_BYTES = 4 * 1024 * 1024
+
+_fingerprint_cache: Dict[Tuple[str, int, int], str] = {}
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 hex digest of a UTF-8 string"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def model_fingerprint(model_path: str) -> str:
+    """
+    Fingerprint a model file without reading all of it
+
+    GGUF files are several GB, so rather than hashing the whole file this
+    hashes its size plus the first and last few MB (header, tensor index and
+    tail weights). Any re-download, re-quantization or truncation changes the
+    result. Results are memoized per (path, size, mtime).
+    """
+    stat = os.stat(model_path)
+    key = (os.path.abspath(model_path), stat.st_size, stat.st_mtime_ns)
+    if key in _fingerprint_cache:
+        return _fingerprint_cache[key]
+
+    digest = hashlib.sha256()
+    digest.update(str(stat.st_size).encode("ascii"))
+    with open(model_path, "rb") as f:
+        digest.update(f.read(_FINGERPRINT_SAMPLE_BYTES))
+        if stat.st_size > 2 * _FINGERPRINT_SAMPLE_BYTES:
+            f.seek(-_FINGERPRINT_SAMPLE_BYTES, os.SEEK_END)
+            digest.update(f.read(_FINGERPRINT_SAMPLE_BYTES))
+
+    fingerprint = digest.hexdigest()
+    _fingerprint_cache[key] = fingerprint
+    return fingerprint
@@ -0,0 +1,266 @@
+"""
+File: inference_worker.py
+Purpose: Single-owner worker thread for llama.cpp inference with bounded admission
+"""
+
+import asyncio
+import itertools
+import logging
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Set
+
+# Sentinel pushed to a TokenStream once its job has finished
+_DONE = object()
+
+logger = logging.getLogger(__name__)
+
+# Lower values run first; interactive requests overtake queued bulk work
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+# Shutdown sentinel sorts after every admitted job
+_PRIORITY_SHUTDOWN = sys.maxsize
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the inference queue cannot admit another request"""
+
+    def __init__(self, queue_depth: int, retry_after: int):
+        super().__init__(f"Inference queue full ({queue_depth} waiting)")
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+
+
+class TokenStream:
+    """
+    Async iterator over items emitted by a job running on the worker thread
+
+    Iterate to receive emitted items as they are produced, then await
+    ``result()`` for the job's return value (or its exception).
+    """
+
+    def __init__(self, items: asyncio.Queue, future: asyncio.Future):
+        self._items = items
+        self._future = future
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Any:
+        item = await self._items.get()
+        if item is _DONE:
+            # Leave the sentinel in place so further iteration also stops
+            self._items.put_nowait(_DONE)
+            raise StopAsyncIteration
+        return item
+
+    async def result(self) -> Any:
+        """Wait for the job to finish and return its result"""
+        return await self._future
+
+    @property
+    def future(self) -> asyncio.Future:
+        """The job's future, resolved when it finishes"""
+        return self._future
+
+
+@dataclass
+class _Job:
+    """A unit of work executed on the inference thread"""
+    fn: Callable[..., Any]
+    args: tuple
+    kwargs: dict
+    loop: asyncio.AbstractEventLoop
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class InferenceWorker:
+    """
+    Runs blocking model calls on one dedicated thread.
+
+    llama.cpp is not re-entrant, so every call that touches a ``Llama``
+    instance goes through this worker. Jobs run in priority order (FIFO
+    within a priority) and at most ``max_queue_depth`` jobs may wait behind
+    the running one. A running job is never preempted.
+    With ``cpu_affinity`` the thread (and the llama.cpp compute threads it
+    spawns, which inherit its mask) is pinned to those CPUs.
+    """
+
+    def __init__(
+        self,
+        max_queue_depth: int,
+        name: str = "monad-inference",
+        cpu_affinity: Optional[Set[int]] = None
+    ):
+        self.max_queue_depth = max_queue_depth
+        self.name = name
+        self.cpu_affinity = cpu_affinity
+        # (priority, sequence, job); a None job is the shutdown sentinel
+        self._jobs: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._waiting = 0
+        self._running = False
+        self._closed = False
+        # Exponentially weighted average of job duration, used for Retry-After
+        self._avg_job_seconds = 10.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of jobs waiting behind the running one"""
+        return self._waiting
+
+    @property
+    def busy(self) -> bool:
+        """Whether a job is currently executing"""
+        return self._running
+
+    def start(self):
+        """Start the worker thread if it is not already running"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def retry_after(self) -> int:
+        """Estimate seconds until a new job could be admitted"""
+        return max(1, math.ceil(self._avg_job_seconds * (self._waiting + 1)))
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        priority: int = PRIORITY_INTERACTIVE,
+        **kwargs
+    ) -> asyncio.Future:
+        """
+        Admit a job and return a future resolved on the event loop
+
+        Must be called from the event loop thread. Jobs with a lower
+        ``priority`` value run before any waiting job with a higher one.
+
+        Raises:
+            QueueFullError: If ``max_queue_depth`` jobs are already waiting
+            RuntimeError: If the worker has been shut down
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Inference worker is shut down")
+            if self._waiting >= self.max_queue_depth:
+                raise QueueFullError(self._waiting, self.retry_after())
+            self._waiting += 1
+        self.start()
+
+        job = _Job(fn=fn, args=args, kwargs=kwargs, loop=loop, future=loop.create_future())
+        self._jobs.put((priority, next(self._sequence), job))
+        return job.future
+
+    async def run(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        priority: int = PRIORITY_INTERACTIVE,
+        **kwargs
+    ) -> Any:
+        """Run ``fn`` on the worker thread and await its result"""
+        return await self.submit(fn, *args, priority=priority, **kwargs)
+
+    def stream(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        priority: int = PRIORITY_INTERACTIVE,
+        **kwargs
+    ) -> TokenStream:
+        """
+        Admit a streaming job
+
+        ``fn`` is called on the worker thread with an ``emit`` callable as its
+        first argument; every emitted item is delivered to the returned
+        TokenStream on the event loop, in order.
+
+        Raises:
+            QueueFullError: If ``max_queue_depth`` jobs are already waiting
+        """
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+
+        def emit(item: Any):
+            loop.call_soon_threadsafe(items.put_nowait, item)
+
+        future = self.submit(fn, emit, *args, priority=priority, **kwargs)
+        # Runs after every emit() callback already scheduled by the job
+        future.add_done_callback(lambda _: items.put_nowait(_DONE))
+        return TokenStream(items, future)
+
+    def shutdown(self, timeout: Optional[float] = None):
+        """Stop the worker thread after already-admitted jobs finish; later submits are refused"""
+        with self._lock:
+            self._closed = True
+        thread = self._thread
+        if not thread:
+            return
+        self._jobs.put((_PRIORITY_SHUTDOWN, next(self._sequence), None))
+        thread.join(timeout)
+        self._thread = None
+
+    def _pin_thread(self):
+        """Restrict the calling thread to ``cpu_affinity`` where the OS supports it"""
+        try:
+            # pid 0 is the calling thread on Linux
+            os.sched_setaffinity(0, self.cpu_affinity)
+            logger.info(f"📌 Inference thread pinned to CPUs {sorted(self.cpu_affinity)}")
+        except (AttributeError, OSError, ValueError) as e:
+            logger.warning(f"⚠️ Could not pin inference thread to CPUs {sorted(self.cpu_affinity)}: {e}")
+
+    def _run(self):
+        """Worker thread main loop"""
+        if self.cpu_affinity:
+            self._pin_thread()
+        while True:
+            _, _, job = self._jobs.get()
+            if job is None:
+                return
+
+            with self._lock:
+                self._waiting -= 1
+                self._running = True
+
+            started = time.monotonic()
+            try:
+                result = job.fn(*job.args, **job.kwargs)
+            except BaseException as e:
+                self._resolve(job, error=e)
+            else:
+                self._resolve(job, result=result)
+            finally:
+                elapsed = time.monotonic() - started
+                self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * elapsed
+                self._running = False
+
+    @staticmethod
+    def _resolve(job: _Job, result: Any = None, error: Optional[BaseException] = None):
+        """Hand a job's outcome back to its event loop"""
+
+        def _set():
+            if job.future.done():
+                return
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+
+        try:
+            job.loop.call_soon_threadsafe(_set)
+        except RuntimeError:
+            # Event loop already closed (e.g. during shutdown); nothing to notify
+            logger.debug("Dropped result for job on closed event loop")
@@ -0,0 +1,159 @@
+"""
+File: lexical_index.py
+Purpose: On-disk BM25 keyword index over context file chunks (SQLite FTS5)
+Privacy: The index is stored in the local app data directory only.
+"""
+
+import logging
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Row ids are allocated in blocks per document so a document can be dropped by rowid range
+_ROWS_PER_DOCUMENT = 1 << 20
+
+_PHRASE = re.compile(r'"([^"]+)"')
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    FTS5 query for free text: quoted phrases stay phrases, other words are
+    matched individually (any may match; BM25 ranks chunks with more and
+    rarer terms first). Returns None if the query has no searchable terms.
+    """
+    parts = []
+    for phrase in _PHRASE.findall(query):
+        terms = _TERM.findall(phrase)
+        if terms:
+            parts.append('"' + " ".join(terms) + '"')
+    for term in _TERM.findall(_PHRASE.sub(" ", query)):
+        parts.append(f'"{term}"')
+    return " OR ".join(dict.fromkeys(parts)) or None
+
+
+class LexicalIndex:
+    """
+    BM25-ranked keyword search over document chunks
+
+    Backed by an SQLite FTS5 table, which keeps delta-encoded postings per
+    term on disk and is updated in place: adding a document inserts its
+    chunks, and deleting one removes them by row id range, without
+    rebuilding anything else. Each document's chunks occupy a block of row
+    ids recorded in the ``documents`` table.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(
+                text, tokenize = 'unicode61 remove_diacritics 2'
+            );
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_key TEXT PRIMARY KEY,
+                block INTEGER NOT NULL UNIQUE,
+                chunk_count INTEGER NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def __contains__(self, doc_key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM documents WHERE doc_key = ?", (doc_key,)).fetchone()
+        return row is not None
+
+    def add(self, doc_key: str, chunks: List[str]):
+        """Index a document's chunks, replacing any previous version"""
+        if len(chunks) >= _ROWS_PER_DOCUMENT:
+            chunks = chunks[:_ROWS_PER_DOCUMENT - 1]
+            logger.warning("⚠️ Document has too many chunks for the keyword index; indexing the start only")
+        with self._lock, self._conn:
+            self._delete(doc_key)
+            block = self._conn.execute("SELECT COALESCE(MAX(block), 0) + 1 FROM documents").fetchone()[0]
+            base = block * _ROWS_PER_DOCUMENT
+            self._conn.executemany(
+                "INSERT INTO chunks (rowid, text) VALUES (?, ?)",
+                ((base + i, text) for i, text in enumerate(chunks))
+            )
+            self._conn.execute(
+                "INSERT INTO documents (doc_key, block, chunk_count) VALUES (?, ?, ?)",
+                (doc_key, block, len(chunks))
+            )
+
+    def delete(self, doc_key: str) -> bool:
+        """Remove a document's chunks; returns False if it was not indexed"""
+        with self._lock, self._conn:
+            return self._delete(doc_key)
+
+    def _delete(self, doc_key: str) -> bool:
+        row = self._conn.execute("SELECT block FROM documents WHERE doc_key = ?", (doc_key,)).fetchone()
+        if row is None:
+            return False
+        base = row[0] * _ROWS_PER_DOCUMENT
+        self._conn.execute("DELETE FROM chunks WHERE rowid BETWEEN ? AND ?", (base, base + _ROWS_PER_DOCUMENT - 1))
+        self._conn.execute("DELETE FROM documents WHERE doc_key = ?", (doc_key,))
+        return True
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        doc_keys: Optional[Iterable[str]] = None
+    ) -> List[Tuple[str, int, float, str]]:
+        """
+        Top-``k`` chunks by BM25 score for ``query``
+
+        Args:
+            query: Free text; "quoted phrases" must match exactly
+            k: Number of results
+            doc_keys: Only search these documents
+
+        Returns:
+            (document key, chunk index, score, snippet) tuples, best first;
+            matched terms in the snippet are wrapped in ``**``
+        """
+        expression = match_expression(query)
+        if expression is None:
+            return []
+        sql = """
+            SELECT d.doc_key, chunks.rowid - d.block * ?, -bm25(chunks),
+                   snippet(chunks, 0, '**', '**', '…', 16)
+            FROM chunks JOIN documents d ON chunks.rowid / ? = d.block
+            WHERE chunks MATCH ?
+        """
+        params: list = [_ROWS_PER_DOCUMENT, _ROWS_PER_DOCUMENT, expression]
+        if doc_keys is not None:
+            doc_keys = list(doc_keys)
+            if not doc_keys:
+                return []
+            sql += f" AND d.doc_key IN ({','.join('?' * len(doc_keys))})"
+            params.extend(doc_keys)
+        sql += " ORDER BY bm25(chunks) LIMIT ?"
+        params.append(k)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [(doc_key, chunk, score, snippet) for doc_key, chunk, score, snippet in rows]
+
+    def stats(self):
+        with self._lock:
+            documents, chunks = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chunk_count), 0) FROM documents"
+            ).fetchone()
+        return {"documents": documents, "chunks": chunks}
+
+    def optimize(self):
+        """Merge the FTS5 index segments (e.g. after many small updates)"""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO chunks (chunks) VALUES ('optimize')")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -5,34 +5,117 @@ Purpose: LLM runner using llama.cpp for Phi-3 Medium model execution
 
 import asyncio
 import logging
-from typing import Optional, Dict, Any
-from llama_cpp import Llama
+import time
+from typing import Optional, Dict, Any, AsyncIterator, Callable, List, Set, Tuple, TYPE_CHECKING
 import os
 from datetime import datetime
 
+from cancellation import CANCEL_REASONS, CancelToken
 from config import Config
+from dependencies import get_response_cache
+from hashing import model_fingerprint
+from inference_worker import InferenceWorker, PRIORITY_BATCH, PRIORITY_INTERACTIVE, QueueFullError, TokenStream
+from paths import get_data_dir, get_models_dir
+from prompt_cache import PromptStateCache
+from prompts import SYSTEM_PREFIX, build_prompt, build_transcript
+from response_cache import ResponseCache, cache_key, is_deterministic
+from sessions import Session, SessionStore
+
+if TYPE_CHECKING:
+    # llama_cpp and speculative (numpy) are imported lazily in _load_model so the server can start without them
+    from llama_cpp import Llama
+    from speculative import DraftSource
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+STOP_SEQUENCES = ["</s>", "[INST]", "[/INST]"]
+
+# A batch prefix is snapshotted only if it extends the system prefix by at least this many tokens
+MIN_SHARED_PREFIX_TOKENS = 16
+
+
+class SampledTokenCounter:
+    """
+    Logits processor counting the tokens llama.cpp samples
+    
+    Called once per sampled position (verified draft tokens included), so
+    the count is what the model generated, independent of how the text is
+    later trimmed at stop sequences or re-tokenized.
+    """
+    
+    def __init__(self):
+        self.count = 0
+    
+    def __call__(self, input_ids, scores):
+        self.count += 1
+        return scores
+
+
 class LLMRunner:
     """LLM runner class for handling Phi-3 Medium model operations"""
     
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, worker: Optional[InferenceWorker] = None):
         """
         Initialize LLM runner
         
         Args:
             model_path: Path to the GGUF model file
+            worker: Inference thread shared with other runners; a private
+                one is created (and shut down by cleanup()) when omitted
         """
         self.model_path = model_path
-        self.llm: Optional[Llama] = None
+        self.llm: Optional["Llama"] = None
         self.is_initialized = False
         self.is_initializing = False
         self.last_error: Optional[str] = None
         self.config = Config()
         self.last_inference_time: Optional[datetime] = None
+        # Sole owner of the Llama instance; all model calls run on this thread.
+        # Runners of several resident models share one, so they never decode at once
+        self._owns_worker = worker is None
+        self.worker = worker or InferenceWorker(
+            max_queue_depth=self.config.MAX_QUEUE_DEPTH,
+            cpu_affinity=self.config.INFERENCE_CPU_AFFINITY
+        )
+        # This runner's admitted jobs, awaited by cleanup() before the model is dropped
+        self._jobs: Set[asyncio.Future] = set()
+        # Evaluated KV state of SYSTEM_PREFIX, restored before each request
+        self._prefix_state = None
+        self._prefix_tokens: List[int] = []
+        self.prompt_cache_source: Optional[str] = None
+        self.model_fingerprint: Optional[str] = None
+        # Per-conversation KV state, created once the model is loaded
+        self.sessions: Optional[SessionStore] = None
+        # Results of deterministic generations, created once the model is loaded
+        self.response_cache: Optional[ResponseCache] = None
+        # Boot progress reported through /api/health while the model loads
+        self.boot_phase = "not_started"
+        self._boot_started: Optional[float] = None
+        self._boot_finished: Optional[float] = None
+        self._boot_rss_before: Optional[int] = None
+        self._init_running = False
+        # Load duration, memory cost and warmup results, reported by get_status()
+        self.load_stats: Dict[str, Any] = {}
+        # Speculative decoding draft source handed to llama.cpp (None when disabled)
+        self.drafter: Optional["DraftSource"] = None
+    
+    def mark_booting(self):
+        """Report the runner as booting before initialize() has started running"""
+        self.is_initializing = True
+        self.boot_phase = "queued"
+        self._boot_started = time.monotonic()
+    
+    def start_background_initialize(self, max_retries: int = 2) -> "asyncio.Task":
+        """
+        Schedule initialize() without blocking server startup
+        
+        The runner reports itself as booting from this point on, so health
+        checks are accurate even before the task first runs.
+        """
+        self.mark_booting()
+        return asyncio.create_task(self.initialize(max_retries))
         
     async def initialize(self, max_retries: int = 2):
         """
@@ -41,12 +124,24 @@ class LLMRunner:
         Args:
             max_retries: Maximum number of retry attempts
         """
-        if self.is_initializing:
+        if self._init_running:
             logger.warning("⚠️ Model initialization already in progress")
             return
-            
-        self.is_initializing = True
         
+        self._init_running = True
+        self.is_initializing = True
+        self._boot_started = self._boot_started or time.monotonic()
+        try:
+            await self._initialize(max_retries)
+        finally:
+            self._init_running = False
+            self.is_initializing = False
+            self._boot_finished = time.monotonic()
+            if not self.is_initialized:
+                self.boot_phase = "failed"
+    
+    async def _initialize(self, max_retries: int):
+        """Load the model and its caches, retrying transient failures"""
         for attempt in range(1, max_retries + 1):
             try:
                 logger.info(f"🔄 Initializing LLM (attempt {attempt}/{max_retries})")
@@ -59,6 +154,7 @@ class LLMRunner:
                 # Log memory before load
                 import psutil
                 mem_before = psutil.virtual_memory()
+                self._boot_rss_before = psutil.Process().memory_info().rss
                 logger.info(f"   Memory before load: {mem_before.percent:.1f}% used ({mem_before.available / (1024**3):.1f} GB available)")
                 
                 # Check if we have enough memory (need at least 8GB free for Phi-3 Medium)
@@ -69,25 +165,62 @@ class LLMRunner:
                 # Initialize llama.cpp
                 logger.info("🔄 Creating Llama instance (this may take 30-120 seconds for Phi-3 Medium)...")
                 load_start = datetime.now()
+                self.boot_phase = "loading_model"
                 
-                self.llm = Llama(
-                    model_path=self.model_path,
-                    n_ctx=self.config.MODEL_CONTEXT_SIZE,
-                    n_threads=self.config.MODEL_N_THREADS,
-                    verbose=False,
-                    n_gpu_layers=0,  # CPU only for stability
-                )
+                self.llm = await self._run_job(self._load_model)
                 
                 load_duration = (datetime.now() - load_start).total_seconds()
                 logger.info(f"🔄 Llama instance created in {load_duration:.1f}s, verifying...")
                 
                 # Log memory after load
                 mem_after = psutil.virtual_memory()
+                rss_delta = psutil.Process().memory_info().rss - self._boot_rss_before
                 logger.info(f"   Memory after load: {mem_after.percent:.1f}% used ({mem_after.available / (1024**3):.1f} GB available)")
                 logger.info(f"   Memory delta: {(mem_before.available - mem_after.available) / (1024**3):.1f} GB")
+                self.load_stats = {
+                    "duration": load_duration,
+                    # With mmap most weights are only paged in by the warmup or first request
+                    "rss_delta_mb": round(rss_delta / (1024 ** 2), 1),
+                    "use_mmap": self.config.MODEL_USE_MMAP,
+                    "use_mlock": self.config.MODEL_USE_MLOCK,
+                    "n_batch": self.config.MODEL_N_BATCH,
+                    "n_ubatch": self.config.MODEL_N_UBATCH,
+                    "warmup": None,
+                    "first_request_time_to_first_token": None
+                }
+                
+                self.sessions = SessionStore(
+                    get_data_dir() / "sessions",
+                    self.config.SESSION_MEMORY_MB * 1024 * 1024,
+                    self.model_fingerprint,
+                )
+                
+                if self.config.RESPONSE_CACHE_ENABLED:
+                    # One cache for every loaded model, so its disk limit and LRU are global
+                    self.response_cache = get_response_cache()
+                
+                if self.config.PROMPT_CACHE_ENABLED:
+                    self.boot_phase = "priming_prompt_cache"
+                    try:
+                        await self._run_job(self._prime_system_prefix)
+                    except Exception as e:
+                        # Not fatal: requests just pay the full prefill cost
+                        logger.warning(f"⚠️ System prompt cache unavailable: {e}")
+                
+                if self.config.MODEL_WARMUP_TOKENS > 0:
+                    self.boot_phase = "warming_up"
+                    try:
+                        self.load_stats["warmup"] = await self._run_job(self._warmup)
+                        self.load_stats["warmup"]["rss_delta_mb"] = round(
+                            (psutil.Process().memory_info().rss - self._boot_rss_before) / (1024 ** 2), 1
+                        )
+                    except Exception as e:
+                        # Not fatal: the first request just runs cold
+                        logger.warning(f"⚠️ Warmup generation failed: {e}")
                 
                 self.is_initialized = True
                 self.is_initializing = False
+                self.boot_phase = "ready"
                 self.last_error = None
                 logger.info(f"✅ LLM initialized successfully in {load_duration:.1f}s")
                 return
@@ -102,14 +235,12 @@ class LLMRunner:
                     await asyncio.sleep(5)
                 else:
                     logger.error("❌ Max retries reached. Starting in degraded mode (no LLM).")
-                    self.is_initializing = False
                     return
                     
             except FileNotFoundError as e:
                 self.last_error = f"Model file not found: {str(e)}"
                 logger.error(f"❌ Model file error: {e}")
                 logger.error("⚠️ Run: cd backend && ./download_model.sh")
-                self.is_initializing = False
                 return
                 
             except Exception as e:
@@ -121,10 +252,419 @@ class LLMRunner:
                     await asyncio.sleep(5)
                 else:
                     logger.error("❌ Max retries reached. Starting in degraded mode (no LLM).")
-                    self.is_initializing = False
                     return
+    
+    def _load_model(self) -> "Llama":
+        """Construct the Llama instance (runs on the inference thread)"""
+        # Imported here: loading the llama.cpp shared library is slow and only needed now
+        from llama_cpp import Llama
+        from speculative import DraftModel, PromptLookupDraft, create_draft_source
         
-        self.is_initializing = False
+        self.model_fingerprint = model_fingerprint(self.model_path)
+        self.drafter = create_draft_source(
+            self.config.SPECULATIVE_DECODING,
+            self.config.SPECULATIVE_DRAFT_TOKENS,
+            self.config.SPECULATIVE_NGRAM_SIZE,
+            self.config.DRAFT_MODEL_PATH,
+            self.config.MODEL_CONTEXT_SIZE,
+            self.config.MODEL_N_THREADS,
+        )
+        llm = Llama(
+            model_path=self.model_path,
+            n_ctx=self.config.MODEL_CONTEXT_SIZE,
+            n_threads=self.config.MODEL_N_THREADS,
+            n_threads_batch=self.config.MODEL_N_THREADS_BATCH,
+            n_batch=self.config.MODEL_N_BATCH,
+            n_ubatch=self.config.MODEL_N_UBATCH,
+            use_mmap=self.config.MODEL_USE_MMAP,
+            use_mlock=self.config.MODEL_USE_MLOCK,
+            verbose=False,
+            n_gpu_layers=0,  # CPU only for stability
+            draft_model=self.drafter,
+        )
+        if isinstance(self.drafter, DraftModel) and self.drafter.llm.n_vocab() != llm.n_vocab():
+            # Another model from the registry, or a mismatched DRAFT_MODEL_PATH: its tokens would never be accepted
+            logger.warning("⚠️ Draft model vocabulary does not match the model; using prompt lookup instead")
+            self.drafter = PromptLookupDraft(self.config.SPECULATIVE_DRAFT_TOKENS, self.config.SPECULATIVE_NGRAM_SIZE)
+            llm.draft_model = self.drafter
+        if self.drafter:
+            logger.info(f"🚀 Speculative decoding enabled ({self.drafter.mode}, {self.drafter.num_pred_tokens} draft tokens)")
+        return llm
+    
+    def _prime_system_prefix(self):
+        """
+        Evaluate SYSTEM_PREFIX once and keep its KV state (runs on the inference thread)
+        
+        The snapshot is also written under the models directory, keyed by model
+        fingerprint and prompt hash, so a restarted backend skips the prefill.
+        """
+        start = time.monotonic()
+        cache = PromptStateCache(
+            get_models_dir() / "kv_cache",
+            self.model_fingerprint,
+            self.config.MODEL_CONTEXT_SIZE,
+        )
+        tokens = self.llm.tokenize(SYSTEM_PREFIX.encode("utf-8"), special=True)
+        
+        state = cache.load(SYSTEM_PREFIX)
+        if state is not None:
+            self.llm.load_state(state)
+            self.prompt_cache_source = "disk"
+        else:
+            self.llm.reset()
+            self.llm.eval(tokens)
+            state = self.llm.save_state()
+            cache.store(SYSTEM_PREFIX, state)
+            self.prompt_cache_source = "evaluated"
+        
+        self._prefix_state = state
+        self._prefix_tokens = list(tokens)
+        logger.info(
+            f"🧠 System prompt cached ({len(tokens)} tokens, {self.prompt_cache_source}) "
+            f"in {time.monotonic() - start:.2f}s"
+        )
+    
+    def _warmup(self) -> Dict[str, Any]:
+        """
+        Run a short throwaway generation (runs on the inference thread)
+        
+        Touches every weight page and warms the compute buffers, so the
+        first real request is not several times slower than the rest.
+        """
+        start = time.monotonic()
+        params = self._resolve_params(self.config.MODEL_WARMUP_TOKENS, 0.0, None, None)
+        completion = self._run_completion(None, build_prompt("Hello"), params)
+        duration = time.monotonic() - start
+        logger.info(f"🔥 Warmup generation finished in {duration:.2f}s")
+        return {
+            "duration": duration,
+            "tokens": completion["usage"]["completion_tokens"],
+            "time_to_first_token": completion["timings"]["time_to_first_token"]
+        }
+    
+    def _kv_tokens(self) -> List[int]:
+        """Tokens currently held in the KV cache (``input_ids`` is sized to the whole context)"""
+        return list(self.llm.input_ids[:self.llm.n_tokens])
+    
+    def _restore_system_prefix(self, prompt: str):
+        """
+        Make sure the KV cache starts with the evaluated system prefix
+        
+        llama.cpp reuses the longest matching token prefix of the previous
+        evaluation, so the snapshot only needs loading when the cache has
+        been overwritten by a prompt that diverged inside the system prefix.
+        """
+        if self._prefix_state is None or not prompt.startswith(SYSTEM_PREFIX):
+            return
+        n = len(self._prefix_tokens)
+        if self.llm.n_tokens >= n and list(self.llm.input_ids[:n]) == self._prefix_tokens:
+            return
+        self.llm.load_state(self._prefix_state)
+    
+    def _prime_shared_prefix(self, prompts: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Evaluate the longest token prefix shared by a batch of prompts (runs on the inference thread)
+        
+        Returns a snapshot restored before each batch item, so the shared
+        instructions are evaluated once even if interactive requests run in
+        between items; None when the prompts share little beyond the cached
+        system prefix.
+        """
+        token_lists = [self.llm.tokenize(p.encode("utf-8"), special=True) for p in prompts]
+        common = token_lists[0]
+        for tokens in token_lists[1:]:
+            n = 0
+            for a, b in zip(common, tokens):
+                if a != b:
+                    break
+                n += 1
+            common = common[:n]
+        # Leave at least one token of every prompt for llama.cpp to evaluate
+        common = common[:min(len(t) for t in token_lists) - 1]
+        if len(common) < len(self._prefix_tokens) + MIN_SHARED_PREFIX_TOKENS:
+            return None
+        
+        start = time.monotonic()
+        self._restore_system_prefix(prompts[0])
+        reused = 0
+        for cached, token in zip(self._kv_tokens(), common):
+            if cached != token:
+                break
+            reused += 1
+        # eval() drops KV entries past n_tokens before appending
+        self.llm.n_tokens = reused
+        self.llm.eval(common[reused:])
+        logger.info(
+            f"🧠 Batch prefix cached ({len(common)} tokens, {len(common) - reused} evaluated) "
+            f"in {time.monotonic() - start:.2f}s"
+        )
+        return {"tokens": common, "state": self.llm.save_state()}
+    
+    def _restore_shared_prefix(self, prompt_tokens: List[int], shared_prefix: Optional[Dict[str, Any]]) -> bool:
+        """Load a batch prefix snapshot if the prompt starts with it; False if it does not apply"""
+        if not shared_prefix:
+            return False
+        n = len(shared_prefix["tokens"])
+        if prompt_tokens[:n] != shared_prefix["tokens"]:
+            return False
+        if not (self.llm.n_tokens >= n and self._kv_tokens()[:n] == shared_prefix["tokens"]):
+            self.llm.load_state(shared_prefix["state"])
+        return True
+    
+    def _prepare_session(self, session: Session, turn: str, max_tokens: int) -> str:
+        """
+        Build the full prompt for a session turn and load the session's KV state
+        
+        Oldest turns are dropped when the conversation plus ``max_tokens`` no
+        longer fits the context window; that invalidates the saved state, so
+        the prompt is then evaluated from the cached system prefix.
+        
+        Returns:
+            The full prompt (system prefix + earlier turns + new turn)
+        """
+        n_ctx = self.config.MODEL_CONTEXT_SIZE
+        prompt = build_transcript(session.turns) + turn
+        while session.turns and len(self.llm.tokenize(prompt.encode("utf-8"), special=True)) + max_tokens > n_ctx:
+            session.turns.pop(0)
+            session.state = None
+            session.tokens = []
+            prompt = build_transcript(session.turns) + turn
+        
+        if session.state is None:
+            self._restore_system_prefix(prompt)
+            return prompt
+        
+        n = len(session.tokens)
+        if not (self.llm.n_tokens >= n and list(self.llm.input_ids[:n]) == session.tokens):
+            self.llm.load_state(session.state)
+        return prompt
+    
+    def _resolve_params(
+        self,
+        max_tokens: Optional[int],
+        temperature: Optional[float],
+        top_p: Optional[float],
+        repeat_penalty: Optional[float],
+        seed: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Fill in config defaults for any sampling parameter not provided"""
+        # Explicit None checks: temperature 0 (greedy) is a meaningful value
+        return {
+            "max_tokens": max_tokens or self.config.MAX_TOKENS,
+            "temperature": self.config.TEMPERATURE if temperature is None else temperature,
+            "top_p": self.config.TOP_P if top_p is None else top_p,
+            "repeat_penalty": self.config.REPEAT_PENALTY if repeat_penalty is None else repeat_penalty,
+            "seed": seed
+        }
+    
+    def _response_cache_key(
+        self,
+        prompt: str,
+        params: Dict[str, Any],
+        session_id: Optional[str],
+        use_cache: bool
+    ) -> Optional[str]:
+        """Cache key for a request, or None when its output must not be cached"""
+        # Session turns depend on conversation state beyond the prompt text
+        if not use_cache or session_id or not self.response_cache or not is_deterministic(params):
+            return None
+        return cache_key(self.model_fingerprint, prompt, params, STOP_SEQUENCES)
+    
+    def _cached_result(self, cached: Dict[str, Any], start_time: datetime) -> Dict[str, Any]:
+        """Return a cached response with metadata describing this lookup"""
+        metadata = dict(cached["metadata"])
+        metadata["generation_time"] = (datetime.now() - start_time).total_seconds()
+        metadata["time_to_first_token"] = metadata["generation_time"]
+        metadata["timings"] = {
+            "queue_wait": 0.0,
+            "restore": 0.0,
+            "prefill": 0.0,
+            "time_to_first_token": metadata["generation_time"],
+            "decode": 0.0,
+            "total": metadata["generation_time"]
+        }
+        metadata["cached"] = True
+        logger.info("⚡ Served response from cache")
+        return {"response": cached["response"], "metadata": metadata}
+    
+    def _reused_prefix_length(self, tokens: List[int]) -> int:
+        """
+        Number of prompt tokens llama.cpp will take from the KV cache
+        
+        Mirrors llama.cpp's own prefix matching, which always re-evaluates at
+        least the last prompt token.
+        """
+        n = 0
+        for cached, token in zip(self._kv_tokens(), tokens[:-1]):
+            if cached != token:
+                break
+            n += 1
+        return n
+    
+    def _run_completion(
+        self,
+        emit: Optional[Callable[[str], None]],
+        prompt: str,
+        params: Dict[str, Any],
+        session_id: Optional[str] = None,
+        enqueued_at: Optional[float] = None,
+        shared_prefix: Optional[Dict[str, Any]] = None,
+        cancel: Optional[CancelToken] = None
+    ) -> Dict[str, Any]:
+        """
+        Run one completion on the inference thread
+        
+        Uses llama.cpp's streaming iterator so tokens can be forwarded through
+        ``emit`` as soon as they are decoded. With a ``session_id``, ``prompt``
+        is the new turn only and is appended to the session's conversation;
+        llama.cpp then evaluates just the tokens after the reused KV prefix.
+        ``shared_prefix`` is a batch snapshot from _prime_shared_prefix.
+        
+        ``cancel`` is checked between tokens; once it fires, generation stops
+        with the text so far and ``cancelled``/``deadline`` as stop reason.
+        
+        Returns:
+            Dictionary with the generated text, token usage, per-phase
+            timings (seconds) and stop reason
+        """
+        start = time.monotonic()
+        enqueued_at = enqueued_at or start
+        if cancel and cancel.reason:
+            # Cancelled or expired while queued: free the thread without evaluating anything
+            logger.info(f"⏹️ Skipping generation ({cancel.reason} before it started)")
+            return {
+                "text": "",
+                "stop_reason": cancel.reason,
+                "usage": {"prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                "timings": {
+                    "queue_wait": start - enqueued_at,
+                    "restore": 0.0,
+                    "prefill": 0.0,
+                    "time_to_first_token": start - enqueued_at,
+                    "decode": 0.0,
+                    "prefill_tokens_per_second": None,
+                    "decode_tokens_per_second": None
+                }
+            }
+        first_token_at: Optional[float] = None
+        parts: List[str] = []
+        finish_reason: Optional[str] = None
+        
+        session = None
+        turn = prompt
+        if session_id and self.sessions:
+            session = self.sessions.get(session_id) or Session(session_id)
+            prompt = self._prepare_session(session, turn, params["max_tokens"])
+            prompt_tokens = self.llm.tokenize(prompt.encode("utf-8"), special=True)
+        else:
+            prompt_tokens = self.llm.tokenize(prompt.encode("utf-8"), special=True)
+            if not self._restore_shared_prefix(prompt_tokens, shared_prefix):
+                self._restore_system_prefix(prompt)
+        
+        cached_tokens = self._reused_prefix_length(prompt_tokens)
+        if self.drafter:
+            self.drafter.begin()
+        sampled = SampledTokenCounter()
+        
+        # Tokenizing and restoring KV state above is reported as ``restore``, not prefill
+        prefill_start = time.monotonic()
+        chunks = self.llm(
+            prompt, stream=True, stop=STOP_SEQUENCES, echo=False, logits_processor=sampled, **params
+        )
+        for chunk in chunks:
+            if cancel and cancel.reason:
+                finish_reason = cancel.reason
+                chunks.close()
+                logger.info(f"⏹️ Generation stopped early ({finish_reason})")
+                break
+            choice = chunk["choices"][0]
+            finish_reason = choice.get("finish_reason") or finish_reason
+            text = choice["text"]
+            if first_token_at is None:
+                first_token_at = time.monotonic()
+            if not parts:
+                # Drop leading whitespace so the streamed text matches the final response
+                text = text.lstrip()
+            if not text:
+                continue
+            parts.append(text)
+            if emit:
+                emit(text)
+        
+        end = time.monotonic()
+        first_token_at = first_token_at or end
+        text = "".join(parts).rstrip()
+        completion_tokens = sampled.count
+        evaluated_tokens = len(prompt_tokens) - cached_tokens
+        prefill_time = first_token_at - prefill_start
+        decode_time = end - first_token_at
+        
+        completion = {
+            "text": text,
+            "stop_reason": finish_reason,
+            "usage": {
+                "prompt_tokens": len(prompt_tokens),
+                "cached_prompt_tokens": cached_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": len(prompt_tokens) + completion_tokens
+            },
+            "timings": {
+                "queue_wait": start - enqueued_at,
+                "restore": prefill_start - start,
+                "prefill": prefill_time,
+                "time_to_first_token": first_token_at - enqueued_at,
+                "decode": decode_time,
+                "prefill_tokens_per_second": (evaluated_tokens / prefill_time) if prefill_time > 0 else None,
+                # The first token comes out of prefill, so decode covers the rest
+                "decode_tokens_per_second": ((completion_tokens - 1) / decode_time) if decode_time > 0 and completion_tokens > 1 else None
+            }
+        }
+        
+        if self.drafter:
+            completion["speculative"] = self.drafter.finish()
+        
+        if session:
+            session.turns.append((turn, text))
+            session.tokens = self._kv_tokens()
+            session.state = self.llm.save_state()
+            self.sessions.put(session)
+            completion["session"] = {
+                "session_id": session.session_id,
+                "turns": len(session.turns),
+                "reused_tokens": cached_tokens
+            }
+        return completion
+    
+    def _build_result(self, completion: Dict[str, Any], params: Dict[str, Any], start_time: datetime) -> Dict[str, Any]:
+        """Assemble the response dictionary returned to the API layer"""
+        generation_time = (datetime.now() - start_time).total_seconds()
+        generated_text = completion["text"]
+        timings = dict(completion["timings"], total=generation_time)
+        
+        # Update last inference time
+        self.last_inference_time = datetime.now()
+        if self.load_stats and self.load_stats["first_request_time_to_first_token"] is None:
+            self.load_stats["first_request_time_to_first_token"] = timings["time_to_first_token"]
+        
+        logger.info(
+            f"✅ Generated {completion['usage']['completion_tokens']} tokens in {generation_time:.2f}s "
+            f"(ttft {timings['time_to_first_token']:.2f}s, stop: {completion['stop_reason']})"
+        )
+        return {
+            "response": generated_text,
+            "metadata": {
+                "generation_time": generation_time,
+                "time_to_first_token": timings["time_to_first_token"],
+                "tokens_generated": completion["usage"]["completion_tokens"],
+                "stop_reason": completion["stop_reason"],
+                "usage": completion["usage"],
+                "timings": timings,
+                "model_path": self.model_path,
+                "parameters": params,
+                **({"session": completion["session"]} if "session" in completion else {}),
+                **({"speculative": completion["speculative"]} if "speculative" in completion else {})
+            }
+        }
     
     async def generate_response(
         self, 
@@ -132,80 +672,201 @@ class LLMRunner:
         max_tokens: Optional[int] = None,
         temperature: Optional[float] = None,
         top_p: Optional[float] = None,
-        repeat_penalty: Optional[float] = None
+        repeat_penalty: Optional[float] = None,
+        session_id: Optional[str] = None,
+        seed: Optional[int] = None,
+        use_cache: bool = True,
+        cancel: Optional[CancelToken] = None
     ) -> Dict[str, Any]:
         """
         Generate response from the LLM
         
         Args:
-            prompt: Input prompt
+            prompt: Input prompt (only the new turn when ``session_id`` is set)
             max_tokens: Maximum tokens to generate
             temperature: Sampling temperature
             top_p: Top-p sampling parameter
             repeat_penalty: Repeat penalty parameter
+            session_id: Conversation to continue, reusing its KV state
+            seed: Sampling seed; a fixed seed makes the output cacheable
+            use_cache: Whether a deterministic result may come from / go to the response cache
+            cancel: Stops generation early when cancelled or past its deadline
             
         Returns:
             Dictionary containing response and metadata
+            
+        Raises:
+            QueueFullError: If the inference queue is full
         """
         if not self.is_initialized or not self.llm:
             raise RuntimeError("LLM not initialized")
         
         try:
             start_time = datetime.now()
+            params = self._resolve_params(max_tokens, temperature, top_p, repeat_penalty, seed)
+            return await self._complete(prompt, params, session_id, use_cache, start_time, cancel=cancel)
             
-            # Use config defaults if not provided
-            max_tokens = max_tokens or self.config.MAX_TOKENS
-            temperature = temperature or self.config.TEMPERATURE
-            top_p = top_p or self.config.TOP_P
-            repeat_penalty = repeat_penalty or self.config.REPEAT_PENALTY
-            
-            logger.info(f"🤖 Generating response for prompt: {prompt[:50]}...")
-            
-            # Generate response
-            response = self.llm(
-                prompt,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                top_p=top_p,
-                repeat_penalty=repeat_penalty,
-                stop=["</s>", "[INST]", "[/INST]"],
-                echo=False
-            )
-            
-            end_time = datetime.now()
-            generation_time = (end_time - start_time).total_seconds()
-            
-            # Extract text from response
-            generated_text = response["choices"][0]["text"].strip()
-            
-            # Update last inference time
-            self.last_inference_time = datetime.now()
-            
-            result = {
-                "response": generated_text,
-                "metadata": {
-                    "generation_time": generation_time,
-                    "tokens_generated": len(generated_text.split()),
-                    "model_path": self.model_path,
-                    "parameters": {
-                        "max_tokens": max_tokens,
-                        "temperature": temperature,
-                        "top_p": top_p,
-                        "repeat_penalty": repeat_penalty
-                    }
-                }
-            }
-            
-            logger.info(f"✅ Generated response in {generation_time:.2f}s")
-            return result
-            
+        except QueueFullError:
+            logger.warning("⚠️ Inference queue full, rejecting request")
+            raise
         except Exception as e:
             logger.error(f"❌ Error generating response: {str(e)}")
             raise
     
+    async def _complete(
+        self,
+        prompt: str,
+        params: Dict[str, Any],
+        session_id: Optional[str],
+        use_cache: bool,
+        start_time: datetime,
+        priority: int = PRIORITY_INTERACTIVE,
+        shared_prefix: Optional[Dict[str, Any]] = None,
+        cancel: Optional[CancelToken] = None
+    ) -> Dict[str, Any]:
+        """Serve one generation from the response cache or the inference thread"""
+        key = self._response_cache_key(prompt, params, session_id, use_cache)
+        cached = await asyncio.to_thread(self.response_cache.get, key) if key else None
+        if cached:
+            return self._cached_result(cached, start_time)
+        
+        logger.info(f"🤖 Generating response for prompt: {prompt[:50]}...")
+        
+        # Generate response on the inference thread so the event loop stays responsive
+        run = self._run_batch_job if priority == PRIORITY_BATCH else self._run_job
+        completion = await run(
+            self._run_completion, None, prompt, params, session_id, time.monotonic(), shared_prefix, cancel
+        )
+        result = self._build_result(completion, params, start_time)
+        if key and completion["stop_reason"] not in CANCEL_REASONS:
+            await asyncio.to_thread(self.response_cache.put, key, result)
+        return result
+    
+    async def _run_batch_job(self, fn: Callable[..., Any], *args) -> Any:
+        """Run a job at batch priority, waiting for queue space instead of failing"""
+        while True:
+            try:
+                return await self._run_job(fn, *args, priority=PRIORITY_BATCH)
+            except QueueFullError as e:
+                await asyncio.sleep(min(e.retry_after, 5))
+    
+    async def generate_batch(
+        self,
+        items: List[Dict[str, Any]],
+        cancel: Optional[CancelToken] = None
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        """
+        Generate a list of prompts as low-priority work
+        
+        Items are submitted one at a time at batch priority, so an
+        interactive request waits for at most the item currently running.
+        The token prefix the prompts share is evaluated once up front and
+        restored before each item.
+        
+        Args:
+            items: Keyword arguments for generate_response, one dict per item
+            cancel: Stops the batch; items may also carry their own ``cancel``
+            
+        Yields:
+            ``(index, result)`` as each item finishes, where ``result`` is the
+            generate_response dictionary or the exception that item raised
+        """
+        if not self.is_initialized or not self.llm:
+            raise RuntimeError("LLM not initialized")
+        
+        shared_prefix = None
+        if len(items) > 1:
+            try:
+                shared_prefix = await self._run_batch_job(
+                    self._prime_shared_prefix, [item["prompt"] for item in items]
+                )
+            except Exception as e:
+                # Not fatal: each item falls back to the system prefix cache
+                logger.warning(f"⚠️ Batch prefix cache unavailable: {e}")
+        
+        for index, item in enumerate(items):
+            try:
+                start_time = datetime.now()
+                params = self._resolve_params(
+                    item.get("max_tokens"), item.get("temperature"), item.get("top_p"),
+                    item.get("repeat_penalty"), item.get("seed")
+                )
+                result = await self._complete(
+                    item["prompt"], params, None, item.get("use_cache", True), start_time,
+                    priority=PRIORITY_BATCH, shared_prefix=shared_prefix,
+                    cancel=item.get("cancel") or cancel
+                )
+            except Exception as e:
+                logger.error(f"❌ Batch item {index} failed: {str(e)}")
+                yield index, e
+            else:
+                yield index, result
+    
+    async def stream_response(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        top_p: Optional[float] = None,
+        repeat_penalty: Optional[float] = None,
+        session_id: Optional[str] = None,
+        seed: Optional[int] = None,
+        use_cache: bool = True,
+        cancel: Optional[CancelToken] = None
+    ) -> "GenerationStream":
+        """
+        Start a streaming generation
+        
+        The request is admitted immediately (so a full queue is reported
+        before any response bytes are sent); tokens are then delivered by
+        iterating the returned stream.
+        
+        Raises:
+            QueueFullError: If the inference queue is full
+        """
+        if not self.is_initialized or not self.llm:
+            raise RuntimeError("LLM not initialized")
+        
+        start_time = datetime.now()
+        params = self._resolve_params(max_tokens, temperature, top_p, repeat_penalty, seed)
+        
+        key = self._response_cache_key(prompt, params, session_id, use_cache)
+        cached = await asyncio.to_thread(self.response_cache.get, key) if key else None
+        if cached:
+            return CachedStream(self._cached_result(cached, start_time))
+        
+        logger.info(f"🤖 Streaming response for prompt: {prompt[:50]}...")
+        try:
+            tokens = self.worker.stream(
+                self._run_completion, prompt, params, session_id, time.monotonic(), None, cancel
+            )
+            self._track(tokens.future)
+        except QueueFullError:
+            logger.warning("⚠️ Inference queue full, rejecting request")
+            raise
+        return GenerationStream(self, tokens, params, start_time, key)
+    
+    def _track(self, future: asyncio.Future) -> asyncio.Future:
+        """Remember an admitted job until it finishes"""
+        self._jobs.add(future)
+        future.add_done_callback(self._jobs.discard)
+        return future
+    
+    async def _run_job(self, fn: Callable[..., Any], *args, priority: int = PRIORITY_INTERACTIVE) -> Any:
+        """Run ``fn`` on the inference thread on behalf of this runner"""
+        return await self._track(self.worker.submit(fn, *args, priority=priority))
+    
     async def cleanup(self):
         """Cleanup LLM resources"""
         try:
+            # Let already-admitted requests finish before dropping the model
+            if self._owns_worker:
+                await asyncio.get_running_loop().run_in_executor(None, self.worker.shutdown)
+            elif self._jobs:
+                await asyncio.wait(list(self._jobs))
+            if self.sessions:
+                # Keep conversations resumable across restarts
+                await asyncio.get_running_loop().run_in_executor(None, self.sessions.spill_all)
             if self.llm:
                 # llama.cpp doesn't have explicit cleanup, but we can clear the reference
                 self.llm = None
@@ -214,18 +875,66 @@ class LLMRunner:
         except Exception as e:
             logger.error(f"❌ Error during cleanup: {str(e)}")
     
+    def _boot_status(self) -> Dict[str, Any]:
+        """Current boot phase, elapsed time and an estimated progress fraction"""
+        progress = {
+            "not_started": 0.0,
+            "queued": 0.0,
+            "loading_model": 0.05,
+            "priming_prompt_cache": 0.93,
+            "warming_up": 0.97,
+            "ready": 1.0,
+            "failed": 0.0
+        }[self.boot_phase]
+        
+        if self.boot_phase == "loading_model" and self._boot_rss_before is not None:
+            # llama.cpp pages the weights in while loading, so resident growth tracks progress
+            try:
+                import psutil
+                model_size = os.path.getsize(self.model_path)
+                loaded = psutil.Process().memory_info().rss - self._boot_rss_before
+                progress = 0.05 + 0.85 * min(1.0, max(0.0, loaded / model_size))
+            except Exception:
+                pass
+        
+        elapsed = None
+        if self._boot_started is not None:
+            elapsed = (self._boot_finished or time.monotonic()) - self._boot_started
+        return {
+            "phase": self.boot_phase,
+            "progress": round(progress, 3),
+            "elapsed": elapsed
+        }
+    
     def get_status(self) -> Dict[str, Any]:
         """Get current status of the LLM runner"""
         status = {
             "initialized": self.is_initialized,
             "is_initializing": self.is_initializing,
+            "boot": self._boot_status(),
             "model_path": self.model_path,
             "model_exists": os.path.exists(self.model_path) if self.model_path else False,
             "config": {
                 "context_size": self.config.MODEL_CONTEXT_SIZE,
                 "n_threads": self.config.MODEL_N_THREADS,
+                "n_threads_batch": self.config.MODEL_N_THREADS_BATCH,
+                "cpu_affinity": sorted(self.config.INFERENCE_CPU_AFFINITY) if self.config.INFERENCE_CPU_AFFINITY else None,
                 "max_tokens": self.config.MAX_TOKENS,
                 "temperature": self.config.TEMPERATURE
+            },
+            "load": self.load_stats or None,
+            "prompt_cache": {
+                "enabled": self.config.PROMPT_CACHE_ENABLED,
+                "prefix_tokens": len(self._prefix_tokens),
+                "source": self.prompt_cache_source
+            },
+            "sessions": self.sessions.stats() if self.sessions else None,
+            "response_cache": self.response_cache.stats() if self.response_cache else None,
+            "speculative": self.drafter.stats() if self.drafter else None,
+            "queue": {
+                "depth": self.worker.queue_depth,
+                "max_depth": self.worker.max_queue_depth,
+                "busy": self.worker.busy
             }
         }
         
@@ -238,3 +947,55 @@ class LLMRunner:
             status["last_inference"] = self.last_inference_time.isoformat()
             
         return status
+
+
+class GenerationStream:
+    """Async iterator over generated text pieces for a streaming request"""
+    
+    def __init__(
+        self,
+        runner: LLMRunner,
+        tokens: TokenStream,
+        params: Dict[str, Any],
+        start_time: datetime,
+        cache_key: Optional[str] = None
+    ):
+        self._runner = runner
+        self._tokens = tokens
+        self._params = params
+        self._start_time = start_time
+        self._cache_key = cache_key
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self) -> str:
+        return await self._tokens.__anext__()
+    
+    async def result(self) -> Dict[str, Any]:
+        """Wait for generation to finish and return the full response with metadata"""
+        completion = await self._tokens.result()
+        result = self._runner._build_result(completion, self._params, self._start_time)
+        if self._cache_key and completion["stop_reason"] not in CANCEL_REASONS:
+            await asyncio.to_thread(self._runner.response_cache.put, self._cache_key, result)
+        return result
+
+
+class CachedStream:
+    """Stream interface over a cached response, delivered as a single piece"""
+    
+    def __init__(self, result: Dict[str, Any]):
+        self._result = result
+        self._sent = False
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self) -> str:
+        if self._sent or not self._result["response"]:
+            raise StopAsyncIteration
+        self._sent = True
+        return self._result["response"]
+    
+    async def result(self) -> Dict[str, Any]:
+        return self._result
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+File: loadtest.py
+Purpose: Open-loop load generator for a running backend with HDR-style latency reports
+Privacy: Runs entirely offline against a local server; uploaded test files are deleted afterwards.
+
+Usage:
+    python loadtest.py [--url http://127.0.0.1:5005] [--users 1,5,20] [--pattern poisson|burst]
+    python loadtest.py --serve-stub   # start an in-process server with the stub model first
+
+Each stage simulates ``users`` people who each send a request every
+``--think-time`` seconds on average. Arrivals are open-loop: requests are
+sent on schedule whether or not earlier ones have finished, so a slow
+server builds a queue instead of slowing the load down, and latency is
+measured from the scheduled send time (no coordinated omission).
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+LOAD_PROMPT = "Give three short tips for writing clear meeting notes."
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of latencies
+
+    Values are recorded in microseconds into log-linear buckets: exact
+    below ``2 ** significant_bits`` and with a relative error under
+    ``2 ** -significant_bits`` (under 1% by default) above, from
+    microseconds to hours in a few hundred buckets whatever the number of
+    samples. Histograms of the same precision can be merged.
+    """
+
+    def __init__(self, significant_bits: int = 7):
+        self.significant_bits = significant_bits
+        self.counts: Dict[Tuple[int, int], int] = defaultdict(int)
+        self.total = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+
+    def _key(self, value_us: int) -> Tuple[int, int]:
+        shift = max(0, value_us.bit_length() - self.significant_bits - 1)
+        return shift, value_us >> shift
+
+    @staticmethod
+    def _highest_equivalent(key: Tuple[int, int]) -> int:
+        shift, top = key
+        return ((top + 1) << shift) - 1
+
+    def record(self, seconds: float):
+        value_us = max(0, int(seconds * 1_000_000))
+        self.counts[self._key(value_us)] += 1
+        self.total += 1
+        self.min_us = value_us if self.min_us is None else min(self.min_us, value_us)
+        self.max_us = max(self.max_us, value_us)
+
+    def merge(self, other: "LatencyHistogram"):
+        for key, count in other.counts.items():
+            self.counts[key] += count
+        self.total += other.total
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile_ms(self, pct: float) -> Optional[float]:
+        """Value at or below which ``pct`` percent of samples fall, in milliseconds"""
+        if not self.total:
+            return None
+        if pct >= 100:
+            return self.max_us / 1000
+        target = max(1, math.ceil(pct / 100 * self.total))
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= target:
+                return min(self._highest_equivalent(key), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def summary(self) -> Optional[Dict[str, float]]:
+        if not self.total:
+            return None
+        return {
+            "count": self.total,
+            "min": self.min_us / 1000,
+            **{f"p{p:g}": self.percentile_ms(p) for p in (50, 75, 90, 99, 99.9)},
+            "max": self.max_us / 1000,
+        }
+
+    def distribution(self, ticks_per_half: int = 2) -> List[Tuple[float, float, int]]:
+        """
+        (value ms, percentile, count at or below) rows, HdrHistogram-style
+
+        Percentiles are spaced evenly on a log scale of the distance to
+        100%, ``ticks_per_half`` per halving (0, 50, 75, 87.5... with one
+        tick), so the tail gets as many rows as the body.
+        """
+        if not self.total:
+            return []
+        levels = math.ceil(math.log2(self.total)) + 1
+        rows = [
+            self._row(100 * (1 - 0.5 ** (level + tick / ticks_per_half)))
+            for level in range(levels)
+            for tick in range(ticks_per_half)
+        ]
+        rows.append(self._row(100.0))
+        # Coarse histograms repeat values; keep the last row for each one
+        deduplicated: Dict[float, Tuple[float, float, int]] = {}
+        for row in rows:
+            deduplicated[row[0]] = row
+        return sorted(deduplicated.values(), key=lambda row: row[1])
+
+    def _row(self, pct: float) -> Tuple[float, float, int]:
+        value = self.percentile_ms(pct)
+        count = min(self.total, max(1, math.ceil(pct / 100 * self.total)))
+        return value, pct, count
+
+
+def arrival_offsets(pattern: str, rate: float, duration: float, burst_size: int, rng: random.Random) -> List[float]:
+    """
+    Send times (seconds from the stage start) for ``rate`` requests per second
+
+    ``poisson`` spaces requests by exponential gaps, as independent users
+    do; ``burst`` sends ``burst_size`` requests at once at evenly spaced
+    instants with the same mean rate; ``constant`` spaces them evenly.
+    """
+    if rate <= 0:
+        return []
+    offsets: List[float] = []
+    if pattern == "poisson":
+        t = rng.expovariate(rate)
+        while t < duration:
+            offsets.append(t)
+            t += rng.expovariate(rate)
+    elif pattern == "burst":
+        interval = burst_size / rate
+        t = 0.0
+        while t < duration:
+            offsets.extend([t] * burst_size)
+            t += interval
+    elif pattern == "constant":
+        offsets = [i / rate for i in range(int(duration * rate))]
+    else:
+        raise ValueError(f"Unknown arrival pattern: {pattern}")
+    return offsets
+
+
+def multipart_body(field: str, filename: str, content: bytes, content_type: str) -> Tuple[bytes, str]:
+    """Encode one file as multipart/form-data; returns the body and its Content-Type"""
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode("utf-8") + content + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class LoadClient:
+    """Blocking HTTP requests to the backend (one connection per request, as from separate users)"""
+
+    def __init__(self, url: str, timeout: float):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._upload_ids: List[str] = []
+        self._upload_counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def health(self) -> Dict[str, Any]:
+        conn = self._connect()
+        try:
+            conn.request("GET", "/api/health")
+            response = conn.getresponse()
+            response.read()
+            return {"status": response.status}
+        finally:
+            conn.close()
+
+    def generate(self, max_tokens: int) -> Dict[str, Any]:
+        """Streaming generation; ``first_token_at`` is when the first token frame arrived (perf_counter)"""
+        body = json.dumps({"prompt": LOAD_PROMPT, "max_tokens": max_tokens, "bypass_cache": True})
+        conn = self._connect()
+        try:
+            conn.request("POST", "/api/generate/stream?format=ndjson", body=body,
+                         headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            if response.status != 200:
+                response.read()
+                return {"status": response.status}
+            first_token_at = None
+            done = None
+            for line in response:
+                frame = json.loads(line)
+                if frame["type"] == "token" and first_token_at is None:
+                    first_token_at = time.perf_counter()
+                elif frame["type"] == "done":
+                    done = frame
+                elif frame["type"] == "error":
+                    return {"status": 500}
+            return {
+                "status": 200,
+                "first_token_at": first_token_at,
+                "queue_wait": done["metadata"]["timings"]["queue_wait"] if done else None,
+            }
+        finally:
+            conn.close()
+
+    def upload(self) -> Dict[str, Any]:
+        # Unique content, so every upload is stored and extracted rather than deduplicated
+        number = next(self._upload_counter)
+        content = f"Load test document {uuid.uuid4()} ({number}).\n\n".encode("utf-8") * 20
+        body, content_type = multipart_body("file", f"loadtest-{number}.txt", content, "text/plain")
+        conn = self._connect()
+        try:
+            conn.request("POST", "/api/context/upload", body=body, headers={"Content-Type": content_type})
+            response = conn.getresponse()
+            payload = response.read()
+            if response.status == 200:
+                with self._lock:
+                    self._upload_ids.append(json.loads(payload)["context_id"])
+            return {"status": response.status}
+        finally:
+            conn.close()
+
+    def delete_uploads(self) -> int:
+        with self._lock:
+            ids, self._upload_ids = self._upload_ids, []
+        for context_id in ids:
+            conn = self._connect()
+            try:
+                conn.request("DELETE", f"/api/context/{context_id}")
+                conn.getresponse().read()
+            finally:
+                conn.close()
+        return len(ids)
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """``generate=8,health=1,upload=1`` -> normalized weights"""
+    weights = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("generate", "health", "upload"):
+            raise argparse.ArgumentTypeError(f"Unknown request type: {name}")
+        weights[name] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise argparse.ArgumentTypeError("The request mix needs a positive weight")
+    return {name: weight / total for name, weight in weights.items()}
+
+
+def run_stage(client: LoadClient, users: int, args, rng: random.Random) -> Dict[str, Any]:
+    """Send one stage's open-loop load and probe /api/health throughout"""
+    rate = users / args.think_time
+    offsets = arrival_offsets(args.pattern, rate, args.duration, args.burst_size or users, rng)
+    kinds = rng.choices(list(args.mix), weights=list(args.mix.values()), k=len(offsets))
+
+    latency = defaultdict(LatencyHistogram)
+    ttft = LatencyHistogram()
+    queue_wait = LatencyHistogram()
+    probe = LatencyHistogram()
+    outcomes = defaultdict(lambda: defaultdict(int))
+    lock = threading.Lock()
+    stop_probe = threading.Event()
+
+    def send(kind: str, scheduled: float):
+        try:
+            result = getattr(client, kind)(args.max_tokens) if kind == "generate" else getattr(client, kind)()
+        except (OSError, http.client.HTTPException, ValueError):
+            result = {"status": None}
+        # Measured from the scheduled time, so client-side delays count against the server
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            status = result["status"]
+            outcome = "ok" if status == 200 else "rejected" if status == 429 else "error"
+            outcomes[kind][outcome] += 1
+            if outcome == "ok":
+                latency[kind].record(elapsed)
+                if result.get("first_token_at") is not None:
+                    ttft.record(result["first_token_at"] - scheduled)
+                if result.get("queue_wait") is not None:
+                    queue_wait.record(result["queue_wait"])
+
+    def probe_health():
+        while not stop_probe.wait(args.probe_interval):
+            start = time.perf_counter()
+            try:
+                client.health()
+                probe.record(time.perf_counter() - start)
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    outcomes["probe"]["error"] += 1
+
+    prober = threading.Thread(target=probe_health, daemon=True)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.max_inflight) as pool:
+        prober.start()
+        for offset, kind in zip(offsets, kinds):
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, kind, scheduled)
+        sent_for = time.perf_counter() - start
+    stop_probe.set()
+    prober.join()
+    wall = time.perf_counter() - start
+
+    return {
+        "users": users,
+        "pattern": args.pattern,
+        "arrival_rate": round(rate, 3),
+        "sent": len(offsets),
+        "send_seconds": round(sent_for, 2),
+        "wall_seconds": round(wall, 2),
+        "requests": {
+            kind: {
+                **{key: outcomes[kind][key] for key in ("ok", "rejected", "error")},
+                "latency_ms": latency[kind].summary(),
+                "distribution": latency[kind].distribution(),
+            }
+            for kind in args.mix
+        },
+        "time_to_first_token_ms": ttft.summary(),
+        "queue_wait_ms": queue_wait.summary(),
+        "health_probe_ms": probe.summary(),
+        "health_probe_errors": outcomes["probe"]["error"],
+    }
+
+
+def _format_summary(summary: Optional[Dict[str, float]]) -> str:
+    if not summary:
+        return "no samples"
+    return "  ".join(f"{key} {summary[key]:.1f}" for key in ("p50", "p90", "p99", "p99.9", "max")) + " ms"
+
+
+def print_stage(result: Dict[str, Any], show_distribution: bool):
+    print(f"\n👥 {result['users']} users, {result['pattern']} arrivals at {result['arrival_rate']:.2f} req/s"
+          f" ({result['sent']} requests in {result['wall_seconds']:.1f}s)")
+    for kind, stats in result["requests"].items():
+        print(f"   {kind:<9} ok {stats['ok']:>5}  rejected {stats['rejected']:>4}  errors {stats['error']:>4}"
+              f"  latency {_format_summary(stats['latency_ms'])}")
+    print(f"   {'ttft':<9} {_format_summary(result['time_to_first_token_ms'])}")
+    print(f"   {'queue':<9} {_format_summary(result['queue_wait_ms'])}")
+    print(f"   {'probe':<9} {_format_summary(result['health_probe_ms'])}"
+          + (f" ({result['health_probe_errors']} probe errors)" if result["health_probe_errors"] else ""))
+    if show_distribution:
+        for kind, stats in result["requests"].items():
+            if not stats["distribution"]:
+                continue
+            print(f"\n   {kind} latency distribution")
+            print(f"   {'Value (ms)':>12} {'Percentile':>12} {'TotalCount':>11} {'1/(1-Percentile)':>17}")
+            for value, pct, count in stats["distribution"]:
+                inverse = f"{1 / (1 - pct / 100):.2f}" if pct < 100 else "inf"
+                print(f"   {value:>12.3f} {pct / 100:>12.6f} {count:>11} {inverse:>17}")
+
+
+def serve_stub(args) -> Tuple[str, Any]:
+    """Start the app with the stub model on a free local port; returns its URL and a stop function"""
+    import socket
+    import uvicorn
+
+    import main
+    from dependencies import set_llm_runner
+    from stub_llm import create_stub_runner
+
+    # Per-request server log lines (including expected queue rejections) would drown the report
+    logging.getLogger().setLevel(logging.ERROR)
+    runner = create_stub_runner(args.prefill_rate, args.decode_rate)
+    set_llm_runner(runner)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    # Lifespan off: it would load the configured model
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, lifespan="off", log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+        runner.worker.shutdown()
+
+    return f"http://127.0.0.1:{port}", stop
+
+
+def _parse_users(value: str) -> List[int]:
+    levels = [int(v) for v in value.split(",") if v.strip()]
+    if not levels or min(levels) < 1:
+        raise argparse.ArgumentTypeError("user counts must be positive integers")
+    return levels
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Open-loop load test for the MONAD backend")
+    parser.add_argument("--url", default="http://127.0.0.1:5005", help="Backend to load")
+    parser.add_argument("--serve-stub", action="store_true", help="Start an in-process backend with the stub model and load it")
+    parser.add_argument("--users", type=_parse_users, default=[1, 5, 20], help="Comma-separated user counts, one stage each")
+    parser.add_argument("--think-time", type=float, default=10.0, help="Mean seconds between one user's requests")
+    parser.add_argument("--pattern", choices=("poisson", "burst", "constant"), default="poisson", help="Arrival pattern")
+    parser.add_argument("--burst-size", type=int, help="Requests per burst (default: the stage's user count)")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of arrivals per stage")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("generate=8,health=1,upload=1"), help="Request weights, e.g. generate=8,health=1,upload=1")
+    parser.add_argument("--max-tokens", type=int, default=64, help="Tokens per generation")
+    parser.add_argument("--probe-interval", type=float, default=0.5, help="Seconds between /api/health probes")
+    parser.add_argument("--max-inflight", type=int, default=256, help="Client threads (requests beyond this wait, and the wait is counted)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for arrival times and the request mix")
+    parser.add_argument("--prefill-rate", type=float, default=2000.0, help="Stub prompt speed (tokens/s) with --serve-stub")
+    parser.add_argument("--decode-rate", type=float, default=50.0, help="Stub generation speed (tokens/s) with --serve-stub")
+    parser.add_argument("--distribution", action="store_true", help="Print the full percentile distribution per request type")
+    parser.add_argument("--output", help="Write the full results as JSON")
+    parser.add_argument("--keep-uploads", action="store_true", help="Do not delete the files uploaded during the test")
+    args = parser.parse_args()
+
+    print("🚀 MONAD Load Test")
+    print("=" * 40)
+    stop = None
+    if args.serve_stub:
+        args.url, stop = serve_stub(args)
+        print(f"   Stub backend at {args.url} (decode {args.decode_rate:.0f} tok/s)")
+    client = LoadClient(args.url, args.timeout)
+    try:
+        client.health()
+    except OSError as e:
+        print(f"❌ Backend not reachable at {args.url}: {e}")
+        print("   Start it with: python main.py (or use --serve-stub)")
+        return 1
+
+    rng = random.Random(args.seed)
+    stages = []
+    try:
+        for users in args.users:
+            stage = run_stage(client, users, args, rng)
+            stages.append(stage)
+            print_stage(stage, args.distribution)
+    finally:
+        if not args.keep_uploads:
+            deleted = client.delete_uploads()
+            if deleted:
+                print(f"\n🗑️ Deleted {deleted} uploaded test files")
+        if stop:
+            stop()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"url": args.url, "settings": {k: v for k, v in vars(args).items() if k != "url"}, "stages": stages}, f, indent=2)
+        print(f"\n📄 Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
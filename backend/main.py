@@ -3,9 +3,15 @@ File: main.py
 Purpose: FastAPI server entry point for MONAD offline AI backend
 """
 
+import time
+
+# Reference point for the startup-time measurement logged once the server is up
+_PROCESS_START = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 import os
 from dotenv import load_dotenv
@@ -13,10 +19,17 @@ import logging
 
 from routes.generate import router as generate_router
 from routes.health import router as health_router
-from routes.context import router as context_router
+from routes.context import router as context_router, stop_context_indexer, stop_summarizer
+from routes.metrics import router as metrics_router
+from metrics import MetricsMiddleware
+from inference_worker import InferenceWorker
 from llm_runner import LLMRunner
-from dependencies import set_llm_runner
+from routes.models import router as models_router
+from dependencies import set_llm_runner, set_model_registry, get_system_monitor, stop_system_monitor, stop_text_extractor
 from config import Config
+from model_registry import ModelRegistry, memory_budget_bytes
+from paths import ensure_app_dirs, get_models_dir
+from tuning import reserve_cpus
 
 # Load environment variables
 load_dotenv()
@@ -26,45 +39,85 @@ logging.basicConfig(
 )
 logger = logging.getLogger("monad-backend")
 
-# Global LLM runner instance
+# Global LLM runner instance (the model loaded at startup)
 llm_runner = None
+model_registry = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifespan - startup and shutdown"""
-    global llm_runner
+    global llm_runner, model_registry
     
-    # Startup
+    # Startup: never wait for the model here, so the server binds immediately
     logger.info("🚀 Starting MONAD backend...")
+    ensure_app_dirs()
+    get_system_monitor()
+    load_task = None
     model_path = Config.MODEL_PATH
     if not model_path:
         logger.warning("⚠️ MODEL_PATH not configured, LLM features will be unavailable")
         set_llm_runner(None)
     else:
-        logger.info("📦 Loading model from: %s", model_path)
-        try:
-            llm_runner = LLMRunner(model_path)
-            await llm_runner.initialize()
-            set_llm_runner(llm_runner)
-            logger.info("✅ Model loaded successfully")
-        except FileNotFoundError:
-            logger.warning(f"⚠️ Model file not found: {model_path}")
-            logger.warning("⚠️ Please download the model following MODEL_SETUP.md instructions")
-            logger.warning("⚠️ Backend will start in degraded mode (health checks will work, but generation will fail)")
-            set_llm_runner(None)
-        except Exception as e:
-            logger.error(f"❌ Failed to initialize LLM: {str(e)}")
-            logger.warning("⚠️ Backend will start in degraded mode")
-            set_llm_runner(None)
+        logger.info("📦 Loading model in the background from: %s", model_path)
+        if Config.INFERENCE_CPU_AFFINITY:
+            other_cpus = reserve_cpus(Config.INFERENCE_CPU_AFFINITY)
+            if other_cpus:
+                logger.info(f"📌 Request handling moved to CPUs {sorted(other_cpus)}")
+        # One inference thread and admission queue for every model the registry loads
+        worker = InferenceWorker(
+            max_queue_depth=Config.MAX_QUEUE_DEPTH,
+            cpu_affinity=Config.INFERENCE_CPU_AFFINITY
+        )
+        llm_runner = LLMRunner(model_path, worker=worker)
+        # Registered before loading so /api/health reports booting progress
+        set_llm_runner(llm_runner)
+        model_registry = ModelRegistry(
+            get_models_dir(),
+            model_path,
+            memory_budget_bytes(Config.MODEL_MEMORY_BUDGET_MB),
+            worker=worker
+        )
+        model_registry.register(llm_runner)
+        set_model_registry(model_registry)
+        load_task = llm_runner.start_background_initialize()
+        load_task.add_done_callback(_log_model_load_result)
+    
+    app.state.startup_seconds = time.perf_counter() - _PROCESS_START
+    logger.info("✅ Accepting requests %.0f ms after startup began", app.state.startup_seconds * 1000)
     
     yield
     
     # Shutdown
     logger.info("🛑 Shutting down MONAD backend...")
-    if llm_runner:
+    if load_task and not load_task.done():
+        load_task.cancel()
+        try:
+            await load_task
+        except (asyncio.CancelledError, Exception):
+            pass
+    # Stop background summaries before the model finishes its queued work
+    stop_summarizer()
+    if model_registry:
+        await model_registry.shutdown()
+    elif llm_runner:
         await llm_runner.cleanup()
+    stop_system_monitor()
+    stop_text_extractor()
+    stop_context_indexer()
     logger.info("✅ Backend shutdown complete")
 
+def _log_model_load_result(task: "asyncio.Task"):
+    """Report how background model loading ended"""
+    if task.cancelled():
+        return
+    if task.exception():
+        logger.error(f"❌ Failed to initialize LLM: {task.exception()}")
+    if llm_runner and llm_runner.is_initialized:
+        logger.info("✅ Model loaded successfully")
+    else:
+        logger.warning("⚠️ Model not loaded. Please download the model following MODEL_SETUP.md instructions")
+        logger.warning("⚠️ Backend running in degraded mode (health checks will work, but generation will fail)")
+
 # Create FastAPI app
 app = FastAPI(
     title="MONAD Offline AI Backend",
@@ -83,15 +136,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Count requests and errors per route for /api/metrics
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(generate_router, prefix="/api")
 app.include_router(health_router, prefix="/api")
+app.include_router(metrics_router, prefix="/api")
+app.include_router(models_router, prefix="/api")
 app.include_router(context_router, prefix="/api/context")
 
 @app.get("/")
 async def root():
     """Root endpoint"""
-    return {"message": "MONAD Offline AI Backend", "status": "running"}
+    return {
+        "message": "MONAD Offline AI Backend",
+        "status": "running",
+        "startup_seconds": getattr(app.state, "startup_seconds", None)
+    }
 
 # Remove the old get_llm_runner function since we're using dependencies.py
 
@@ -0,0 +1,258 @@
+"""
+File: metrics.py
+Purpose: In-process metrics with Prometheus text exposition for the inference service
+Privacy: Metrics are served on the local API only; nothing is pushed anywhere.
+"""
+
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, sized for CPU inference (sub-second to minutes)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    """Base class for a metric family with optional labels"""
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing value"""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Value that can go up and down; usually set at scrape time"""
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def clear(self):
+        """Drop every labelled value (e.g. of models that are no longer loaded)"""
+        with self._lock:
+            self._values.clear()
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed distribution of observed values"""
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> (per-bucket counts, sum, count)
+        self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            plain = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{plain} {_format_value(total)}"
+            yield f"{self.name}_count{plain} {count}"
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "monad_http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status")))
+HTTP_ERRORS = REGISTRY.register(Counter(
+    "monad_http_errors_total", "HTTP requests that failed with a 5xx status or exception", ("route",)))
+GENERATION_ERRORS = REGISTRY.register(Counter(
+    "monad_generation_errors_total", "Generations that failed, including after streaming started", ("route",)))
+QUEUE_REJECTIONS = REGISTRY.register(Counter(
+    "monad_queue_rejections_total", "Generation requests rejected because the queue was full", ("route",)))
+PROMPT_TOKENS = REGISTRY.register(Counter(
+    "monad_prompt_tokens_total", "Prompt tokens processed", ("route",)))
+CACHED_PROMPT_TOKENS = REGISTRY.register(Counter(
+    "monad_cached_prompt_tokens_total", "Prompt tokens reused from the KV cache", ("route",)))
+COMPLETION_TOKENS = REGISTRY.register(Counter(
+    "monad_completion_tokens_total", "Completion tokens generated", ("route",)))
+GENERATIONS = REGISTRY.register(Counter(
+    "monad_generations_total", "Completed generations by stop reason", ("route", "stop_reason")))
+
+QUEUE_WAIT = REGISTRY.register(Histogram(
+    "monad_queue_wait_seconds", "Time a generation waited for the inference thread", ("route",)))
+PREFILL = REGISTRY.register(Histogram(
+    "monad_prefill_seconds", "Prompt evaluation time until the first token", ("route",)))
+TIME_TO_FIRST_TOKEN = REGISTRY.register(Histogram(
+    "monad_time_to_first_token_seconds", "Admission to first generated token", ("route",)))
+GENERATION_LATENCY = REGISTRY.register(Histogram(
+    "monad_generation_seconds", "Total generation latency", ("route",)))
+
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "monad_queue_depth", "Generation requests waiting for the inference thread"))
+INFERENCE_BUSY = REGISTRY.register(Gauge(
+    "monad_inference_busy", "1 while the inference thread is running a job"))
+MODEL_LOADED = REGISTRY.register(Gauge(
+    "monad_model_loaded", "1 when the model is loaded and ready", ("model",)))
+MODEL_SIZE = REGISTRY.register(Gauge(
+    "monad_model_file_bytes", "Size of the loaded model file", ("model",)))
+PROCESS_RESIDENT_MEMORY = REGISTRY.register(Gauge(
+    "monad_process_resident_memory_bytes", "Resident memory of the backend process, including mapped model weights"))
+CACHE_ENTRIES = REGISTRY.register(Gauge(
+    "monad_cache_entries", "Entries held by each cache", ("model", "cache", "tier")))
+CACHE_BYTES = REGISTRY.register(Gauge(
+    "monad_cache_bytes", "Bytes held by each cache", ("model", "cache", "tier")))
+
+
+def record_generation(route: str, metadata: Dict) -> None:
+    """Record token counts and latencies from a generation's metadata"""
+    usage = metadata.get("usage") or {}
+    timings = metadata.get("timings") or {}
+
+    PROMPT_TOKENS.inc(usage.get("prompt_tokens", 0), route=route)
+    CACHED_PROMPT_TOKENS.inc(usage.get("cached_prompt_tokens", 0), route=route)
+    COMPLETION_TOKENS.inc(usage.get("completion_tokens", 0), route=route)
+    stop_reason = "cached" if metadata.get("cached") else str(metadata.get("stop_reason"))
+    GENERATIONS.inc(route=route, stop_reason=stop_reason)
+
+    for histogram, key in (
+        (QUEUE_WAIT, "queue_wait"),
+        (PREFILL, "prefill"),
+        (TIME_TO_FIRST_TOKEN, "time_to_first_token"),
+        (GENERATION_LATENCY, "total"),
+    ):
+        if timings.get(key) is not None:
+            histogram.observe(timings[key], route=route)
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and errors per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception:
+            status = 500
+            raise
+        finally:
+            # The router stores the matched route in the shared scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.inc(route=route, method=scope["method"], status=str(status))
+            if status >= 500:
+                HTTP_ERRORS.inc(route=route)
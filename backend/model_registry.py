@@ -0,0 +1,302 @@
+"""
+File: model_registry.py
+Purpose: Discover GGUF models and keep a memory-budgeted set of them loaded
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from config import Config
+from dependencies import set_llm_runner
+from inference_worker import InferenceWorker
+from llm_runner import LLMRunner
+
+logger = logging.getLogger(__name__)
+
+# Resident size is roughly the file (weights) plus context buffers and scratch space
+_RESIDENT_OVERHEAD = 1.1
+
+
+class ModelNotFoundError(KeyError):
+    """No GGUF file with the requested name exists in the models directory"""
+
+
+class ModelBudgetError(RuntimeError):
+    """A model cannot be loaded without exceeding the memory budget"""
+
+
+def memory_budget_bytes(configured_mb: int) -> int:
+    """Configured model memory budget, or 75% of physical RAM when unset"""
+    if configured_mb > 0:
+        return configured_mb * 1024 * 1024
+    import psutil
+    return int(psutil.virtual_memory().total * 0.75)
+
+
+def model_name(path) -> str:
+    """Name a model is selected by: its file name without the .gguf suffix"""
+    return Path(path).stem
+
+
+class ModelRegistry:
+    """
+    Registry of loadable models with one LLMRunner per resident model
+
+    Models are the ``*.gguf`` files in ``models_dir`` (plus the configured
+    default model wherever it lives) and are selected by ``model_name``.
+    Loaded runners are kept in least-recently-used order; loading another
+    model unloads idle ones until the estimated resident size of all
+    models fits ``memory_budget_bytes``. The default model is never
+    evicted.
+
+    All runners share ``worker``, one inference thread and one admission
+    queue, so requests for different models are served one at a time
+    under the same ``MAX_QUEUE_DEPTH``. Unloading a runner lets the jobs
+    it already admitted finish first, so switching models never cuts off
+    an in-flight request. Requests ``hold`` their runner from selection
+    until they finish; held runners are never evicted, and an explicit
+    unload waits for them to be released.
+    """
+
+    def __init__(
+        self,
+        models_dir: Path,
+        default_model_path: str,
+        memory_budget_bytes: int,
+        runner_factory: Callable[..., LLMRunner] = LLMRunner,
+        worker: Optional[InferenceWorker] = None
+    ):
+        self.models_dir = Path(models_dir)
+        self.default_model_path = str(default_model_path)
+        self.default_name = model_name(default_model_path)
+        self.memory_budget_bytes = memory_budget_bytes
+        self._runner_factory = runner_factory
+        self.worker = worker
+        # name -> runner, least recently used first
+        self._resident: "OrderedDict[str, LLMRunner]" = OrderedDict()
+        self._tasks: Dict[str, "asyncio.Task"] = {}
+        # Model to make the default once it has finished loading
+        self._pending_default: Optional[str] = None
+        # Requests currently using each runner, and events set once none are
+        self._leases: Dict[LLMRunner, int] = {}
+        self._idle: Dict[LLMRunner, asyncio.Event] = {}
+
+    def discover(self) -> Dict[str, Path]:
+        """Map of model name to GGUF path for every model that can be loaded"""
+        models = {}
+        if self.models_dir.is_dir():
+            for path in sorted(self.models_dir.glob("*.gguf")):
+                models[model_name(path)] = path
+        models.setdefault(self.default_name, Path(self.default_model_path))
+        return models
+
+    @staticmethod
+    def estimated_bytes(path: Path) -> int:
+        """Estimated resident memory of a loaded model, including its own copy of the draft model"""
+        size = 0
+        paths = [path]
+        if Config.SPECULATIVE_DECODING == "draft_model":
+            paths.append(Path(Config.DRAFT_MODEL_PATH))
+        for file in paths:
+            try:
+                size += file.stat().st_size
+            except OSError:
+                pass
+        return int(size * _RESIDENT_OVERHEAD)
+
+    def resident_bytes(self) -> int:
+        """Estimated memory held by all loaded and loading models"""
+        return sum(self.estimated_bytes(Path(r.model_path)) for r in self._resident.values())
+
+    def register(self, runner: LLMRunner):
+        """Track a runner created outside the registry (the default model at startup)"""
+        self._resident[model_name(runner.model_path)] = runner
+
+    def runners(self) -> Dict[str, LLMRunner]:
+        """Resident (and loading) runners by model name"""
+        return dict(self._resident)
+
+    def get(self, name: Optional[str] = None) -> Optional[LLMRunner]:
+        """The resident runner for ``name`` (default model if None), or None"""
+        return self._resident.get(name or self.default_name)
+
+    def acquire(self, name: Optional[str] = None) -> LLMRunner:
+        """
+        Return the runner for a model, starting to load it if necessary
+
+        The returned runner may still be loading (``is_initializing``);
+        callers report that the same way as the boot-time model load.
+        Deliberately synchronous: a caller that submits work right after
+        this returns cannot race with the runner being unloaded.
+
+        Raises:
+            ModelNotFoundError: If no model with this name exists
+            ModelBudgetError: If it cannot fit within the memory budget
+        """
+        name = name or self.default_name
+        runner = self._resident.get(name)
+        if runner is not None:
+            self._resident.move_to_end(name)
+            return runner
+        return self._start_load(name)
+
+    def hold(self, runner: LLMRunner):
+        """Keep ``runner`` loaded until the matching release()"""
+        self._leases[runner] = self._leases.get(runner, 0) + 1
+        self._idle.setdefault(runner, asyncio.Event()).clear()
+
+    def release(self, runner: LLMRunner):
+        """End one request's hold on ``runner``"""
+        count = self._leases.get(runner, 0) - 1
+        if count > 0:
+            self._leases[runner] = count
+            return
+        self._leases.pop(runner, None)
+        idle = self._idle.pop(runner, None)
+        if idle:
+            idle.set()
+
+    def in_use(self, runner: LLMRunner) -> bool:
+        return runner in self._leases
+
+    def _start_load(self, name: str) -> LLMRunner:
+        """Evict idle models as needed and load ``name`` in the background"""
+        path = self.discover().get(name)
+        if path is None:
+            raise ModelNotFoundError(name)
+
+        evicted = self._select_evictions(self.estimated_bytes(path))
+        runner = self._runner_factory(str(path), worker=self.worker)
+        runner.mark_booting()
+        self._resident[name] = runner
+        self._tasks[name] = asyncio.create_task(self._load(name, runner, evicted))
+        logger.info(f"📦 Loading model '{name}' ({len(evicted)} model(s) unloading to make room)")
+        return runner
+
+    def _select_evictions(self, needed: int) -> List[LLMRunner]:
+        """Remove least recently used idle non-default models until ``needed`` bytes fit"""
+        available = self.memory_budget_bytes - self.resident_bytes()
+        candidates = [
+            n for n, runner in self._resident.items()
+            if n != self.default_name and n not in self._tasks and not self.in_use(runner)
+        ]
+        evicted = []
+        while needed > available and candidates:
+            runner = self._resident.pop(candidates.pop(0))
+            available += self.estimated_bytes(Path(runner.model_path))
+            evicted.append(runner)
+        # A lone model over budget is still allowed; it just cannot share the box
+        if needed > available and self._resident:
+            self._resident.update((model_name(r.model_path), r) for r in evicted)
+            raise ModelBudgetError(
+                f"Model needs {needed / (1024 ** 3):.1f} GB but only "
+                f"{max(available, 0) / (1024 ** 3):.1f} GB of the memory budget is free"
+            )
+        return evicted
+
+    async def _load(self, name: str, runner: LLMRunner, evicted: List[LLMRunner]):
+        """Finish unloading evicted models, then load the new one"""
+        try:
+            for old in evicted:
+                await old.cleanup()
+                logger.info(f"🧹 Unloaded model '{model_name(old.model_path)}'")
+            await runner.initialize()
+        finally:
+            self._tasks.pop(name, None)
+
+        if not runner.is_initialized:
+            if self._resident.get(name) is runner:
+                del self._resident[name]
+            if self._pending_default == name:
+                self._pending_default = None
+            logger.warning(f"⚠️ Model '{name}' failed to load: {runner.last_error}")
+            return
+
+        logger.info(f"✅ Model '{name}' loaded")
+        if self._pending_default == name:
+            self._set_default(name)
+
+    def activate(self, name: str) -> LLMRunner:
+        """
+        Make ``name`` the default model, loading it first if necessary
+
+        The switch happens once the model is ready; until then requests
+        keep going to the current default.
+        """
+        runner = self.acquire(name)
+        if runner.is_initialized:
+            self._set_default(name)
+        else:
+            self._pending_default = name
+        return runner
+
+    def _set_default(self, name: str):
+        self._pending_default = None
+        self.default_name = name
+        set_llm_runner(self._resident[name])
+        logger.info(f"🔀 Default model is now '{name}'")
+
+    async def unload(self, name: str) -> bool:
+        """
+        Unload a model after its admitted requests finish
+
+        Raises:
+            ValueError: If ``name`` is the default model
+        """
+        if name == self.default_name:
+            raise ValueError("The default model cannot be unloaded; activate another model first")
+        runner = self._resident.pop(name, None)
+        if runner is None:
+            return False
+        task = self._tasks.pop(name, None)
+        if task:
+            task.cancel()
+        idle = self._idle.get(runner)
+        if idle:
+            await idle.wait()
+        await runner.cleanup()
+        logger.info(f"🧹 Unloaded model '{name}'")
+        return True
+
+    async def shutdown(self):
+        """Unload every model, then stop the shared inference thread"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        runners = list(self._resident.values())
+        self._resident.clear()
+        for runner in runners:
+            await runner.cleanup()
+        if self.worker:
+            await asyncio.get_running_loop().run_in_executor(None, self.worker.shutdown)
+
+    def list_models(self) -> List[Dict[str, Any]]:
+        """Describe every discoverable model and its residency"""
+        models = []
+        for name, path in self.discover().items():
+            runner = self._resident.get(name)
+            try:
+                size = path.stat().st_size
+            except OSError:
+                size = None
+            models.append({
+                "name": name,
+                "path": str(path),
+                "size_mb": round(size / (1024 ** 2), 1) if size is not None else None,
+                "estimated_memory_mb": round(self.estimated_bytes(path) / (1024 ** 2), 1),
+                "default": name == self.default_name,
+                "resident": runner is not None,
+                "status": runner.boot_phase if runner else "unloaded"
+            })
+        return models
+
+    def stats(self) -> Dict[str, Any]:
+        """Memory budget usage for status reporting"""
+        return {
+            "default": self.default_name,
+            "resident": list(self._resident),
+            "resident_mb": round(self.resident_bytes() / (1024 ** 2), 1),
+            "memory_budget_mb": round(self.memory_budget_bytes / (1024 ** 2), 1)
+        }
@@ -0,0 +1,64 @@
+"""
+File: prompt_cache.py
+Purpose: On-disk snapshots of llama.cpp state for evaluated prompt prefixes
+"""
+
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Optional
+
+from hashing import text_hash
+
+logger = logging.getLogger(__name__)
+
+# Bump when the snapshot layout changes so stale files are ignored
+_SNAPSHOT_VERSION = 1
+
+
+class PromptStateCache:
+    """
+    Stores llama.cpp ``LlamaState`` snapshots keyed by model + prompt prefix
+
+    A snapshot is only valid for the exact model file, prompt text and
+    context size it was produced with, so all three are part of the key.
+    """
+
+    def __init__(self, cache_dir: Path, model_fingerprint: str, n_ctx: int):
+        self.cache_dir = Path(cache_dir)
+        self.model_fingerprint = model_fingerprint
+        self.n_ctx = n_ctx
+
+    def path_for(self, prefix: str) -> Path:
+        """Snapshot file path for a prompt prefix"""
+        name = f"{self.model_fingerprint[:16]}-{text_hash(prefix)[:16]}-ctx{self.n_ctx}.state"
+        return self.cache_dir / name
+
+    def load(self, prefix: str) -> Optional[Any]:
+        """Load a snapshot for ``prefix``, or None if missing or unreadable"""
+        path = self.path_for(prefix)
+        if not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                payload = pickle.load(f)
+            if payload.get("version") != _SNAPSHOT_VERSION or payload.get("prefix") != prefix:
+                return None
+            return payload["state"]
+        except Exception as e:
+            logger.warning(f"⚠️ Ignoring unreadable prompt cache {path.name}: {e}")
+            return None
+
+    def store(self, prefix: str, state: Any):
+        """Persist a snapshot atomically so a crash never leaves a partial file"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.path_for(prefix)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(
+                {"version": _SNAPSHOT_VERSION, "prefix": prefix, "state": state},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_path, path)
@@ -0,0 +1,73 @@
+"""
+File: prompts.py
+Purpose: MONAD system prompt and prompt formatting shared by routes and the LLM runner
+"""
+
+# Define MONAD's behaviour and identity
+SYSTEM_PROMPT = """You are MONAD — a fully offline AI assistant running locally on this user's device.
+You never use the internet, you never send data externally, and you always respond directly and clearly.
+Your responses should be concise, factual, and grounded.
+If asked "who are you", explain that you are MONAD, a local AI model operating entirely offline.
+If asked simple arithmetic (like "what is 2+2"), answer with the exact result only.
+Avoid phrases such as "in the given material" or "in the article".
+Do not use filler words or defer questions. You are confident, precise, and local.
+"""
+
+# Every prompt starts with this prefix, so its KV state can be evaluated once and reused
+SYSTEM_PREFIX = f"{SYSTEM_PROMPT}\n\n"
+
+
+def build_turn(user_prompt: str) -> str:
+    """Format one user turn, leaving the assistant reply open"""
+    return f"User: {user_prompt.strip()}\nAssistant:"
+
+
+def build_prompt(user_prompt: str) -> str:
+    """Construct structured single-turn prompt with system message"""
+    return f"{SYSTEM_PREFIX}{build_turn(user_prompt)}"
+
+
+def build_transcript(turns) -> str:
+    """Render earlier (turn, reply) pairs after the system prefix"""
+    return SYSTEM_PREFIX + "".join(f"{turn} {reply}\n" for turn, reply in turns)
+
+
+# Introduces document excerpts retrieved for a context-grounded question
+CONTEXT_HEADER = (
+    "Answer using the following excerpts from the user's documents. "
+    "If they do not contain the answer, say so.\n"
+)
+
+
+def build_passage(number: int, source: str, text: str) -> str:
+    """Format one retrieved excerpt for the context block"""
+    return f"\n[{number}] {source}\n{text.strip()}\n"
+
+
+def build_context_prompt(user_prompt: str, passages) -> str:
+    """Single-turn prompt with formatted passages between the system prefix and the turn"""
+    if not passages:
+        return build_prompt(user_prompt)
+    return f"{SYSTEM_PREFIX}{CONTEXT_HEADER}{''.join(passages)}\n{build_turn(user_prompt)}"
+
+
+# Map and reduce steps of document summarization; the instructions come first so every
+# prompt in a pass shares them as a cached prefix
+SUMMARY_INSTRUCTION = (
+    "Summarize this part of a document in a few sentences. "
+    "Keep names, numbers, dates and conclusions.\n\n"
+)
+COMBINE_INSTRUCTION = (
+    "Combine these summaries of consecutive parts of one document into a single summary. "
+    "Keep names, numbers, dates and conclusions.\n\n"
+)
+
+
+def build_summary_prompt(text: str) -> str:
+    """Single-turn prompt asking for a summary of one document chunk"""
+    return build_prompt(SUMMARY_INSTRUCTION + text.strip())
+
+
+def build_combine_prompt(summaries) -> str:
+    """Single-turn prompt merging chunk summaries, in document order"""
+    return build_prompt(COMBINE_INSTRUCTION + "\n\n".join(s.strip() for s in summaries))
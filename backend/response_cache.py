@@ -0,0 +1,176 @@
+"""
+File: response_cache.py
+Purpose: Content-addressed cache of deterministic generations (memory LRU + disk)
+"""
+
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from hashing import text_hash
+
+logger = logging.getLogger(__name__)
+
+
+def is_deterministic(params: Dict[str, Any]) -> bool:
+    """Greedy decoding or a fixed seed reproduces the same output for the same input"""
+    return params.get("temperature") == 0 or params.get("seed") is not None
+
+
+def cache_key(model_fingerprint: str, prompt: str, params: Dict[str, Any], stop: List[str]) -> str:
+    """Hash everything that influences the generated text"""
+    material = json.dumps(
+        {"model": model_fingerprint, "prompt": prompt, "params": params, "stop": stop},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return text_hash(material)
+
+
+class ResponseCache:
+    """
+    Two-level cache of generation results keyed by ``cache_key``
+
+    Recent entries live in an in-memory LRU of ``max_entries``; every entry
+    is also written as a small JSON file so hits survive restarts. The disk
+    tier is bounded by ``max_bytes`` (least recently used files go first)
+    and entries older than ``max_age_seconds`` are treated as misses.
+
+    ``get`` and ``put`` may read and write files; async callers run them
+    with ``asyncio.to_thread``.
+    """
+
+    def __init__(self, cache_dir: Path, max_entries: int, max_bytes: int, max_age_seconds: float):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # key -> file size, ordered least to most recently used
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._scan_disk()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _scan_disk(self):
+        """Index existing cache files, oldest first"""
+        if not self.cache_dir.exists():
+            return
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry.get("created_at", 0) > self.max_age_seconds
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for ``key``, or None on a miss"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            on_disk = key in self._disk
+
+        if entry is None and on_disk:
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = None
+
+        if entry is None or self._expired(entry):
+            if entry is not None:
+                self._remove(key)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self._remember(key, entry)
+            if key in self._disk:
+                self._disk.move_to_end(key)
+        return entry["result"]
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """Store a generation result in memory and on disk"""
+        # A private copy: callers keep annotating the result they return to the client
+        entry = {"created_at": time.time(), "result": copy.deepcopy(result)}
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path = self._path(key)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"⚠️ Failed to write response cache entry: {e}")
+            with self._lock:
+                self._remember(key, entry)
+            return
+
+        with self._lock:
+            self._remember(key, entry)
+            self._disk_bytes += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            stale = []
+            while self._disk_bytes > self.max_bytes and len(self._disk) > 1:
+                old_key, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                self._memory.pop(old_key, None)
+                stale.append(old_key)
+            self.evictions += len(stale)
+
+        for old_key in stale:
+            self._path(old_key).unlink(missing_ok=True)
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        """Insert into the memory LRU (caller holds lock)"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _remove(self, key: str):
+        """Drop an expired entry from both tiers"""
+        with self._lock:
+            self._memory.pop(key, None)
+            self._disk_bytes -= self._disk.pop(key, 0)
+            self.evictions += 1
+        self._path(key).unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and sizes for status reporting"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "disk_mb": round(self._disk_bytes / (1024 ** 2), 2),
+            }
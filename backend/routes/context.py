@@ -3,26 +3,203 @@ File: context.py
 Purpose: Handle file uploads and context management for MONAD
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
+import hashlib
 import os
-import uuid
-from typing import Dict, Any
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
 from pathlib import Path
-from datetime import datetime
 import logging
+from config import Config
+from context_indexer import ContextIndexer
+from context_packing import get_tokenizer
+from context_store import ContextStore
+from dependencies import get_llm_runner, get_text_extractor
+from extraction import read_text
+from summarization import SummaryCache, Summarizer
 from paths import get_data_dir, ensure_app_dirs
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-ensure_app_dirs()
-# Create data directory if it doesn't exist (OS-specific app data dir by default)
+# OS-specific app data dir by default; created on first upload rather than at import
 DATA_ROOT = Path(os.getenv("DATA_DIR", get_data_dir())).resolve()
 CONTEXT_DIR = DATA_ROOT / "context"
 
-CONTEXT_DIR.mkdir(parents=True, exist_ok=True)
+def _ensure_context_dir():
+    """Create the context directory if it doesn't exist"""
+    ensure_app_dirs()
+    CONTEXT_DIR.mkdir(parents=True, exist_ok=True)
+
+_context_store: Optional[ContextStore] = None
+
+def get_context_store() -> ContextStore:
+    """Content-addressed store for CONTEXT_DIR, opened on first use"""
+    global _context_store
+    if _context_store is None or _context_store.root != CONTEXT_DIR:
+        _ensure_context_dir()
+        _context_store = ContextStore(CONTEXT_DIR)
+    return _context_store
+
+_context_indexer: Optional[ContextIndexer] = None
+
+def get_context_indexer() -> ContextIndexer:
+    """Chunk and embedding indexer for the context store, created on first use"""
+    global _context_indexer
+    store = get_context_store()
+    if _context_indexer is None or _context_indexer.directory != CONTEXT_DIR / "index":
+        stop_context_indexer()
+        embedder = None
+        if Config.EMBEDDING_MODEL_PATH:
+            if Path(Config.EMBEDDING_MODEL_PATH).exists():
+                from embedding_index import Embedder
+
+                embedder = Embedder(Config.EMBEDDING_MODEL_PATH, n_threads=Config.EMBEDDING_N_THREADS)
+            else:
+                logger.warning(f"⚠️ Embedding model not found, semantic search disabled: {Config.EMBEDDING_MODEL_PATH}")
+        _context_indexer = ContextIndexer(
+            CONTEXT_DIR / "index",
+            store.object_path,
+            embedder=embedder,
+            chunk_chars=Config.CONTEXT_CHUNK_CHARS,
+            chunk_overlap=Config.CONTEXT_CHUNK_OVERLAP,
+            ivf_threshold=Config.EMBEDDING_IVF_THRESHOLD,
+            on_indexed=lambda sha256, chunks: store.set_status(sha256, index="indexed", chunks=chunks)
+        )
+    return _context_indexer
+
+def _on_extracted(source: Path, job: Dict[str, Any]):
+    """Record an extraction result in the catalog and index the text once it is ready"""
+    get_context_store().set_status(source.name, extraction=job["status"], extraction_error=job.get("error"))
+    if job["status"] == "completed":
+        get_context_indexer().submit(source)
+
+def stop_context_indexer():
+    """Stop background indexing if it was started"""
+    global _context_indexer
+    if _context_indexer is not None:
+        _context_indexer.shutdown()
+        _context_indexer = None
+
+_summarizer: Optional[Summarizer] = None
+
+def get_summarizer() -> Summarizer:
+    """Map-reduce summarizer for context files, created on first use"""
+    global _summarizer
+    path = CONTEXT_DIR / "summaries.db"
+    if _summarizer is None or _summarizer.cache.path != path:
+        stop_summarizer()
+        _ensure_context_dir()
+        _summarizer = Summarizer(SummaryCache(path), Config.MODEL_CONTEXT_SIZE, Config.SUMMARY_MAX_TOKENS)
+    return _summarizer
+
+def stop_summarizer():
+    """Cancel running summaries and close the summary cache"""
+    global _summarizer
+    if _summarizer is not None:
+        _summarizer.shutdown()
+        _summarizer.cache.close()
+        _summarizer = None
+
+# Uploads are copied in chunks of this size, so memory per upload stays bounded
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Bytes kept from the start of a file for the text preview (500 chars of UTF-8)
+PREVIEW_BYTES = 2048
+ALLOWED_TYPES = [".pdf", ".docx", ".txt"]
+ALLOWED_MIME = ["application/pdf", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", "text/plain"]
+
+class _FileTooLarge(Exception):
+    """Raised while copying an upload that exceeds the size limit"""
+
+def _validate_upload(file: UploadFile) -> str:
+    """Check the filename and type of an upload, returning its extension"""
+    # Validate filename (no traversal)
+    if not file.filename or "/" in file.filename or "\\" in file.filename or ".." in file.filename:
+        raise HTTPException(status_code=400, detail="Invalid filename")
+
+    file_ext = os.path.splitext(file.filename)[1].lower()
+    if file_ext not in ALLOWED_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File type {file_ext} not supported. Allowed: {ALLOWED_TYPES}"
+        )
+    if file.content_type and file.content_type not in ALLOWED_MIME:
+        raise HTTPException(status_code=400, detail="Unsupported content type")
+    return file_ext
+
+def _copy_upload(source: BinaryIO, destination: Path, max_bytes: int) -> Tuple[int, bytes, str]:
+    """
+    Copy an upload to ``destination`` in fixed-size chunks (runs in a worker thread)
+
+    The partial file is removed if the upload exceeds ``max_bytes``.
+
+    Returns:
+        Number of bytes written, the first PREVIEW_BYTES of the file and
+        the SHA-256 hex digest of its contents
+    """
+    size = 0
+    head = b""
+    digest = hashlib.sha256()
+    try:
+        with open(destination, "wb") as out:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _FileTooLarge()
+                if len(head) < PREVIEW_BYTES:
+                    head += chunk[:PREVIEW_BYTES - len(head)]
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        destination.unlink(missing_ok=True)
+        raise
+    return size, head, digest.hexdigest()
+
+async def _store_upload(file: UploadFile) -> Dict[str, Any]:
+    """
+    Validate and save one uploaded file, returning its context metadata
+
+    The file is streamed to a temporary name while it is hashed, then added
+    to the content-addressed store: content that is already stored only
+    gets a new context id referencing it, and the copy is discarded. Text
+    extraction is queued in the background; its status is returned under
+    ``extraction``.
+    """
+    file_ext = _validate_upload(file)
+    max_bytes = int(os.getenv("MAX_CONTEXT_FILE_MB", "10")) * 1024 * 1024
+
+    # Save file locally (never leaves device)
+    store = get_context_store()
+    tmp_path = store.incoming_path()
+    try:
+        size, head, sha256 = await run_in_threadpool(_copy_upload, file.file, tmp_path, max_bytes)
+    except _FileTooLarge:
+        raise HTTPException(status_code=413, detail="File too large")
+
+    # PDF/DOCX previews come from the extraction job status once it completes
+    text_content = ""
+    if file_ext == ".txt":
+        # The preview may end mid-character; drop the fragment
+        text_content = head.decode("utf-8", errors="ignore")
+
+    text_preview = text_content[:500] + "..." if len(text_content) > 500 else text_content
+    try:
+        metadata = await run_in_threadpool(store.add, tmp_path, sha256, size, file.filename, file_ext, text_preview)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    # Chunked and embedded for retrieval once the text is extracted
+    metadata["extraction"] = await run_in_threadpool(
+        get_text_extractor().submit, store.object_path(sha256), file_ext, _on_extracted
+    )
+    logger.info("Context file uploaded (size=%s bytes, deduplicated=%s)", size, metadata["deduplicated"])
+    return metadata
 
 @router.post("/upload")
 async def upload_context_file(file: UploadFile = File(...)):
@@ -36,102 +213,291 @@ async def upload_context_file(file: UploadFile = File(...)):
         JSON response with context ID and summary
     """
     try:
-        # Validate filename (no traversal)
-        if "/" in file.filename or "\\" in file.filename or ".." in file.filename:
-            raise HTTPException(status_code=400, detail="Invalid filename")
-
-        # Validate file type and size
-        allowed_types = [".pdf", ".docx", ".txt"]
-        allowed_mime = ["application/pdf", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", "text/plain"]
-        file_ext = os.path.splitext(file.filename)[1].lower()
-        if file_ext not in allowed_types:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File type {file_ext} not supported. Allowed: {allowed_types}"
-            )
-        if file.content_type and file.content_type not in allowed_mime:
-            raise HTTPException(status_code=400, detail="Unsupported content type")
-        max_bytes = int(os.getenv("MAX_CONTEXT_FILE_MB", "10")) * 1024 * 1024
-        
-        # Generate unique context ID
-        context_id = str(uuid.uuid4())
-        
-        # Save file locally (never leaves device)
-        file_path = CONTEXT_DIR / f"{context_id}{file_ext}"
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            if len(content) > max_bytes:
-                raise HTTPException(status_code=413, detail="File too large")
-            buffer.write(content)
-        
-        # Extract text based on file type
-        text_content = ""
-        if file_ext == ".txt":
-            text_content = content.decode("utf-8")
-        elif file_ext in {".pdf", ".docx"}:
-            # Placeholder until full parsing is added; avoid misleading text
-            text_content = ""
-        
-        # Store context metadata
-        context_metadata = {
-            "context_id": context_id,
-            "filename": file.filename,
-            "file_type": file_ext,
-            "file_size": len(content),
-            "text_preview": text_content[:500] + "..." if len(text_content) > 500 else text_content,
-            "uploaded_at": datetime.utcnow().isoformat() + "Z",
-        }
-        
-        logger.info("Context file uploaded (size=%s bytes)", len(content))
+        context_metadata = await _store_upload(file)
         
         return JSONResponse(content={
             "success": True,
-            "context_id": context_id,
+            "context_id": context_metadata["context_id"],
             "summary": f"File '{file.filename}' imported successfully",
             "metadata": context_metadata
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading context file: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
+@router.post("/upload/batch")
+async def upload_context_files(files: List[UploadFile] = File(...)):
+    """
+    Upload several context files in one request (e.g. a folder import)
+    
+    Each file is validated and stored independently; one rejected file does
+    not fail the others.
+    
+    Args:
+        files: The uploaded files
+        
+    Returns:
+        JSON response with a result per file, in upload order
+    """
+    max_files = int(os.getenv("MAX_CONTEXT_BATCH_FILES", "100"))
+    if len(files) > max_files:
+        raise HTTPException(status_code=400, detail=f"Too many files (maximum {max_files})")
+    
+    results = []
+    for file in files:
+        try:
+            context_metadata = await _store_upload(file)
+            results.append({
+                "success": True,
+                "filename": file.filename,
+                "context_id": context_metadata["context_id"],
+                "metadata": context_metadata
+            })
+        except HTTPException as e:
+            results.append({"success": False, "filename": file.filename, "status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            logger.error(f"Error uploading context file: {str(e)}")
+            results.append({"success": False, "filename": file.filename, "status_code": 500, "detail": f"Error processing file: {str(e)}"})
+    
+    imported = sum(1 for result in results if result["success"])
+    logger.info("Context batch uploaded (%s of %s files)", imported, len(results))
+    return JSONResponse(content={
+        "success": imported == len(results),
+        "imported": imported,
+        "failed": len(results) - imported,
+        "results": results
+    })
+
 @router.get("/list")
-async def list_context_files():
+async def list_context_files(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, max_length=1024),
+    sort: str = Query("uploaded_at", pattern="^(uploaded_at|filename|file_size)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    include_total: bool = Query(False, description="Also count all files on pages after the first")
+):
     """
-    List all uploaded context files
+    List uploaded context files, one page at a time
+    
+    Pass the returned ``next_cursor`` back as ``cursor`` to get the next
+    page; it is null on the last page. Pages stay consistent while files
+    are uploaded or deleted (no entry is repeated or skipped). ``total``
+    is only counted for the first page (or with ``include_total``) and is
+    null otherwise, so later pages cost the same however many files exist.
     
+    Args:
+        limit: Page size
+        cursor: Cursor from the previous page
+        sort: ``uploaded_at``, ``filename`` or ``file_size``
+        order: ``asc`` or ``desc``
+        include_total: Count all files even when ``cursor`` is given
+        
     Returns:
-        JSON response with list of context files
+        JSON response with the page of context files, the total count and the next cursor
     """
+    store = get_context_store()
     try:
-        context_files = []
-        
-        if CONTEXT_DIR.exists():
-            for filename in os.listdir(CONTEXT_DIR):
-                file_path = CONTEXT_DIR / filename
-                if file_path.is_file():
-                    stat = file_path.stat()
-                    context_files.append({
-                        "filename": filename,
-                        "file_size": stat.st_size,
-                        "uploaded_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat() + "Z"
-                    })
-        
+        context_files, next_cursor = await run_in_threadpool(store.list, limit, cursor, sort, order == "desc")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        total = None
+        if not cursor and next_cursor is None:
+            # A single page holds every file
+            total = len(context_files)
+        elif not cursor or include_total:
+            total = await run_in_threadpool(store.catalog.count)
         return JSONResponse(content={
             "success": True,
             "files": context_files,
-            "count": len(context_files)
+            "count": len(context_files),
+            "total": total,
+            "next_cursor": next_cursor
         })
         
     except Exception as e:
         logger.error(f"Error listing context files: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error listing files: {str(e)}")
 
+def _search(query: str, limit: int, mode: str) -> List[Dict[str, Any]]:
+    """Run a context search and attach the context ids of each hit (blocking)"""
+    store = get_context_store()
+    indexer = get_context_indexer()
+    if mode == "semantic":
+        hits = indexer.semantic_search(query, limit)
+        for hit in hits:
+            text = hit.pop("text")
+            hit["snippet"] = text[:300] + "…" if len(text) > 300 else text
+    else:
+        hits = indexer.lexical_search(query, limit)
+
+    results = []
+    for hit in hits:
+        context_ids = store.context_ids_for(hit["doc_key"])
+        if not context_ids:
+            continue
+        ref = store.get(context_ids[0]) or {}
+        results.append({
+            "context_ids": context_ids,
+            "filename": ref.get("filename"),
+            "chunk": hit["chunk"],
+            "score": round(hit["score"], 4),
+            "snippet": hit["snippet"],
+        })
+    return results
+
+@router.get("/search")
+async def search_context(
+    q: str = Query(..., min_length=1, max_length=1000),
+    limit: int = Query(10, ge=1, le=50),
+    mode: str = Query("lexical", pattern="^(lexical|semantic)$")
+):
+    """
+    Search uploaded context files
+    
+    ``lexical`` ranks chunks by BM25 keyword relevance ("quoted phrases"
+    match exactly) and highlights matches in the snippet with ``**``;
+    ``semantic`` ranks by embedding similarity and needs
+    EMBEDDING_MODEL_PATH.
+    
+    Args:
+        q: Search query
+        limit: Maximum number of results
+        mode: ``lexical`` or ``semantic``
+        
+    Returns:
+        JSON response with ranked snippets and the context ids they come from
+    """
+    if mode == "semantic" and get_context_indexer().embeddings is None:
+        raise HTTPException(status_code=400, detail="Semantic search needs EMBEDDING_MODEL_PATH to be configured")
+    try:
+        results = await run_in_threadpool(_search, q, limit, mode)
+        return JSONResponse(content={
+            "success": True,
+            "query": q,
+            "mode": mode,
+            "results": results,
+            "count": len(results)
+        })
+    except Exception as e:
+        logger.error(f"Error searching context files: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error searching files: {str(e)}")
+
+@router.get("/{context_id}/status")
+async def get_context_status(context_id: str):
+    """
+    Text extraction status for a context file
+    
+    ``status`` is ``pending``, ``running``, ``completed`` or ``failed``;
+    ``pages_done``/``pages_total`` report progress (paragraphs for DOCX)
+    and completed jobs include a ``text_preview``. ``index`` reports
+    whether the text has been chunked and embedded for retrieval.
+    
+    Args:
+        context_id: The context ID returned by the upload
+        
+    Returns:
+        JSON response with the extraction job status
+    """
+    store = get_context_store()
+    ref = await run_in_threadpool(store.get, context_id)
+    if ref is None:
+        raise HTTPException(status_code=404, detail="Context file not found")
+    
+    source = store.object_path(ref["sha256"])
+    extractor = get_text_extractor()
+    indexer = get_context_indexer()
+    job = await run_in_threadpool(extractor.status, source)
+    if job is None or job["status"] == "completed":
+        # Picks up files extracted or uploaded before a restart; no-op once indexed
+        submitted = await run_in_threadpool(extractor.submit, source, ref["file_type"], _on_extracted)
+        job = job or submitted
+    
+    return JSONResponse(content={
+        "success": True,
+        "context_id": context_id,
+        "extraction": job,
+        "index": indexer.status(ref["sha256"])
+    })
+
+@router.post("/{context_id}/summary", status_code=202)
+async def summarize_context_file(context_id: str):
+    """
+    Start summarizing a context file in the background
+    
+    Works for documents of any length: the text is summarized in chunks
+    that fit the context window, then the chunk summaries are combined.
+    Generation runs at batch priority, so interactive requests are served
+    in between. Summaries are cached per chunk, so summarizing again (or
+    an edited copy of the document) only generates what changed.
+    
+    Args:
+        context_id: The context ID returned by the upload
+        
+    Returns:
+        JSON response with the job status; poll GET on the same path for progress
+    """
+    store = get_context_store()
+    ref = await run_in_threadpool(store.get, context_id)
+    if ref is None:
+        raise HTTPException(status_code=404, detail="Context file not found")
+    
+    llm_runner = get_llm_runner()
+    if not llm_runner or not llm_runner.is_initialized:
+        raise HTTPException(status_code=503, detail="LLM model not loaded", headers={"Retry-After": "10"})
+    
+    source = store.object_path(ref["sha256"])
+    text = await run_in_threadpool(read_text, source)
+    if text is None:
+        job = await run_in_threadpool(get_text_extractor().status, source)
+        if job and job["status"] == "failed":
+            raise HTTPException(status_code=422, detail=f"No text could be extracted from {ref['filename']}: {job['error']}")
+        raise HTTPException(
+            status_code=409,
+            detail=f"Context file {context_id} is still being processed. Check /api/context/{context_id}/status.",
+            headers={"Retry-After": "2"}
+        )
+    
+    job = get_summarizer().start(ref["sha256"], text, llm_runner, get_tokenizer(llm_runner.model_path))
+    return JSONResponse(status_code=202, content={"success": True, "context_id": context_id, "summary": job})
+
+@router.get("/{context_id}/summary")
+async def get_context_summary(context_id: str):
+    """
+    Progress or result of summarizing a context file
+    
+    ``status`` is ``pending``, ``running``, ``completed``, ``failed`` or
+    ``cancelled``. While running, ``phase`` is ``map`` (``chunks_done`` of
+    ``chunks_total``) or ``reduce`` (``groups_done`` of ``groups_total`` at
+    ``reduce_level``); ``cached`` counts summaries taken from the cache.
+    
+    Args:
+        context_id: The context ID returned by the upload
+        
+    Returns:
+        JSON response with the job status and, once completed, the summary
+    """
+    store = get_context_store()
+    ref = await run_in_threadpool(store.get, context_id)
+    if ref is None:
+        raise HTTPException(status_code=404, detail="Context file not found")
+    job = get_summarizer().status(ref["sha256"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="No summary has been requested for this file")
+    return JSONResponse(content={"success": True, "context_id": context_id, "summary": job})
+
 @router.delete("/{context_id}")
 async def delete_context_file(context_id: str):
     """
     Delete a context file
     
+    Removes the context id; the stored content is deleted once no other
+    context id references it.
+    
     Args:
         context_id: The context ID to delete
         
@@ -139,18 +505,19 @@ async def delete_context_file(context_id: str):
         JSON response confirming deletion
     """
     try:
-        # Find file with this context ID
-        deleted = False
-        if CONTEXT_DIR.exists():
-            for filename in os.listdir(CONTEXT_DIR):
-                if filename.startswith(context_id):
-                    file_path = CONTEXT_DIR / filename
-                    file_path.unlink(missing_ok=True)
-                    deleted = True
-                    break
+        store = get_context_store()
+        ref = await run_in_threadpool(store.get, context_id)
+        deleted = ref is not None and await run_in_threadpool(store.delete, context_id)
         
         if not deleted:
             raise HTTPException(status_code=404, detail="Context file not found")
+        if not store.object_path(ref["sha256"]).exists():
+            # That was the last reference to this content
+            get_text_extractor().forget(store.object_path(ref["sha256"]))
+            await run_in_threadpool(get_context_indexer().remove, ref["sha256"])
+            summarizer = get_summarizer()
+            summarizer.forget(ref["sha256"])
+            await run_in_threadpool(summarizer.cache.forget, ref["sha256"])
         
         logger.info(f"Context file deleted: {context_id}")
         
@@ -159,6 +526,8 @@ async def delete_context_file(context_id: str):
             "message": f"Context file {context_id} deleted successfully"
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error deleting context file: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error deleting file: {str(e)}")
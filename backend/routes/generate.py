@@ -3,91 +3,458 @@ File: generate.py
 Purpose: API endpoint for text generation using the LLM
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel, Field
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, Dict, List, Optional, Literal
+import asyncio
+import json
 import logging
+import time
 
-from dependencies import get_llm_runner
+from cancellation import CancelToken, cancel_on_disconnect
+from context_packing import get_tokenizer, pack_context
+from dependencies import get_llm_runner, get_model_registry, get_text_extractor
 from config import Config
+from inference_worker import QueueFullError
+from model_registry import ModelBudgetError, ModelNotFoundError
+import metrics
+from prompts import SYSTEM_PROMPT, build_prompt, build_turn  # SYSTEM_PROMPT kept importable from here
+from routes.context import get_context_indexer, get_context_store
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Define MONAD's behaviour and identity
-SYSTEM_PROMPT = """You are MONAD — a fully offline AI assistant running locally on this user's device.
-You never use the internet, you never send data externally, and you always respond directly and clearly.
-Your responses should be concise, factual, and grounded.
-If asked "who are you", explain that you are MONAD, a local AI model operating entirely offline.
-If asked simple arithmetic (like "what is 2+2"), answer with the exact result only.
-Avoid phrases such as "in the given material" or "in the article".
-Do not use filler words or defer questions. You are confident, precise, and local.
-"""
-
-class GenerateRequest(BaseModel):
-    """Request model for text generation"""
+class GenerationParams(BaseModel):
+    """Prompt and sampling parameters shared by single and batch generation"""
     prompt: str = Field(..., description="Input prompt for generation", min_length=1, max_length=2000)
     max_tokens: Optional[int] = Field(None, description="Maximum tokens to generate", ge=1, le=1024)
     temperature: Optional[float] = Field(None, description="Sampling temperature", ge=0.0, le=2.0)
     top_p: Optional[float] = Field(None, description="Top-p sampling parameter", ge=0.0, le=1.0)
     repeat_penalty: Optional[float] = Field(None, description="Repeat penalty", ge=0.0, le=2.0)
+    seed: Optional[int] = Field(None, description="Sampling seed for reproducible output", ge=0)
+    bypass_cache: bool = Field(False, description="Always run the model, even for a cached deterministic prompt")
+    timeout_ms: Optional[int] = Field(
+        None,
+        description="Deadline in milliseconds from when the request was received; partial text is returned when it expires",
+        ge=1,
+        le=3_600_000
+    )
+
+class GenerateRequest(GenerationParams):
+    """Request model for text generation"""
+    session_id: Optional[str] = Field(
+        None,
+        description="Conversation id; the prompt is appended to this session's history",
+        min_length=1,
+        max_length=64,
+        pattern=r"^[A-Za-z0-9_.-]+$"
+    )
+    model: Optional[str] = Field(
+        None,
+        description="Model to use (GGUF file name without extension); defaults to the active model",
+        min_length=1,
+        max_length=128
+    )
+    context_ids: Optional[List[str]] = Field(
+        None,
+        description="Uploaded context files to answer from; the most relevant passages are added to the prompt",
+        min_length=1,
+        max_length=20
+    )
+
+    @model_validator(mode="after")
+    def _context_without_session(self):
+        # Session prompts are trimmed against the conversation history, which context packing does not account for
+        if self.context_ids and self.session_id:
+            raise ValueError("context_ids cannot be combined with session_id")
+        return self
+
+class BatchItem(GenerationParams):
+    """One prompt of a batch generation request"""
+    id: Optional[str] = Field(None, description="Caller-supplied id echoed back with this item's result", max_length=128)
+
+class BatchRequest(BaseModel):
+    """Request model for batch generation"""
+    items: List[BatchItem] = Field(..., description="Prompts to generate, in order", min_length=1, max_length=Config.BATCH_MAX_ITEMS)
+    model: Optional[str] = Field(
+        None,
+        description="Model to use (GGUF file name without extension); defaults to the active model",
+        min_length=1,
+        max_length=128
+    )
 
 class GenerateResponse(BaseModel):
     """Response model for text generation"""
     response: str
     metadata: dict
 
+def _require_runner(llm_runner):
+    """Raise 503 unless the LLM runner is ready for inference"""
+    if llm_runner and not llm_runner.is_initialized and getattr(llm_runner, "is_initializing", False):
+        raise HTTPException(
+            status_code=503,
+            detail="LLM model is still loading. Check /api/health for progress and retry shortly.",
+            headers={"Retry-After": "10"}
+        )
+    if not llm_runner or not llm_runner.is_initialized:
+        model_path = getattr(llm_runner, "model_path", None) or Config.MODEL_PATH
+        raise HTTPException(
+            status_code=503, 
+            detail=f"LLM model not loaded. Model file expected at: {model_path}. Please download the model following MODEL_SETUP.md instructions."
+        )
+
+def _select_runner(request):
+    """
+    Runner for the requested model, or the current default model
+    
+    Resolved inside the handler, right before work is submitted. The
+    runner is held in the registry until _release_runner(), so it cannot
+    be unloaded while the request is being prepared or generated.
+    """
+    model_registry = get_model_registry()
+    if not request.model:
+        llm_runner = get_llm_runner()
+    else:
+        if not model_registry:
+            raise HTTPException(status_code=404, detail=f"Model not found: {request.model}")
+        try:
+            llm_runner = model_registry.acquire(request.model)
+        except ModelNotFoundError:
+            raise HTTPException(status_code=404, detail=f"Model not found: {request.model}")
+        except ModelBudgetError as e:
+            raise HTTPException(status_code=507, detail=str(e))
+    _require_runner(llm_runner)
+    if model_registry:
+        model_registry.hold(llm_runner)
+    return llm_runner
+
+def _release_runner(llm_runner):
+    """End the hold taken by _select_runner"""
+    model_registry = get_model_registry()
+    if model_registry and llm_runner:
+        model_registry.release(llm_runner)
+
+def _generation_kwargs(request: GenerationParams, parent: Optional[CancelToken] = None) -> dict:
+    """Prompt, sampling parameters and cancellation token passed through to the LLM runner"""
+    kwargs = {
+        "prompt": build_prompt(request.prompt),
+        "max_tokens": min(request.max_tokens or Config.MAX_TOKENS, Config.MAX_TOKENS),
+        "temperature": request.temperature,
+        "top_p": request.top_p,
+        "repeat_penalty": request.repeat_penalty,
+        "seed": request.seed,
+        "use_cache": not request.bypass_cache,
+        "cancel": CancelToken(request.timeout_ms, parent)
+    }
+    if getattr(request, "session_id", None):
+        # The runner prepends the session's history to the new turn
+        kwargs["prompt"] = build_turn(request.prompt)
+        kwargs["session_id"] = request.session_id
+    return kwargs
+
+async def _ground_in_context(request: GenerateRequest, llm_runner, kwargs: dict) -> Optional[Dict[str, Any]]:
+    """
+    Replace the prompt with one carrying passages from ``request.context_ids``
+    
+    Passages are retrieved by keyword and embedding similarity to the
+    prompt, then packed by token count so the prompt plus ``max_tokens``
+    fit the context window.
+    
+    Returns:
+        Metadata describing the packed passages, or None without context_ids
+    """
+    if not request.context_ids:
+        return None
+    
+    store = get_context_store()
+    indexer = get_context_indexer()
+    extractor = get_text_extractor()
+    doc_refs: Dict[str, Dict[str, Any]] = {}
+    for context_id in dict.fromkeys(request.context_ids):
+        ref = await run_in_threadpool(store.get, context_id)
+        if ref is None:
+            raise HTTPException(status_code=404, detail=f"Context file not found: {context_id}")
+        doc_key = ref["sha256"]
+        if not indexer.is_indexed(doc_key):
+            job = await run_in_threadpool(extractor.status, store.object_path(doc_key))
+            if job and job["status"] == "failed":
+                raise HTTPException(status_code=422, detail=f"No text could be extracted from {ref['filename']}: {job['error']}")
+            raise HTTPException(
+                status_code=409,
+                detail=f"Context file {context_id} is still being processed. Check /api/context/{context_id}/status.",
+                headers={"Retry-After": "2"}
+            )
+        doc_refs.setdefault(doc_key, ref)
+    
+    chunks = await run_in_threadpool(
+        indexer.hybrid_search, request.prompt, Config.CONTEXT_RETRIEVAL_CHUNKS, list(doc_refs)
+    )
+    for chunk in chunks:
+        chunk["source"] = f"{doc_refs[chunk['doc_key']]['filename']} (part {chunk['chunk'] + 1})"
+    packed = await run_in_threadpool(
+        pack_context,
+        get_tokenizer(llm_runner.model_path),
+        request.prompt,
+        chunks,
+        Config.MODEL_CONTEXT_SIZE,
+        kwargs["max_tokens"]
+    )
+    kwargs["prompt"] = packed["prompt"]
+    return {
+        "passages": [
+            {
+                "context_id": doc_refs[chunk["doc_key"]]["context_id"],
+                "filename": doc_refs[chunk["doc_key"]]["filename"],
+                "chunk": chunk["chunk"],
+                "score": round(chunk["score"], 4)
+            }
+            for chunk in packed["used"]
+        ],
+        "dropped": packed["dropped"],
+        "context_tokens": packed["context_tokens"],
+        "budget_tokens": packed["budget_tokens"]
+    }
+
+def _queue_full_exception(error: QueueFullError, route: str) -> HTTPException:
+    """Translate a full inference queue into a 429 response"""
+    metrics.QUEUE_REJECTIONS.inc(route=route)
+    return HTTPException(
+        status_code=429,
+        detail={
+            "message": "Generation queue is full. Please retry shortly.",
+            "queue_depth": error.queue_depth,
+            "queue_position": error.queue_depth + 1,
+            "retry_after": error.retry_after
+        },
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
 @router.post("/generate", response_model=GenerateResponse)
 async def generate_text(
     request: GenerateRequest,
-    llm_runner = Depends(get_llm_runner)
+    http_request: Request
 ):
     """
     Generate text using the loaded LLM model
     
+    Generation stops early, returning the partial text, if the client
+    disconnects or ``timeout_ms`` expires. With ``context_ids`` the answer
+    is grounded in passages from those uploaded files, listed under
+    ``metadata.context``.
+    
     Args:
         request: Generation request parameters
-        llm_runner: LLM runner instance
+        http_request: Incoming HTTP request, watched for client disconnect
         
     Returns:
         Generated text response with metadata
     """
+    llm_runner = None
     try:
         logger.info("📝 Received generation request (prompt length: %s chars)", len(request.prompt))
         
-        # Validate LLM runner
-        if not llm_runner or not llm_runner.is_initialized:
-            model_path = Config.MODEL_PATH
-            raise HTTPException(
-                status_code=503, 
-                detail=f"LLM model not loaded. Model file expected at: {model_path}. Please download the model following MODEL_SETUP.md instructions."
-            )
+        # Select and validate the LLM runner
+        llm_runner = _select_runner(request)
         
-        # Construct structured prompt with system message
-        combined_prompt = f"{SYSTEM_PROMPT}\n\nUser: {request.prompt.strip()}\nAssistant:"
-        
-        # Generate response
-        result = await llm_runner.generate_response(
-            prompt=combined_prompt,
-            max_tokens=min(request.max_tokens or Config.MAX_TOKENS, Config.MAX_TOKENS),
-            temperature=request.temperature,
-            top_p=request.top_p,
-            repeat_penalty=request.repeat_penalty
-        )
+        # Generate response, stopping early if the client goes away
+        kwargs = _generation_kwargs(request)
+        context = await _ground_in_context(request, llm_runner, kwargs)
+        watcher = asyncio.create_task(cancel_on_disconnect(http_request, kwargs["cancel"]))
+        try:
+            result = await llm_runner.generate_response(**kwargs)
+        finally:
+            watcher.cancel()
+        if context:
+            result["metadata"]["context"] = context
+        metrics.record_generation("/api/generate", result["metadata"])
         
         logger.info("✅ Generation completed successfully")
         return GenerateResponse(**result)
         
     except HTTPException:
         raise
+    except QueueFullError as e:
+        raise _queue_full_exception(e, "/api/generate")
     except Exception as e:
         logger.error(f"❌ Generation failed: {str(e)}")
+        metrics.GENERATION_ERRORS.inc(route="/api/generate")
         raise HTTPException(
             status_code=500,
             detail=f"Generation failed: {str(e)}"
         )
+    finally:
+        _release_runner(llm_runner)
+
+def _sse_frame(event: str, data: dict) -> str:
+    """Encode one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _ndjson_frame(event: str, data: dict) -> str:
+    """Encode one newline-delimited JSON frame"""
+    return json.dumps({"type": event, **data}) + "\n"
+
+@router.post("/generate/stream")
+async def generate_text_stream(
+    request: GenerateRequest,
+    stream_format: Literal["sse", "ndjson"] = Query("sse", alias="format", description="Stream encoding: Server-Sent Events or NDJSON")
+):
+    """
+    Generate text and stream tokens to the client as they are decoded
+    
+    Each token is sent as a ``token`` frame; the last frame is ``done`` and
+    carries the same ``response`` and ``metadata`` as ``POST /generate``.
+    Failures after streaming has started are reported as an ``error`` frame.
+    Generation stops when the client disconnects or ``timeout_ms`` expires.
+    
+    Args:
+        request: Generation request parameters
+        stream_format: ``sse`` (text/event-stream) or ``ndjson`` (application/x-ndjson)
+        
+    Returns:
+        Streaming response of token frames
+    """
+    logger.info("📝 Received streaming generation request (prompt length: %s chars)", len(request.prompt))
+    llm_runner = _select_runner(request)
+    
+    kwargs = _generation_kwargs(request)
+    try:
+        context = await _ground_in_context(request, llm_runner, kwargs)
+        stream = await llm_runner.stream_response(**kwargs)
+    except HTTPException:
+        _release_runner(llm_runner)
+        raise
+    except QueueFullError as e:
+        _release_runner(llm_runner)
+        raise _queue_full_exception(e, "/api/generate/stream")
+    except Exception as e:
+        _release_runner(llm_runner)
+        logger.error(f"❌ Generation failed: {str(e)}")
+        metrics.GENERATION_ERRORS.inc(route="/api/generate/stream")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Generation failed: {str(e)}"
+        )
+    
+    encode = _sse_frame if stream_format == "sse" else _ndjson_frame
+    
+    async def frames():
+        try:
+            async for text in stream:
+                yield encode("token", {"text": text})
+            result = await stream.result()
+            if context:
+                result["metadata"]["context"] = context
+            metrics.record_generation("/api/generate/stream", result["metadata"])
+            yield encode("done", result)
+            logger.info("✅ Streaming generation completed successfully")
+        except Exception as e:
+            logger.error(f"❌ Streaming generation failed: {str(e)}")
+            metrics.GENERATION_ERRORS.inc(route="/api/generate/stream")
+            yield encode("error", {"detail": f"Generation failed: {str(e)}"})
+        finally:
+            # Reached early when the client disconnects; stops decoding for nobody
+            kwargs["cancel"].cancel()
+    
+    # Runs after the body is sent or the client has gone, even if frames() never started
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream" if stream_format == "sse" else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(_release_runner, llm_runner)
+    )
+
+@router.post("/generate/batch")
+async def generate_text_batch(
+    request: BatchRequest
+):
+    """
+    Generate a list of prompts, streaming each result as it completes
+    
+    Items run one at a time at low priority, so interactive requests are
+    served between them. The prompt prefix the items share is evaluated
+    once. The response is NDJSON: a ``result`` or ``error`` line per item
+    (with its ``index`` and ``id``), then a ``done`` summary line.
+    
+    Args:
+        request: Batch of prompts and their sampling parameters
+        
+    Returns:
+        Streaming NDJSON response of per-item results
+    """
+    logger.info("📝 Received batch generation request (%s items)", len(request.items))
+    llm_runner = _select_runner(request)
+    batch_cancel = CancelToken()
+    items = [_generation_kwargs(item, batch_cancel) for item in request.items]
+    
+    async def lines():
+        start = time.monotonic()
+        completed = failed = 0
+        try:
+            async for index, outcome in llm_runner.generate_batch(items, cancel=batch_cancel):
+                item_id = request.items[index].id
+                if isinstance(outcome, Exception):
+                    failed += 1
+                    metrics.GENERATION_ERRORS.inc(route="/api/generate/batch")
+                    yield _ndjson_frame("error", {"index": index, "id": item_id, "detail": f"Generation failed: {str(outcome)}"})
+                else:
+                    completed += 1
+                    metrics.record_generation("/api/generate/batch", outcome["metadata"])
+                    yield _ndjson_frame("result", {"index": index, "id": item_id, **outcome})
+        except Exception as e:
+            logger.error(f"❌ Batch generation failed: {str(e)}")
+            metrics.GENERATION_ERRORS.inc(route="/api/generate/batch")
+            yield _ndjson_frame("error", {"index": None, "id": None, "detail": f"Generation failed: {str(e)}"})
+        finally:
+            batch_cancel.cancel()
+        yield _ndjson_frame("done", {
+            "completed": completed,
+            "failed": failed,
+            "total_time": time.monotonic() - start
+        })
+        logger.info(f"✅ Batch generation finished ({completed} completed, {failed} failed)")
+    
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(_release_runner, llm_runner)
+    )
+
+@router.delete("/generate/sessions/{session_id}")
+async def delete_session(
+    session_id: str,
+    llm_runner = Depends(get_llm_runner)
+):
+    """
+    Discard a conversation session and its cached model state
+    
+    The session is removed from whichever loaded model holds it.
+    
+    Args:
+        session_id: The session to delete
+        
+    Returns:
+        Confirmation of deletion
+    """
+    runners = [llm_runner] if llm_runner else []
+    model_registry = get_model_registry()
+    if model_registry:
+        runners += [runner for runner in model_registry.runners().values() if runner is not llm_runner]
+    deleted = False
+    for runner in runners:
+        sessions = getattr(runner, "sessions", None)
+        if sessions and sessions.delete(session_id):
+            deleted = True
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    logger.info("🗑️ Session deleted")
+    return {"success": True, "message": f"Session {session_id} deleted"}
 
 @router.get("/generate/status")
 async def get_generation_status(
@@ -107,6 +474,9 @@ async def get_generation_status(
             }
         
         status = llm_runner.get_status()
+        model_registry = get_model_registry()
+        if model_registry:
+            status["models"] = model_registry.stats()
         return {
             "status": "ready" if status["initialized"] else "not_ready",
             "details": status
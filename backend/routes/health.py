@@ -4,14 +4,13 @@ Purpose: Health check endpoint for monitoring backend status
 """
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Dict, Any
 import logging
-import psutil
-import os
 from datetime import datetime
 
-from dependencies import get_llm_runner
+from dependencies import get_llm_runner, get_system_monitor
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -28,23 +27,21 @@ class HealthResponse(BaseModel):
 
 @router.get("/health", response_model=HealthResponse)
 async def health_check(
-    llm_runner = Depends(get_llm_runner)
+    llm_runner = Depends(get_llm_runner),
+    system_monitor = Depends(get_system_monitor)
 ):
     """
     Comprehensive health check endpoint
     
+    System figures come from the background sampler, so this is a cheap
+    read regardless of how often it is polled.
+    
     Returns:
         Health status with system and LLM information
     """
     try:
-        # Get system information (non-blocking)
-        system_info = {
-            "cpu_percent": psutil.cpu_percent(interval=0.1),  # Faster check
-            "memory_percent": psutil.virtual_memory().percent,
-            "disk_usage": psutil.disk_usage('/').percent,
-            "process_count": len(psutil.pids()),
-            "platform": os.uname().sysname if hasattr(os, 'uname') else "unknown"
-        }
+        # Latest background sample (no blocking psutil calls here)
+        system_info = dict(system_monitor.snapshot())
         
         # Get LLM status with defensive error handling
         llm_status = {}
@@ -57,7 +54,13 @@ async def health_check(
                 # Check if model is still initializing
                 if hasattr(llm_runner, 'is_initializing') and llm_runner.is_initializing:
                     overall_status = "booting"
-                    llm_status["message"] = "Loading Phi-3 Medium… this may take several minutes."
+                    boot = llm_status.get("boot") or {}
+                    progress = boot.get("progress")
+                    llm_status["message"] = (
+                        f"Loading Phi-3 Medium… {progress:.0%} ({boot.get('phase')}). This may take several minutes."
+                        if progress is not None else
+                        "Loading Phi-3 Medium… this may take several minutes."
+                    )
                 elif not llm_status.get("initialized", False):
                     overall_status = "degraded"
                     llm_status["message"] = "Model not loaded. Backend is operational but inference is unavailable."
@@ -83,15 +86,15 @@ async def health_check(
             overall_status = "degraded"
         
         # System health overrides
-        if system_info["memory_percent"] > 90:
+        if system_info.get("memory_percent", 0) > 90:
             overall_status = "warning"
-        if system_info["cpu_percent"] > 95:
+        if system_info.get("cpu_percent", 0) > 95:
             overall_status = "critical"
         
         return HealthResponse(
             status=overall_status,
             timestamp=datetime.now().isoformat(),
-            uptime=psutil.boot_time(),
+            uptime=system_info.get("process_uptime", 0),
             system_info=system_info,
             llm_status=llm_status
         )
@@ -119,3 +122,36 @@ async def simple_health_check():
         "message": "MONAD backend is running",
         "timestamp": datetime.now().isoformat()
     }
+
+@router.get("/health/live")
+async def liveness_check():
+    """
+    Liveness probe: the process is up and serving requests
+    
+    Touches nothing but the event loop, so it is safe to poll very frequently.
+    
+    Returns:
+        Minimal status response
+    """
+    return {"status": "alive"}
+
+@router.get("/health/ready")
+async def readiness_check(
+    llm_runner = Depends(get_llm_runner)
+):
+    """
+    Readiness probe: the model is loaded and generation requests will be served
+    
+    Returns:
+        200 with ``ready`` once the model is loaded; 503 with ``booting`` while
+        it loads or ``degraded`` if it is unavailable
+    """
+    if llm_runner and llm_runner.is_initialized:
+        worker = getattr(llm_runner, "worker", None)
+        return {
+            "status": "ready",
+            "queue_depth": worker.queue_depth if worker else 0
+        }
+    
+    status = "booting" if getattr(llm_runner, "is_initializing", False) else "degraded"
+    return JSONResponse(status_code=503, content={"status": status})
@@ -0,0 +1,91 @@
+"""
+File: metrics.py
+Purpose: Prometheus text-format metrics endpoint for the inference service
+"""
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+import logging
+import os
+
+from dependencies import get_llm_runner, get_model_registry
+from model_registry import model_name
+import metrics
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+_process = None
+
+def _process_rss() -> int:
+    """Resident memory of this process (psutil imported on first scrape)"""
+    global _process
+    if _process is None:
+        import psutil
+        _process = psutil.Process()
+    return _process.memory_info().rss
+
+def _resident_runners(llm_runner) -> dict:
+    """Every loaded (or loading) runner by model name, including the default"""
+    runners = {}
+    if llm_runner:
+        runners[model_name(llm_runner.model_path)] = llm_runner
+    model_registry = get_model_registry()
+    if model_registry:
+        runners.update(model_registry.runners())
+    return runners
+
+def _update_gauges(llm_runner):
+    """Refresh scrape-time gauges from runner bookkeeping (never touches the Llama object)"""
+    # The inference thread is shared by all models
+    worker = getattr(llm_runner, "worker", None)
+    metrics.QUEUE_DEPTH.set(worker.queue_depth if worker else 0)
+    metrics.INFERENCE_BUSY.set(1 if worker and worker.busy else 0)
+    metrics.PROCESS_RESIDENT_MEMORY.set(_process_rss())
+    
+    # Per-model gauges are rebuilt so unloaded models disappear from the scrape
+    for gauge in (metrics.MODEL_LOADED, metrics.MODEL_SIZE, metrics.CACHE_ENTRIES, metrics.CACHE_BYTES):
+        gauge.clear()
+    response_cache = None
+    for model, runner in _resident_runners(llm_runner).items():
+        metrics.MODEL_LOADED.set(1 if runner.is_initialized else 0, model=model)
+        model_path = getattr(runner, "model_path", None)
+        if model_path and os.path.exists(model_path):
+            metrics.MODEL_SIZE.set(os.path.getsize(model_path), model=model)
+        
+        response_cache = response_cache or getattr(runner, "response_cache", None)
+        
+        sessions = getattr(runner, "sessions", None)
+        if sessions:
+            stats = sessions.stats()
+            metrics.CACHE_ENTRIES.set(stats["resident"], model=model, cache="sessions", tier="memory")
+            metrics.CACHE_BYTES.set(stats["resident_bytes"], model=model, cache="sessions", tier="memory")
+    
+    # All models share one response cache, reported once without a model
+    if response_cache:
+        stats = response_cache.stats()
+        metrics.CACHE_ENTRIES.set(stats["memory_entries"], model="", cache="response", tier="memory")
+        metrics.CACHE_ENTRIES.set(stats["disk_entries"], model="", cache="response", tier="disk")
+        metrics.CACHE_BYTES.set(stats["disk_bytes"], model="", cache="response", tier="disk")
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(
+    llm_runner = Depends(get_llm_runner)
+):
+    """
+    Expose service metrics in the Prometheus text exposition format
+    
+    Returns:
+        Plain-text metrics (version 0.0.4 format)
+    """
+    try:
+        _update_gauges(llm_runner)
+    except Exception as e:
+        # Serve the counters we have rather than failing the scrape
+        logger.warning(f"⚠️ Failed to refresh metric gauges: {e}")
+    
+    return PlainTextResponse(
+        metrics.REGISTRY.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
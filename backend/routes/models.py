@@ -0,0 +1,114 @@
+"""
+File: models.py
+Purpose: API endpoints for listing, loading and switching local models
+"""
+
+from fastapi import APIRouter, HTTPException, Depends
+import logging
+
+from dependencies import get_model_registry
+from model_registry import ModelBudgetError, ModelNotFoundError
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+def _require_registry(model_registry):
+    """Raise 503 when no model is configured"""
+    if not model_registry:
+        raise HTTPException(status_code=503, detail="No model is configured")
+
+def _acquire(model_registry, name: str, activate: bool = False):
+    """Load (and optionally activate) a model, translating registry errors to HTTP"""
+    try:
+        if activate:
+            return model_registry.activate(name)
+        return model_registry.acquire(name)
+    except ModelNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model not found: {name}")
+    except ModelBudgetError as e:
+        raise HTTPException(status_code=507, detail=str(e))
+
+@router.get("/models")
+async def list_models(
+    model_registry = Depends(get_model_registry)
+):
+    """
+    List GGUF models in the models directory and which ones are loaded
+
+    Returns:
+        Models with residency and status, plus memory budget usage
+    """
+    _require_registry(model_registry)
+    return {
+        "models": model_registry.list_models(),
+        **model_registry.stats()
+    }
+
+@router.post("/models/{name}/load", status_code=202)
+async def load_model(
+    name: str,
+    model_registry = Depends(get_model_registry)
+):
+    """
+    Load a model in the background so later requests for it start immediately
+
+    Args:
+        name: Model name (GGUF file name without the extension)
+
+    Returns:
+        The model's load status
+    """
+    _require_registry(model_registry)
+    runner = _acquire(model_registry, name)
+    logger.info(f"📦 Load requested for model '{name}'")
+    return {"name": name, "status": runner.boot_phase}
+
+@router.post("/models/{name}/activate", status_code=202)
+async def activate_model(
+    name: str,
+    model_registry = Depends(get_model_registry)
+):
+    """
+    Make a model the default for requests that do not name one
+
+    The switch happens once the model has loaded; requests already running
+    on the previous default finish there.
+
+    Args:
+        name: Model name (GGUF file name without the extension)
+
+    Returns:
+        The model's load status and whether it is already the default
+    """
+    _require_registry(model_registry)
+    runner = _acquire(model_registry, name, activate=True)
+    return {
+        "name": name,
+        "status": runner.boot_phase,
+        "active": model_registry.default_name == name
+    }
+
+@router.delete("/models/{name}")
+async def unload_model(
+    name: str,
+    model_registry = Depends(get_model_registry)
+):
+    """
+    Unload a model once its in-flight requests have finished
+
+    Args:
+        name: Model name (GGUF file name without the extension)
+
+    Returns:
+        Confirmation of unloading
+    """
+    _require_registry(model_registry)
+    try:
+        unloaded = await model_registry.unload(name)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not unloaded:
+        raise HTTPException(status_code=404, detail=f"Model not loaded: {name}")
+    return {"success": True, "message": f"Model {name} unloaded"}
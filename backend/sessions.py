@@ -0,0 +1,187 @@
+"""
+File: sessions.py
+Purpose: Per-conversation llama.cpp state with LRU spill to compressed disk snapshots
+"""
+
+import logging
+import os
+import pickle
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from hashing import text_hash
+
+logger = logging.getLogger(__name__)
+
+# Bump when the spill layout changes so stale files are ignored
+_SNAPSHOT_VERSION = 1
+
+
+def state_nbytes(state: Any) -> int:
+    """Approximate resident size of a llama.cpp LlamaState snapshot"""
+    if state is None:
+        return 0
+    size = getattr(state, "llama_state_size", 0) or 0
+    for attr in ("scores", "input_ids"):
+        size += getattr(getattr(state, attr, None), "nbytes", 0) or 0
+    return size
+
+
+@dataclass
+class Session:
+    """A multi-turn conversation and the model state that produced it"""
+    session_id: str
+    # (user turn prompt, assistant reply) pairs, oldest first
+    turns: List[Tuple[str, str]] = field(default_factory=list)
+    # Token sequence held in the KV cache when ``state`` was captured
+    tokens: List[int] = field(default_factory=list)
+    state: Any = None
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def state_bytes(self) -> int:
+        return state_nbytes(self.state)
+
+
+class SessionStore:
+    """
+    LRU store of conversation sessions within a memory budget
+
+    Sessions whose KV snapshots do not fit in ``memory_budget_bytes`` are
+    evicted least-recently-used first to zlib-compressed files in
+    ``spill_dir`` and transparently reloaded on next access. Snapshots are
+    only valid for the model they were produced with, so spill files are
+    namespaced by model fingerprint.
+    """
+
+    def __init__(self, spill_dir: Path, memory_budget_bytes: int, model_fingerprint: str):
+        self.spill_dir = Path(spill_dir)
+        self.memory_budget_bytes = memory_budget_bytes
+        self.model_fingerprint = model_fingerprint
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.spills = 0
+        self.reloads = 0
+
+    def _spill_path(self, session_id: str) -> Path:
+        return self.spill_dir / f"{self.model_fingerprint[:16]}-{text_hash(session_id)[:32]}.session"
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """Return a session (reloading it from disk if spilled), or None if unknown"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                return session
+
+        session = self._load_spilled(session_id)
+        if session is not None:
+            self.put(session)
+        return session
+
+    def put(self, session: Session):
+        """Insert or refresh a session as most recently used, evicting cold ones"""
+        session.updated_at = time.time()
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._sessions.move_to_end(session.session_id)
+            evicted = self._select_evictions()
+
+        for cold in evicted:
+            self._spill(cold)
+
+    def delete(self, session_id: str) -> bool:
+        """Forget a session in memory and on disk"""
+        with self._lock:
+            removed = self._sessions.pop(session_id, None) is not None
+        path = self._spill_path(session_id)
+        if path.exists():
+            path.unlink(missing_ok=True)
+            removed = True
+        return removed
+
+    def spill_all(self):
+        """Write every resident session to disk (used on shutdown)"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            self._spill(session)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for status reporting"""
+        with self._lock:
+            resident = len(self._sessions)
+            resident_bytes = sum(s.state_bytes for s in self._sessions.values())
+        return {
+            "resident": resident,
+            "resident_bytes": resident_bytes,
+            "resident_mb": round(resident_bytes / (1024 ** 2), 1),
+            "memory_budget_mb": round(self.memory_budget_bytes / (1024 ** 2), 1),
+            "spills": self.spills,
+            "reloads": self.reloads,
+        }
+
+    def _select_evictions(self) -> List[Session]:
+        """Pop LRU sessions until resident snapshots fit the budget (caller holds lock)"""
+        evicted = []
+        total = sum(s.state_bytes for s in self._sessions.values())
+        # Always keep the most recent session resident, even if it alone exceeds the budget
+        while total > self.memory_budget_bytes and len(self._sessions) > 1:
+            _, cold = self._sessions.popitem(last=False)
+            total -= cold.state_bytes
+            evicted.append(cold)
+        return evicted
+
+    def _spill(self, session: Session):
+        """Write a session to a compressed snapshot file"""
+        try:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            payload = pickle.dumps(
+                {
+                    "version": _SNAPSHOT_VERSION,
+                    "session_id": session.session_id,
+                    "turns": session.turns,
+                    "tokens": session.tokens,
+                    "state": session.state,
+                },
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+            path = self._spill_path(session.session_id)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                # Level 1: most of the win for KV data at a fraction of the CPU cost
+                f.write(zlib.compress(payload, 1))
+            os.replace(tmp_path, path)
+            self.spills += 1
+            logger.info(f"💾 Session spilled to disk ({session.state_bytes / (1024 ** 2):.1f} MB in memory)")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to spill session, dropping its KV state: {e}")
+
+    def _load_spilled(self, session_id: str) -> Optional[Session]:
+        """Reload a spilled session, or None if there is no usable snapshot"""
+        path = self._spill_path(session_id)
+        if not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                payload = pickle.loads(zlib.decompress(f.read()))
+            if payload.get("version") != _SNAPSHOT_VERSION or payload.get("session_id") != session_id:
+                return None
+        except Exception as e:
+            logger.warning(f"⚠️ Ignoring unreadable session snapshot: {e}")
+            return None
+
+        path.unlink(missing_ok=True)
+        self.reloads += 1
+        return Session(
+            session_id=session_id,
+            turns=payload["turns"],
+            tokens=payload["tokens"],
+            state=payload["state"],
+        )
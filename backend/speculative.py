@@ -0,0 +1,197 @@
+"""
+File: speculative.py
+Purpose: Draft token sources for speculative decoding with llama.cpp
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def prompt_lookup(input_ids: np.ndarray, ngram_size: int, num_pred_tokens: int) -> np.ndarray:
+    """
+    Tokens that followed an earlier occurrence of the trailing n-gram
+
+    Same search as llama-cpp-python's ``LlamaPromptLookupDecoding``: the
+    last ``ngram_size`` tokens are looked up in the prompt and the text
+    generated so far (first occurrence wins), falling back to shorter
+    n-grams down to a single token.
+
+    Returns:
+        Up to ``num_pred_tokens`` proposed tokens (empty without a match)
+    """
+    input_length = input_ids.shape[0]
+    for n in range(min(ngram_size, input_length - 1), 0, -1):
+        windows = np.lib.stride_tricks.sliding_window_view(input_ids, (n,))
+        matches = np.all(windows == input_ids[-n:], axis=1).nonzero()[0]
+        for index in matches:
+            start = index + n
+            # The trailing n-gram matches itself with nothing after it
+            if start < input_length:
+                return input_ids[start:min(start + num_pred_tokens, input_length)]
+    return np.array([], dtype=np.intc)
+
+
+class DraftSource:
+    """
+    Base for draft models passed to ``Llama(draft_model=...)``
+
+    llama.cpp calls the draft model with the tokens confirmed so far and
+    evaluates its proposals in the same batch as the next token. Each
+    proposal is then checked by sampling the target model at its position
+    with the request's own sampler: matching tokens are kept, the first
+    mismatch is replaced by the sampled token and the rest is discarded.
+    The generated text is therefore exactly what the model alone would
+    produce; drafting only changes how many tokens one forward pass yields.
+
+    A proposal is settled on the following call, whose input shows how
+    many of its tokens survived verification. The last proposal of a
+    generation is never verified and is not counted.
+    """
+
+    mode = "off"
+
+    def __init__(self, num_pred_tokens: int):
+        self.num_pred_tokens = num_pred_tokens
+        self.totals = {"generations": 0, "drafted_tokens": 0, "accepted_tokens": 0}
+        self.begin()
+
+    def propose(self, input_ids: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def begin(self):
+        """Start counting for a new generation"""
+        self._pending: Optional[tuple] = None
+        self._calls = 0
+        self._drafted = 0
+        self._accepted = 0
+
+    def __call__(self, input_ids: np.ndarray, **kwargs) -> np.ndarray:
+        input_ids = np.asarray(input_ids, dtype=np.intc)
+        self._settle(input_ids)
+        draft = np.asarray(self.propose(input_ids), dtype=np.intc)[:self.num_pred_tokens]
+        self._calls += 1
+        self._pending = (input_ids.shape[0], draft) if draft.shape[0] else None
+        return draft
+
+    def _settle(self, input_ids: np.ndarray):
+        if self._pending is None:
+            return
+        position, draft = self._pending
+        self._pending = None
+        confirmed = input_ids[position:position + draft.shape[0]]
+        mismatches = (confirmed != draft[:confirmed.shape[0]]).nonzero()[0]
+        self._drafted += draft.shape[0]
+        self._accepted += int(mismatches[0]) if mismatches.shape[0] else confirmed.shape[0]
+
+    def finish(self) -> Dict[str, Any]:
+        """Acceptance statistics of the generation since begin()"""
+        self.totals["generations"] += 1
+        self.totals["drafted_tokens"] += self._drafted
+        self.totals["accepted_tokens"] += self._accepted
+        return {
+            "mode": self.mode,
+            "draft_calls": self._calls,
+            "drafted_tokens": self._drafted,
+            "accepted_tokens": self._accepted,
+            "acceptance_rate": _rate(self._accepted, self._drafted)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Totals over every generation, reported by LLMRunner.get_status()"""
+        return {
+            "mode": self.mode,
+            "num_pred_tokens": self.num_pred_tokens,
+            **self.totals,
+            "acceptance_rate": _rate(self.totals["accepted_tokens"], self.totals["drafted_tokens"])
+        }
+
+
+def _rate(accepted: int, drafted: int) -> Optional[float]:
+    return round(accepted / drafted, 3) if drafted else None
+
+
+class PromptLookupDraft(DraftSource):
+    """
+    Drafts by copying from the prompt (no extra model)
+
+    Grounded answers, edits and summaries repeat long spans of their
+    input, which this proposes for the cost of an n-gram search.
+    """
+
+    mode = "prompt_lookup"
+
+    def __init__(self, num_pred_tokens: int = 10, ngram_size: int = 2):
+        self.ngram_size = ngram_size
+        super().__init__(num_pred_tokens)
+
+    def propose(self, input_ids: np.ndarray) -> np.ndarray:
+        return prompt_lookup(input_ids, self.ngram_size, self.num_pred_tokens)
+
+
+class DraftModel(DraftSource):
+    """
+    Drafts greedily with a small GGUF model sharing the target's vocabulary
+
+    The draft model keeps its own KV cache; llama.cpp's prefix matching
+    in ``generate`` rolls it back to the confirmed tokens on each call.
+    """
+
+    mode = "draft_model"
+
+    def __init__(self, llm: Any, num_pred_tokens: int = 10):
+        self.llm = llm
+        super().__init__(num_pred_tokens)
+
+    def propose(self, input_ids: np.ndarray) -> np.ndarray:
+        tokens: List[int] = input_ids.tolist()
+        limit = min(self.num_pred_tokens, self.llm.n_ctx() - len(tokens))
+        proposed: List[int] = []
+        if limit <= 0:
+            return np.array(proposed, dtype=np.intc)
+        generator = self.llm.generate(tokens, top_k=1, temp=0.0, reset=True)
+        try:
+            for token in generator:
+                if token == self.llm.token_eos():
+                    break
+                proposed.append(token)
+                if len(proposed) >= limit:
+                    break
+        finally:
+            generator.close()
+        return np.array(proposed, dtype=np.intc)
+
+
+def create_draft_source(
+    mode: str,
+    num_pred_tokens: int,
+    ngram_size: int,
+    draft_model_path: str,
+    n_ctx: int,
+    n_threads: int
+) -> Optional[DraftSource]:
+    """
+    The draft source for the configured SPECULATIVE_DECODING mode
+
+    Loads the draft model for ``draft_model`` (blocking; called on the
+    inference thread together with the target model).
+    """
+    if mode == "prompt_lookup":
+        return PromptLookupDraft(num_pred_tokens, ngram_size)
+    if mode == "draft_model":
+        # Imported here: loading the llama.cpp shared library is slow and only needed now
+        from llama_cpp import Llama
+
+        logger.info(f"📦 Loading draft model: {draft_model_path}")
+        llm = Llama(
+            model_path=draft_model_path,
+            n_ctx=n_ctx,
+            n_threads=n_threads,
+            verbose=False,
+            n_gpu_layers=0,
+        )
+        return DraftModel(llm, num_pred_tokens)
+    return None
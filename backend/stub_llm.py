@@ -0,0 +1,132 @@
+"""
+File: stub_llm.py
+Purpose: Deterministic stand-in for llama.cpp used by the benchmark and load harness
+"""
+
+import re
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from inference_worker import InferenceWorker
+from llm_runner import LLMRunner
+
+_WORD = re.compile(rb"\s*\S+")
+_VOCAB_SIZE = 32000
+_BOS = 1
+
+
+class StubLlama:
+    """
+    Minimal ``llama_cpp.Llama`` look-alike with configurable speed
+
+    One token per whitespace-separated word. Prompts are "evaluated" at
+    ``prefill_tokens_per_second`` (tokens already in the KV cache are
+    reused, as in llama.cpp) and completions emit ``max_tokens`` fixed
+    tokens at ``decode_tokens_per_second``. Time is spent in sleeps paced
+    against a deadline, so the rate holds regardless of scheduler jitter
+    and the CPU stays free for the code being measured.
+    
+    A ``draft_model`` is consulted before each decode step as in
+    llama.cpp; drafted tokens that match the fixed output come out of the
+    same step.
+    """
+
+    def __init__(self, prefill_tokens_per_second: float = 2000.0, decode_tokens_per_second: float = 100.0):
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.decode_tokens_per_second = decode_tokens_per_second
+        self.input_ids: List[int] = []
+        self.n_tokens = 0
+        self.draft_model = None
+
+    def tokenize(self, text: bytes, add_bos: bool = True, special: bool = False) -> List[int]:
+        tokens = [zlib.crc32(word) % _VOCAB_SIZE for word in _WORD.findall(text)]
+        return [_BOS] + tokens if add_bos else tokens
+
+    def eval(self, tokens: List[int]):
+        self.input_ids = self.input_ids[:self.n_tokens] + list(tokens)
+        self.n_tokens = len(self.input_ids)
+        _sleep_until(time.monotonic() + len(tokens) / self.prefill_tokens_per_second)
+
+    def reset(self):
+        self.n_tokens = 0
+
+    def save_state(self) -> Dict[str, Any]:
+        return {"input_ids": self.input_ids[:self.n_tokens]}
+
+    def load_state(self, state: Dict[str, Any]):
+        self.input_ids = list(state["input_ids"])
+        self.n_tokens = len(self.input_ids)
+
+    def __call__(
+        self,
+        prompt: str,
+        stream: bool = True,
+        max_tokens: Optional[int] = 16,
+        logits_processor: Optional[Callable] = None,
+        **kwargs
+    ) -> Iterator[Dict[str, Any]]:
+        tokens = self.tokenize(prompt.encode("utf-8"), special=True)
+        reused = 0
+        for cached, token in zip(self.input_ids[:self.n_tokens], tokens[:-1]):
+            if cached != token:
+                break
+            reused += 1
+        self.n_tokens = reused
+        return self._generate(tokens[reused:], max_tokens or 16, logits_processor)
+
+    def _generate(
+        self, pending: List[int], max_tokens: int, logits_processor: Optional[Callable]
+    ) -> Iterator[Dict[str, Any]]:
+        self.eval(pending)
+        start = time.monotonic()
+        steps = 0
+        i = 0
+        while i < max_tokens:
+            draft = []
+            if self.draft_model is not None:
+                draft = list(self.draft_model(np.array(self.input_ids[:self.n_tokens], dtype=np.intc)))
+            steps += 1
+            _sleep_until(start + steps / self.decode_tokens_per_second)
+            for position in range(len(draft) + 1):
+                text = f" word{i}"
+                token = zlib.crc32(text.encode("utf-8")) % _VOCAB_SIZE
+                if logits_processor is not None:
+                    logits_processor(self.input_ids[:self.n_tokens], None)
+                self.input_ids = self.input_ids[:self.n_tokens] + [token]
+                self.n_tokens += 1
+                i += 1
+                yield {"choices": [{"text": text, "finish_reason": "length" if i == max_tokens else None}]}
+                if i == max_tokens or position == len(draft) or draft[position] != token:
+                    break
+
+
+def _sleep_until(deadline: float):
+    remaining = deadline - time.monotonic()
+    if remaining > 0:
+        time.sleep(remaining)
+
+
+def create_stub_runner(
+    prefill_tokens_per_second: float = 2000.0,
+    decode_tokens_per_second: float = 100.0,
+    max_queue_depth: Optional[int] = None,
+    worker: Optional[InferenceWorker] = None
+) -> LLMRunner:
+    """
+    An initialized LLMRunner generating with StubLlama
+
+    Requests take the real path through the runner (inference thread,
+    queue admission, prefix reuse, result assembly); only the model is
+    replaced. Session and response caches stay disabled.
+    """
+    runner = LLMRunner("stub.gguf", worker=worker)
+    if max_queue_depth is not None:
+        runner.worker.max_queue_depth = max_queue_depth
+    runner.llm = StubLlama(prefill_tokens_per_second, decode_tokens_per_second)
+    runner.model_fingerprint = "stub"
+    runner.is_initialized = True
+    runner.boot_phase = "ready"
+    return runner
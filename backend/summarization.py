@@ -0,0 +1,319 @@
+"""
+File: summarization.py
+Purpose: Map-reduce summaries of context files longer than the model's context window
+Privacy: Summaries are cached in the local app data directory only.
+"""
+
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cancellation import CANCEL_REASONS, CancelToken
+from chunking import chunk_text
+from hashing import text_hash
+from prompts import build_combine_prompt, build_summary_prompt
+
+logger = logging.getLogger(__name__)
+
+# Tokens held back for differences between counting pieces separately and the joined prompt
+_SAFETY_TOKENS = 16
+# Tokens counted for the blank line joining two paragraphs or summaries
+_SEPARATOR_TOKENS = 2
+# Past half its budget, a chunk also ends after a paragraph whose hash has these bits clear
+_CUT_MASK = 0x3
+_PARAGRAPH = re.compile(r"\n\s*\n")
+
+TokenCounter = Callable[[str], int]
+
+
+def _fit(paragraph: str, count: TokenCounter, max_tokens: int) -> List[Tuple[str, int]]:
+    """Split a paragraph (at sentence or word breaks) until every piece fits ``max_tokens``"""
+    tokens = count(paragraph)
+    if tokens <= max_tokens or len(paragraph) <= 1:
+        return [(paragraph, tokens)]
+    max_chars = max(1, len(paragraph) * max_tokens // tokens * 9 // 10)
+    pieces: List[Tuple[str, int]] = []
+    for chunk in chunk_text(paragraph, max_chars=max_chars, overlap=0):
+        pieces.extend(_fit(chunk.text.strip(), count, max_tokens))
+    return pieces
+
+
+def split_by_tokens(text: str, count: TokenCounter, max_tokens: int) -> List[str]:
+    """
+    Split ``text`` into chunks of at most ``max_tokens`` tokens at paragraph breaks
+
+    Chunk ends are content-defined: once a chunk holds half its budget it
+    also ends after any paragraph whose hash has the ``_CUT_MASK`` bits
+    clear, not only where the next paragraph would overflow it. Editing a
+    document therefore only moves the chunk boundaries near the edit;
+    later chunks line up with the previous version again, so their cached
+    summaries still apply.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    used = 0
+    for paragraph in _PARAGRAPH.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        for piece, tokens in _fit(paragraph, count, max_tokens):
+            if current and used + tokens > max_tokens:
+                chunks.append("\n\n".join(current))
+                current, used = [], 0
+            current.append(piece)
+            used += tokens + _SEPARATOR_TOKENS
+            if used >= max_tokens // 2 and int(text_hash(piece)[:8], 16) & _CUT_MASK == 0:
+                chunks.append("\n\n".join(current))
+                current, used = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def group_by_tokens(texts: List[str], count: TokenCounter, max_tokens: int) -> List[List[str]]:
+    """Consecutive runs of ``texts`` whose joined token count fits ``max_tokens``"""
+    groups: List[List[str]] = []
+    current: List[str] = []
+    used = 0
+    for text in texts:
+        tokens = count(text) + _SEPARATOR_TOKENS
+        if current and used + tokens > max_tokens:
+            groups.append(current)
+            current, used = [], 0
+        current.append(text)
+        used += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+class SummaryCache:
+    """
+    Generated summaries keyed by a hash of the model and prompt
+
+    A chunk's key depends only on its text, so it is shared by every
+    document (or document version) containing that chunk. Each use is
+    recorded against the document's hash, and ``forget`` drops a
+    document's summaries once no other document uses them.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                key TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS summary_refs (
+                doc_key TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (doc_key, key)
+            );
+            CREATE INDEX IF NOT EXISTS summary_refs_key ON summary_refs (key);
+        """)
+        self._conn.commit()
+
+    def get(self, doc_key: str, key: str) -> Optional[str]:
+        """Cached summary for ``key``, recorded as used by ``doc_key``"""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("INSERT OR IGNORE INTO summary_refs (doc_key, key) VALUES (?, ?)", (doc_key, key))
+        return row[0]
+
+    def put(self, doc_key: str, key: str, summary: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, created_at) VALUES (?, ?, ?)",
+                (key, summary, datetime.utcnow().isoformat() + "Z")
+            )
+            self._conn.execute("INSERT OR IGNORE INTO summary_refs (doc_key, key) VALUES (?, ?)", (doc_key, key))
+
+    def forget(self, doc_key: str) -> int:
+        """Drop a document's references; returns the number of summaries no longer used and deleted"""
+        with self._lock, self._conn:
+            keys = [row[0] for row in self._conn.execute("SELECT key FROM summary_refs WHERE doc_key = ?", (doc_key,))]
+            self._conn.execute("DELETE FROM summary_refs WHERE doc_key = ?", (doc_key,))
+            deleted = 0
+            for key in keys:
+                deleted += self._conn.execute(
+                    "DELETE FROM summaries WHERE key = ? AND NOT EXISTS (SELECT 1 FROM summary_refs WHERE key = ?)",
+                    (key, key)
+                ).rowcount
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+        return {"summaries": count}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class Summarizer:
+    """
+    Background summarization of documents of any length
+
+    The text is split into chunks that fit the context window (``map``),
+    each chunk is summarized, and consecutive summaries are then combined
+    in as few prompts as fit, level by level, until one summary is left
+    (``reduce``). Prompts go to the LLM runner as a batch, so they run at
+    batch priority on its inference thread and an interactive request only
+    ever waits for the prompt currently running. Every summary is cached
+    by prompt hash: summarizing the same text again, or a new version of
+    an edited document, only generates what changed.
+
+    Jobs are asyncio tasks; ``start``, ``status`` and ``forget`` must be
+    called on the event loop.
+    """
+
+    def __init__(self, cache: SummaryCache, n_ctx: int, max_tokens: int):
+        self.cache = cache
+        self.n_ctx = n_ctx
+        self.max_tokens = max_tokens
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, "asyncio.Task"] = {}
+        self._cancels: Dict[str, CancelToken] = {}
+
+    def start(self, doc_key: str, text: str, runner, tokenizer) -> Dict[str, Any]:
+        """
+        Start summarizing a document unless it is already being summarized
+
+        Args:
+            doc_key: Hash of the stored file
+            text: The file's extracted text
+            runner: LLM runner that generates the summaries
+            tokenizer: Tokenizer of the runner's model
+
+        Returns:
+            The job status
+        """
+        job = self._jobs.get(doc_key)
+        if job and job["status"] in ("pending", "running"):
+            return dict(job)
+        job = {
+            "status": "pending",
+            "phase": None,
+            "chunks_total": 0,
+            "chunks_done": 0,
+            "reduce_level": 0,
+            "groups_total": 0,
+            "groups_done": 0,
+            "cached": 0,
+            "summary": None,
+            "error": None,
+        }
+        self._jobs[doc_key] = job
+        self._cancels[doc_key] = CancelToken()
+        self._tasks[doc_key] = asyncio.create_task(self._run(doc_key, text, runner, tokenizer, job))
+        return dict(job)
+
+    def status(self, doc_key: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(doc_key)
+        return dict(job) if job else None
+
+    def forget(self, doc_key: str):
+        """Stop and drop a document's job (its cached summaries are released with ``cache.forget``)"""
+        cancel = self._cancels.pop(doc_key, None)
+        if cancel:
+            cancel.cancel()
+        task = self._tasks.pop(doc_key, None)
+        if task:
+            task.cancel()
+        self._jobs.pop(doc_key, None)
+
+    def shutdown(self):
+        """Cancel running jobs"""
+        for doc_key in list(self._tasks):
+            self.forget(doc_key)
+
+    async def _run(self, doc_key: str, text: str, runner, tokenizer, job: Dict[str, Any]):
+        start = time.monotonic()
+        job["status"] = "running"
+        try:
+            job["summary"] = await self._summarize(doc_key, text, runner, tokenizer, job)
+            job["status"] = "completed"
+            logger.info(
+                f"📝 Summarized {job['chunks_total']} chunks in {job['reduce_level']} reduce levels "
+                f"({job['cached']} cached) in {time.monotonic() - start:.1f}s"
+            )
+        except asyncio.CancelledError:
+            job["status"] = "cancelled"
+            raise
+        except Exception as e:
+            job.update(status="failed", error=str(e))
+            logger.warning(f"⚠️ Summarization failed: {e}")
+        finally:
+            job["duration"] = round(time.monotonic() - start, 3)
+            if self._jobs.get(doc_key) is job:
+                self._tasks.pop(doc_key, None)
+                self._cancels.pop(doc_key, None)
+
+    async def _summarize(self, doc_key: str, text: str, runner, tokenizer, job: Dict[str, Any]) -> str:
+        overhead = max(
+            await asyncio.to_thread(tokenizer.count, build_summary_prompt("")),
+            await asyncio.to_thread(tokenizer.count, build_combine_prompt([]))
+        )
+        budget = self.n_ctx - self.max_tokens - overhead - _SAFETY_TOKENS
+        if budget < 2 * self.max_tokens:
+            raise ValueError(
+                f"Context window of {self.n_ctx} tokens is too small to summarize with {self.max_tokens}-token summaries"
+            )
+
+        job["phase"] = "map"
+        chunks = await asyncio.to_thread(split_by_tokens, text, tokenizer.count, budget)
+        if not chunks:
+            raise ValueError("The document contains no text")
+        job["chunks_total"] = len(chunks)
+        summaries = await self._generate(doc_key, [build_summary_prompt(c) for c in chunks], runner, job, "chunks_done")
+
+        job["phase"] = "reduce"
+        while len(summaries) > 1:
+            groups = await asyncio.to_thread(group_by_tokens, summaries, tokenizer.count, budget)
+            if len(groups) == len(summaries):
+                raise RuntimeError("Chunk summaries are too long to combine")
+            job["reduce_level"] += 1
+            job.update(groups_total=len(groups), groups_done=0)
+            summaries = await self._generate(doc_key, [build_combine_prompt(g) for g in groups], runner, job, "groups_done")
+        return summaries[0]
+
+    async def _generate(self, doc_key: str, prompts: List[str], runner, job: Dict[str, Any], counter: str) -> List[str]:
+        """Summaries for ``prompts`` in order: cached ones first, the rest as one batch"""
+        fingerprint = getattr(runner, "model_fingerprint", None) or runner.model_path
+        keys = [text_hash(json.dumps([fingerprint, self.max_tokens, prompt])) for prompt in prompts]
+        results: List[Optional[str]] = await asyncio.to_thread(lambda: [self.cache.get(doc_key, key) for key in keys])
+        hits = sum(result is not None for result in results)
+        job["cached"] += hits
+        job[counter] += hits
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            items = [
+                {"prompt": prompts[i], "max_tokens": self.max_tokens, "temperature": 0, "use_cache": False}
+                for i in missing
+            ]
+            async for index, result in runner.generate_batch(items, cancel=self._cancels.get(doc_key)):
+                if isinstance(result, Exception):
+                    raise result
+                if result["metadata"].get("stop_reason") in CANCEL_REASONS:
+                    raise asyncio.CancelledError()
+                i = missing[index]
+                results[i] = result["response"].strip()
+                await asyncio.to_thread(self.cache.put, doc_key, keys[i], results[i])
+                job[counter] += 1
+        return results
@@ -0,0 +1,93 @@
+"""
+File: system_monitor.py
+Purpose: Background sampler keeping a cached snapshot of system and process health
+"""
+
+import logging
+import os
+import platform
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from paths import get_app_data_dir
+
+logger = logging.getLogger(__name__)
+
+
+class SystemMonitor:
+    """
+    Samples CPU, memory, disk and process stats on a background thread
+
+    Health endpoints read ``snapshot()``, which is a dictionary lookup, so
+    frequent polling never blocks the event loop on psutil calls.
+    """
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self._process = None
+        self._snapshot: Dict[str, Any] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Take a first sample and start refreshing in the background"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            # Imported on first start rather than at server import time
+            import psutil
+            self._process = psutil.Process()
+            # cpu_percent(interval=None) measures since the previous call; prime it
+            psutil.cpu_percent(interval=None)
+            self._process.cpu_percent(interval=None)
+            self._sample()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="monad-system-monitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background thread"""
+        self._stop.set()
+        thread = self._thread
+        if thread:
+            thread.join(timeout=self.interval + 1)
+        self._thread = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Most recent sample (sampling once synchronously if none exists yet)"""
+        if not self._snapshot:
+            self._sample()
+        return self._snapshot
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        import psutil
+        if self._process is None:
+            self._process = psutil.Process()
+        try:
+            memory = psutil.virtual_memory()
+            disk_path = get_app_data_dir()
+            disk = psutil.disk_usage(str(disk_path if disk_path.exists() else disk_path.anchor))
+            process_memory = self._process.memory_info()
+            snapshot = {
+                "cpu_percent": psutil.cpu_percent(interval=None),
+                "memory_percent": memory.percent,
+                "memory_available_gb": round(memory.available / (1024 ** 3), 2),
+                "disk_usage": disk.percent,
+                "disk_free_gb": round(disk.free / (1024 ** 3), 2),
+                "process_cpu_percent": self._process.cpu_percent(interval=None),
+                "process_rss_mb": round(process_memory.rss / (1024 ** 2), 1),
+                "process_uptime": time.time() - self._process.create_time(),
+                "platform": platform.system() or (os.uname().sysname if hasattr(os, "uname") else "unknown"),
+                "sampled_at": time.time(),
+            }
+        except Exception as e:
+            logger.warning(f"⚠️ System sample failed: {e}")
+            return
+        # Swap in a new dict so readers never see a partially updated snapshot
+        self._snapshot = snapshot
@@ -37,3 +37,294 @@ def test_context_upload_rejects_oversize(monkeypatch):
     files = {"file": ("big.txt", b"a" * 2048, "text/plain")}
     resp = client.post("/api/context/upload", files=files)
     assert resp.status_code == 413
+
+
+def test_generate_returns_429_when_queue_full():
+    from inference_worker import QueueFullError
+
+    class BusyRunner:
+        is_initialized = True
+        async def generate_response(self, prompt, **kwargs):
+            raise QueueFullError(queue_depth=3, retry_after=12)
+    set_llm_runner(BusyRunner())
+    resp = client.post("/api/generate", json={"prompt": "hi"})
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "12"
+    assert resp.json()["detail"]["queue_position"] == 4
+
+
+class StreamingRunner:
+    is_initialized = True
+
+    async def stream_response(self, prompt, **kwargs):
+        class Stream:
+            def __init__(self):
+                self._pieces = iter(["Hello", " there"])
+            def __aiter__(self):
+                return self
+            async def __anext__(self):
+                try:
+                    return next(self._pieces)
+                except StopIteration:
+                    raise StopAsyncIteration
+            async def result(self):
+                return {"response": "Hello there", "metadata": {"time_to_first_token": 0.01}}
+        return Stream()
+
+
+def test_generate_stream_sse_frames():
+    set_llm_runner(StreamingRunner())
+    resp = client.post("/api/generate/stream", json={"prompt": "hi"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = [line[len("event: "):] for line in resp.text.splitlines() if line.startswith("event: ")]
+    assert events == ["token", "token", "done"]
+
+
+def test_generate_stream_ndjson_final_frame_has_metadata():
+    import json
+    set_llm_runner(StreamingRunner())
+    resp = client.post("/api/generate/stream?format=ndjson", json={"prompt": "hi"})
+    frames = [json.loads(line) for line in resp.text.splitlines()]
+    assert [f["text"] for f in frames if f["type"] == "token"] == ["Hello", " there"]
+    assert frames[-1]["type"] == "done"
+    assert frames[-1]["response"] == "Hello there"
+    assert "metadata" in frames[-1]
+
+
+def test_generate_batch_streams_per_item_results():
+    import json
+
+    class BatchRunner:
+        is_initialized = True
+        async def generate_batch(self, items, cancel=None):
+            for index, item in enumerate(items):
+                if "fail" in item["prompt"]:
+                    yield index, RuntimeError("boom")
+                else:
+                    yield index, {"response": f"ok {index}", "metadata": {}}
+    set_llm_runner(BatchRunner())
+    resp = client.post("/api/generate/batch", json={"items": [
+        {"prompt": "first", "id": "a"},
+        {"prompt": "please fail"},
+        {"prompt": "third", "temperature": 0}
+    ]})
+    assert resp.status_code == 200
+    frames = [json.loads(line) for line in resp.text.splitlines()]
+    assert [(f["type"], f.get("index")) for f in frames] == [("result", 0), ("error", 1), ("result", 2), ("done", None)]
+    assert frames[0]["id"] == "a" and frames[0]["response"] == "ok 0"
+    assert "boom" in frames[1]["detail"]
+    assert frames[-1]["completed"] == 2 and frames[-1]["failed"] == 1
+
+
+def test_generate_passes_deadline_to_runner():
+    class DeadlineRunner:
+        is_initialized = True
+        async def generate_response(self, prompt, cancel=None, **kwargs):
+            assert cancel.deadline is not None
+            return {"response": "partial", "metadata": {"stop_reason": "deadline"}}
+    set_llm_runner(DeadlineRunner())
+    resp = client.post("/api/generate", json={"prompt": "hi", "timeout_ms": 500})
+    assert resp.status_code == 200
+    assert resp.json()["metadata"]["stop_reason"] == "deadline"
+
+
+def test_context_upload_oversize_leaves_no_partial_file(monkeypatch, tmp_path):
+    import routes.context
+    monkeypatch.setattr(routes.context, "CONTEXT_DIR", tmp_path)
+    monkeypatch.setattr(routes.context, "UPLOAD_CHUNK_SIZE", 512)
+    monkeypatch.setenv("MAX_CONTEXT_FILE_MB", "0")
+    files = {"file": ("big.txt", b"a" * 2048, "text/plain")}
+    resp = client.post("/api/context/upload", files=files)
+    assert resp.status_code == 413
+    # Only the (empty) catalog database may exist
+    assert [p for p in tmp_path.rglob("*") if p.is_file() and not p.name.startswith("catalog.db")] == []
+
+
+def test_context_batch_upload_reports_each_file(monkeypatch, tmp_path):
+    import routes.context
+    monkeypatch.setattr(routes.context, "CONTEXT_DIR", tmp_path)
+    files = [
+        ("files", ("notes.txt", b"hello world", "text/plain")),
+        ("files", ("tool.exe", b"bad", "application/octet-stream")),
+        ("files", ("more.txt", b"second file", "text/plain")),
+    ]
+    resp = client.post("/api/context/upload/batch", files=files)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert (body["imported"], body["failed"]) == (2, 1)
+    assert [r["success"] for r in body["results"]] == [True, False, True]
+    assert body["results"][1]["status_code"] == 400
+    assert body["results"][0]["metadata"]["text_preview"] == "hello world"
+    assert client.get("/api/context/list").json()["total"] == 2
+
+
+def test_context_reupload_is_deduplicated(monkeypatch, tmp_path):
+    import routes.context
+    monkeypatch.setattr(routes.context, "CONTEXT_DIR", tmp_path)
+    first = client.post("/api/context/upload", files={"file": ("a.txt", b"same", "text/plain")}).json()
+    second = client.post("/api/context/upload", files={"file": ("b.txt", b"same", "text/plain")}).json()
+    assert first["context_id"] != second["context_id"]
+    assert (first["metadata"]["deduplicated"], second["metadata"]["deduplicated"]) == (False, True)
+
+    assert client.delete(f"/api/context/{first['context_id']}").status_code == 200
+    listed = client.get("/api/context/list").json()
+    assert [f["filename"] for f in listed["files"]] == ["b.txt"]
+    assert client.delete(f"/api/context/{first['context_id']}").status_code == 404
+
+
+def test_context_list_pages_with_cursor(monkeypatch, tmp_path):
+    import routes.context
+    monkeypatch.setattr(routes.context, "CONTEXT_DIR", tmp_path)
+    for name in ("c.txt", "a.txt", "b.txt"):
+        client.post("/api/context/upload", files={"file": (name, name.encode(), "text/plain")})
+
+    first = client.get("/api/context/list", params={"limit": 2, "sort": "filename", "order": "asc"}).json()
+    assert [f["filename"] for f in first["files"]] == ["a.txt", "b.txt"]
+    assert first["total"] == 3
+    second = client.get("/api/context/list", params={"limit": 2, "sort": "filename", "order": "asc", "cursor": first["next_cursor"]}).json()
+    assert [f["filename"] for f in second["files"]] == ["c.txt"]
+    assert second["next_cursor"] is None
+    # Later pages skip the count unless asked for it
+    assert second["total"] is None
+    params = {"limit": 2, "sort": "filename", "order": "asc", "cursor": first["next_cursor"], "include_total": True}
+    assert client.get("/api/context/list", params=params).json()["total"] == 3
+    assert client.get("/api/context/list", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/api/context/list", params={"sort": "sha256"}).status_code == 422
+
+
+def test_context_upload_reports_extraction_status(monkeypatch, tmp_path):
+    import time
+    import routes.context
+    monkeypatch.setattr(routes.context, "CONTEXT_DIR", tmp_path)
+    resp = client.post("/api/context/upload", files={"file": ("notes.txt", b"meeting notes", "text/plain")})
+    assert resp.json()["metadata"]["extraction"]["status"] in ("pending", "running", "completed")
+    context_id = resp.json()["context_id"]
+
+    for _ in range(300):
+        body = client.get(f"/api/context/{context_id}/status").json()
+        if body["extraction"]["status"] == "completed" and body["index"]["status"] == "indexed":
+            break
+        time.sleep(0.05)
+    assert body["extraction"]["text_preview"].startswith("meeting notes")
+    assert body["index"]["chunks"] == 1
+    assert client.get("/api/context/missing-id/status").status_code == 404
+
+
+def test_context_reupload_after_delete_is_extracted_again(monkeypatch, tmp_path):
+    import time
+    import routes.context
+    monkeypatch.setattr(routes.context, "CONTEXT_DIR", tmp_path)
+
+    def upload_and_index():
+        context_id = client.post("/api/context/upload", files={"file": ("notes.txt", b"budget review", "text/plain")}).json()["context_id"]
+        for _ in range(300):
+            body = client.get(f"/api/context/{context_id}/status").json()
+            if body["index"]["status"] == "indexed":
+                break
+            time.sleep(0.05)
+        return context_id, body
+
+    first, _ = upload_and_index()
+    assert client.delete(f"/api/context/{first}").status_code == 200
+    _, body = upload_and_index()
+    assert body["extraction"]["text_preview"].startswith("budget review")
+    assert body["index"]["status"] == "indexed"
+    assert client.get("/api/context/search", params={"q": "budget"}).json()["count"] == 1
+
+
+def test_context_search_ranks_keyword_matches(monkeypatch, tmp_path):
+    import time
+    import routes.context
+    monkeypatch.setattr(routes.context, "CONTEXT_DIR", tmp_path)
+    uploads = [("a.txt", b"Invoice INV-2041 from ACME Corp"), ("b.txt", b"Notes about ACME rockets")]
+    ids = [client.post("/api/context/upload", files={"file": (name, data, "text/plain")}).json()["context_id"] for name, data in uploads]
+    for context_id in ids:
+        for _ in range(300):
+            if client.get(f"/api/context/{context_id}/status").json()["index"]["status"] == "indexed":
+                break
+            time.sleep(0.05)
+
+    body = client.get("/api/context/search", params={"q": "INV-2041 acme"}).json()
+    assert [r["filename"] for r in body["results"]] == ["a.txt", "b.txt"]
+    assert "**INV**" in body["results"][0]["snippet"]
+    assert body["results"][0]["context_ids"] == [ids[0]]
+
+    client.delete(f"/api/context/{ids[0]}")
+    body = client.get("/api/context/search", params={"q": "invoice"}).json()
+    assert body["count"] == 0
+    assert client.get("/api/context/search", params={"q": "x", "mode": "semantic"}).status_code == 400
+
+
+def test_generate_grounds_prompt_in_context_files(monkeypatch, tmp_path):
+    import time
+    import routes.context
+    import routes.generate
+    from context_packing import TokenCountCache
+    monkeypatch.setattr(routes.context, "CONTEXT_DIR", tmp_path)
+
+    class WordTokenizer:
+        model_path = "fake.gguf"
+        def count(self, text):
+            return len(text.split())
+    monkeypatch.setattr(routes.generate, "get_tokenizer", lambda path: WordTokenizer())
+
+    class PromptRunner:
+        is_initialized = True
+        model_path = "fake.gguf"
+        async def generate_response(self, prompt, **kwargs):
+            return {"response": "ok", "metadata": {"prompt": prompt}}
+    set_llm_runner(PromptRunner())
+
+    context_id = client.post("/api/context/upload", files={"file": ("plan.txt", b"The launch date is 14 March.", "text/plain")}).json()["context_id"]
+    resp = client.post("/api/generate", json={"prompt": "When is the launch?", "context_ids": [context_id]})
+    if resp.status_code == 409:
+        for _ in range(300):
+            time.sleep(0.05)
+            resp = client.post("/api/generate", json={"prompt": "When is the launch?", "context_ids": [context_id]})
+            if resp.status_code != 409:
+                break
+    assert resp.status_code == 200
+    metadata = resp.json()["metadata"]
+    assert "14 March" in metadata["prompt"]
+    assert metadata["context"]["passages"][0]["filename"] == "plan.txt"
+
+    assert client.post("/api/generate", json={"prompt": "hi", "context_ids": ["missing"]}).status_code == 404
+    assert client.post("/api/generate", json={"prompt": "hi", "context_ids": [context_id], "session_id": "s1"}).status_code == 422
+
+
+def test_context_summary_runs_in_background(monkeypatch, tmp_path):
+    import time
+    import routes.context
+    monkeypatch.setattr(routes.context, "CONTEXT_DIR", tmp_path)
+
+    class WordTokenizer:
+        model_path = "fake.gguf"
+        def count(self, text):
+            return len(text.split())
+    monkeypatch.setattr(routes.context, "get_tokenizer", lambda path: WordTokenizer())
+
+    class SummaryRunner:
+        is_initialized = True
+        model_path = "fake.gguf"
+        async def generate_batch(self, items, cancel=None):
+            for index, item in enumerate(items):
+                yield index, {"response": "A short summary.", "metadata": {}}
+
+    # Entered so the background job keeps running on one event loop between requests
+    with TestClient(main.app) as app_client:
+        set_llm_runner(SummaryRunner())
+        context_id = app_client.post("/api/context/upload", files={"file": ("plan.txt", b"The launch date is 14 March.", "text/plain")}).json()["context_id"]
+        assert app_client.get(f"/api/context/{context_id}/summary").status_code == 404
+        for _ in range(300):
+            resp = app_client.post(f"/api/context/{context_id}/summary")
+            if resp.status_code != 409:
+                break
+            time.sleep(0.05)
+        assert resp.status_code == 202
+        for _ in range(100):
+            job = app_client.get(f"/api/context/{context_id}/summary").json()["summary"]
+            if job["status"] == "completed":
+                break
+            time.sleep(0.02)
+    assert job["summary"] == "A short summary." and job["chunks_total"] == 1
@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import main
+from benchmark import _model_runner, asgi_request, compare_to_baseline, percentile, run_scenario
+from dependencies import set_llm_runner
+from llm_runner import LLMRunner
+from stub_llm import StubLlama, create_stub_runner
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([], 50) is None
+
+
+def test_compare_flags_only_real_regressions():
+    baseline = {"generate_c1": {"throughput_rps": 10.0, "latency_ms": {"p50": 100.0, "p99": 1.0}}}
+    steady = {"generate_c1": {"throughput_rps": 9.0, "latency_ms": {"p50": 110.0, "p99": 4.0}}}
+    assert compare_to_baseline(steady, baseline) == []
+
+    slower = {"generate_c1": {"throughput_rps": 5.0, "latency_ms": {"p50": 200.0, "p99": 4.0}}, "new": {"throughput_rps": 1.0}}
+    regressions = compare_to_baseline(slower, baseline)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("generate_c1 throughput_rps")
+
+
+def test_stub_llama_reuses_cached_prompt_tokens():
+    llm = StubLlama(prefill_tokens_per_second=1e6, decode_tokens_per_second=1e6)
+    assert [c["choices"][0]["text"] for c in llm("one two three", max_tokens=2)] == [" word0", " word1"]
+    assert llm.n_tokens == 6
+    list(llm("one two four", max_tokens=1))
+    assert llm.input_ids[:3] == llm.tokenize(b"one two")
+
+
+def test_stub_scenario_measures_overhead():
+    async def run():
+        set_llm_runner(create_stub_runner(1e5, 1e4))
+        try:
+            health = await asgi_request(main.app, "GET", "/api/health/simple")
+            result = await run_scenario(main.app, "generate", "POST", "/api/generate", {"prompt": "hi", "max_tokens": 8}, 6, 3)
+        finally:
+            set_llm_runner(None)
+        return health, result
+    health, result = asyncio.run(run())
+    assert health["status"] == 200
+    assert result["requests"] == 6 and result["errors"] == 0
+    assert result["overhead_ms"]["p50"] >= 0 and result["latency_ms"]["p50"] > 0
+
+
+def test_runner_counts_sampled_tokens_and_times_prefill_alone():
+    async def run():
+        runner = create_stub_runner(prefill_tokens_per_second=2000, decode_tokens_per_second=1e4)
+        try:
+            return await runner.generate_response(" ".join(["word"] * 400), max_tokens=7, temperature=0.0, use_cache=False)
+        finally:
+            await runner.cleanup()
+    metadata = asyncio.run(run())["metadata"]
+    assert metadata["usage"]["completion_tokens"] == 7
+    assert metadata["timings"]["restore"] >= 0
+    assert 1500 < metadata["timings"]["prefill_tokens_per_second"] <= 2000
+
+
+def test_model_mode_loads_the_model(monkeypatch, tmp_path):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    loaded = []
+
+    def load(runner):
+        loaded.append(runner.model_path)
+        return StubLlama(prefill_tokens_per_second=1e6, decode_tokens_per_second=1e6)
+
+    monkeypatch.setattr(LLMRunner, "_load_model", load)
+
+    async def run():
+        runner = await _model_runner(argparse.Namespace(model=str(model)))
+        await runner.cleanup()
+    asyncio.run(run())
+    assert loaded == [str(model)]
@@ -0,0 +1,24 @@
+import time
+from cancellation import CancelToken
+
+
+def test_cancel_token_reasons():
+    token = CancelToken()
+    assert token.reason is None
+    token.cancel()
+    assert token.reason == "cancelled"
+
+
+def test_cancel_token_deadline():
+    token = CancelToken(timeout_ms=10)
+    assert token.reason is None
+    time.sleep(0.02)
+    assert token.reason == "deadline"
+
+
+def test_child_token_follows_parent():
+    parent = CancelToken()
+    child = CancelToken(timeout_ms=60_000, parent=parent)
+    assert child.reason is None
+    parent.cancel()
+    assert child.reason == "cancelled"
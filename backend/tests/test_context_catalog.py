@@ -0,0 +1,65 @@
+import json
+import pytest
+from context_catalog import ContextCatalog
+from context_store import ContextStore
+
+
+def _ref(context_id, sha256="a" * 64, filename="doc.txt", size=10, uploaded_at="2024-01-01T00:00:00Z"):
+    return {"context_id": context_id, "sha256": sha256, "filename": filename, "file_type": ".txt",
+            "file_size": size, "text_preview": "", "uploaded_at": uploaded_at}
+
+
+def test_cursor_pages_cover_every_row_once(tmp_path):
+    catalog = ContextCatalog(tmp_path / "catalog.db")
+    for i in range(25):
+        # Repeated timestamps: ties must be broken by context id
+        catalog.add(_ref(f"id-{i:02d}", sha256=f"{i:064d}", uploaded_at=f"2024-01-0{i % 3 + 1}T00:00:00Z"))
+
+    seen, cursor = [], None
+    while True:
+        items, cursor = catalog.list(limit=10, cursor=cursor)
+        seen.extend(item["context_id"] for item in items)
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 25
+    assert seen[0] in ("id-02", "id-05", "id-23") and seen[-1] == "id-00"
+
+
+def test_sorting_and_bad_arguments(tmp_path):
+    catalog = ContextCatalog(tmp_path / "catalog.db")
+    catalog.add(_ref("small", sha256="1" * 64, filename="b.txt", size=1))
+    catalog.add(_ref("large", sha256="2" * 64, filename="a.txt", size=99))
+    assert [i["context_id"] for i in catalog.list(sort="file_size")[0]] == ["large", "small"]
+    assert [i["context_id"] for i in catalog.list(sort="filename", descending=False)[0]] == ["large", "small"]
+    with pytest.raises(ValueError):
+        catalog.list(sort="sha256")
+    with pytest.raises(ValueError):
+        catalog.list(cursor="%%%")
+
+
+def test_refcount_and_status(tmp_path):
+    catalog = ContextCatalog(tmp_path / "catalog.db")
+    assert catalog.add(_ref("one")) == 1
+    assert catalog.add(_ref("two")) == 2
+    catalog.set_status("a" * 64, extraction="completed", index="indexed", chunks=3)
+    assert catalog.get("two")["index_status"] == "indexed" and catalog.get("two")["chunks"] == 3
+    assert catalog.delete("one") == ("a" * 64, 1)
+    assert catalog.delete("two") == ("a" * 64, 0)
+    assert not catalog.has_object("a" * 64)
+    assert catalog.delete("two") is None
+
+
+def test_json_references_migrate_into_catalog(tmp_path):
+    object_path = tmp_path / "objects" / "ab" / ("ab" * 32)
+    object_path.parent.mkdir(parents=True)
+    object_path.write_bytes(b"hello")
+    object_path.with_name(object_path.name + ".meta.json").write_text(json.dumps({"refcount": 1}))
+    (tmp_path / "refs").mkdir()
+    ref = _ref("old-id", sha256="ab" * 32, size=5)
+    (tmp_path / "refs" / "old-id.json").write_text(json.dumps(ref))
+
+    store = ContextStore(tmp_path)
+    assert store.get("old-id")["filename"] == "doc.txt"
+    assert not (tmp_path / "refs").exists()
+    assert list(object_path.parent.iterdir()) == [object_path]
+    assert store.delete("old-id") and not object_path.exists()
@@ -0,0 +1,48 @@
+from context_packing import TokenCountCache, pack_context
+from prompts import SYSTEM_PREFIX
+
+
+class WordTokenizer:
+    """One token per whitespace-separated word"""
+    model_path = "fake.gguf"
+
+    def __init__(self):
+        self.calls = 0
+
+    def count(self, text):
+        self.calls += 1
+        return len(text.split())
+
+
+def _chunk(doc, index, words):
+    return {"doc_key": doc, "chunk": index, "text": " ".join(["w"] * words), "source": f"{doc}.txt"}
+
+
+def test_packing_respects_context_window():
+    tokenizer = WordTokenizer()
+    chunks = [_chunk("a", 0, 300), _chunk("a", 1, 300), _chunk("b", 0, 50)]
+    packed = pack_context(tokenizer, "What is in the report?", chunks, n_ctx=600, max_tokens=100, cache=TokenCountCache())
+
+    # The second 300-word chunk does not fit, the smaller lower-ranked one does
+    assert [(c["doc_key"], c["chunk"]) for c in packed["used"]] == [("a", 0), ("b", 0)]
+    assert packed["dropped"] == 1
+    assert packed["prompt"].startswith(SYSTEM_PREFIX)
+    assert packed["prompt"].rstrip().endswith("Assistant:")
+    assert tokenizer.count(packed["prompt"]) + 100 <= 600
+
+
+def test_chunk_token_counts_are_cached():
+    tokenizer = WordTokenizer()
+    cache = TokenCountCache()
+    chunks = [_chunk("a", i, 20) for i in range(5)]
+    pack_context(tokenizer, "q", chunks, n_ctx=4096, max_tokens=256, cache=cache)
+    first_calls, tokenizer.calls = tokenizer.calls, 0
+    pack_context(tokenizer, "another question", chunks, n_ctx=4096, max_tokens=256, cache=cache)
+    assert cache.hits == 5
+    assert tokenizer.calls < first_calls
+
+
+def test_nothing_packed_when_budget_is_spent():
+    packed = pack_context(WordTokenizer(), "q", [_chunk("a", 0, 10)], n_ctx=50, max_tokens=200, cache=TokenCountCache())
+    assert packed["used"] == [] and packed["budget_tokens"] == 0
+    assert "[1]" not in packed["prompt"]
@@ -0,0 +1,47 @@
+import hashlib
+from context_store import ContextStore
+
+
+def _add(store, data, filename="doc.txt"):
+    tmp = store.incoming_path()
+    tmp.write_bytes(data)
+    return store.add(tmp, hashlib.sha256(data).hexdigest(), len(data), filename, ".txt", "")
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    store = ContextStore(tmp_path)
+    first = _add(store, b"hello")
+    second = _add(store, b"hello", "copy.txt")
+    assert second["deduplicated"] and not first["deduplicated"]
+    assert store.stats() == {"references": 2, "objects": 1, "object_bytes": 5}
+    assert list(store.incoming_dir.iterdir()) == []
+
+
+def test_object_removed_with_last_reference(tmp_path):
+    store = ContextStore(tmp_path)
+    first = _add(store, b"hello")
+    second = _add(store, b"hello")
+    object_path = store.object_path(first["sha256"])
+    # Derived files next to the object go with it
+    object_path.with_name(object_path.name + ".txt").write_text("extracted")
+
+    assert store.delete(first["context_id"])
+    assert object_path.exists()
+    assert store.delete(second["context_id"])
+    assert list(object_path.parent.iterdir()) == []
+    assert not store.delete(second["context_id"])
+
+
+def test_rejects_unsafe_context_ids(tmp_path):
+    store = ContextStore(tmp_path)
+    assert store.get("../secrets") is None
+    assert not store.delete("../../etc")
+
+
+def test_loose_files_are_migrated(tmp_path):
+    (tmp_path / "1234-abcd.txt").write_bytes(b"legacy")
+    store = ContextStore(tmp_path)
+    ref = store.get("1234-abcd")
+    assert ref["sha256"] == hashlib.sha256(b"legacy").hexdigest()
+    assert store.object_path(ref["sha256"]).read_bytes() == b"legacy"
+    assert not (tmp_path / "1234-abcd.txt").exists()
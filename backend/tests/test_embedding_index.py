@@ -0,0 +1,119 @@
+import time
+import numpy as np
+from chunking import chunk_text
+from context_indexer import ContextIndexer
+from embedding_index import EmbeddingIndex
+from extraction import text_path_for
+
+
+def _vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def test_chunks_overlap_and_cover_text():
+    text = "\n\n".join(f"Paragraph {i} " + "word " * 40 for i in range(20))
+    chunks = chunk_text(text, max_chars=300, overlap=50)
+    assert all(len(c.text) <= 300 for c in chunks)
+    assert chunks[0].start == 0
+    assert chunks[-1].start + len(chunks[-1].text) == len(text)
+    for prev, cur in zip(chunks, chunks[1:]):
+        assert cur.start < prev.start + len(prev.text)
+
+
+def test_search_finds_nearest_and_skips_deleted(tmp_path):
+    index = EmbeddingIndex(tmp_path, model="test")
+    a, b = _vectors(3, seed=1), _vectors(2, seed=2)
+    index.add("a", a)
+    index.add("b", b)
+    assert index.search(b[1], k=1) == [("b", 1, index.search(b[1], k=1)[0][2])]
+    assert index.search(a[0], k=1, doc_keys=["b"])[0][0] == "b"
+
+    index.delete("b")
+    assert {doc for doc, _, _ in index.search(b[1], k=5)} == {"a"}
+    assert index.stats()["tombstones"] == 2
+
+
+def test_index_persists_and_resets_for_new_model(tmp_path):
+    index = EmbeddingIndex(tmp_path, model="test")
+    vectors = _vectors(2000)
+    index.add("doc", vectors)
+    index.close()
+
+    reopened = EmbeddingIndex(tmp_path, model="test")
+    assert reopened.search(vectors[1500], k=1)[0][:2] == ("doc", 1500)
+    reopened.close()
+    assert EmbeddingIndex(tmp_path, model="other").stats()["vectors"] == 0
+
+
+def test_compact_drops_tombstones(tmp_path):
+    index = EmbeddingIndex(tmp_path, model="test")
+    for i in range(5):
+        index.add(f"d{i}", _vectors(400, seed=i))
+    keep = _vectors(400, seed=4)
+    for i in range(4):
+        index.delete(f"d{i}")
+    assert index.stats()["tombstones"] < 1600
+    index.compact()
+    assert index.stats() == {"documents": 1, "vectors": 400, "tombstones": 0, "dim": 16, "coarse_lists": 0}
+    assert index.search(keep[7], k=1)[0][:2] == ("d4", 7)
+
+
+def test_coarse_index_returns_exact_neighbour(tmp_path):
+    index = EmbeddingIndex(tmp_path, model="test", ivf_threshold=1000, nprobe=4)
+    vectors = _vectors(4000, dim=32)
+    for i in range(4):
+        index.add(f"d{i}", vectors[i * 1000:(i + 1) * 1000])
+    assert index.search(vectors[2345], k=1)[0][:2] == ("d2", 345)
+    assert index.stats()["coarse_lists"] > 1
+    index.add("new", _vectors(1, dim=32, seed=9))
+    assert index.search(_vectors(1, dim=32, seed=9)[0], k=1)[0][0] == "new"
+
+
+class FakeEmbedder:
+    name = "fake"
+
+    def embed(self, texts):
+        # Bag of words hashed into 64 dimensions
+        out = np.zeros((len(texts), 64), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                out[row, hash(word) % 64] += 1
+        return out
+
+    def close(self):
+        pass
+
+
+def test_indexer_chunks_embeds_and_searches(tmp_path):
+    source = tmp_path / "abc123"
+    source.write_bytes(b"")
+    text_path_for(source).write_text("apples and pears\n\n" + "filler text " * 30 + "\n\nquarterly revenue report")
+    indexer = ContextIndexer(tmp_path / "index", lambda key: tmp_path / key, FakeEmbedder(), chunk_chars=80, chunk_overlap=0)
+    indexer.submit(source)
+    for _ in range(100):
+        if indexer.status("abc123")["status"] == "indexed":
+            break
+        time.sleep(0.02)
+    assert indexer.status("abc123")["embedded"]
+
+    hits = indexer.semantic_search("quarterly revenue", k=1)
+    assert "quarterly revenue" in hits[0]["text"]
+    indexer.remove("abc123")
+    assert indexer.semantic_search("quarterly revenue") == []
+    indexer.shutdown()
+
+
+def test_lexical_index_updates_in_place(tmp_path):
+    from lexical_index import LexicalIndex
+    index = LexicalIndex(tmp_path / "lexical.db")
+    index.add("a", ["quarterly report for ACME", "nothing relevant"])
+    index.add("b", ["ACME ACME ACME anvils", "report on anvils"])
+    assert [hit[0] for hit in index.search('"quarterly report"')] == ["a"]
+    assert index.search("anvils", doc_keys=["a"]) == []
+
+    index.add("a", ["replaced text"])
+    assert index.search("quarterly") == []
+    assert index.delete("b") and not index.delete("b")
+    assert index.stats() == {"documents": 1, "chunks": 1}
+    assert index.search("*** ()") == []
+    index.close()
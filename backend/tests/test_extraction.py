@@ -0,0 +1,93 @@
+import importlib.util
+import os
+import signal
+import time
+import pytest
+from extraction import TextExtractor, read_text, stats_path_for, text_path_for
+
+
+def _wait(extractor, source, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = extractor.status(source)
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("extraction did not finish")
+
+
+@pytest.fixture
+def extractor():
+    extractor = TextExtractor(max_workers=1)
+    yield extractor
+    extractor.shutdown()
+
+
+def test_text_file_is_extracted_in_worker(tmp_path, extractor):
+    source = tmp_path / "object"
+    source.write_text("first line\nsecond line")
+    assert extractor.submit(source, ".txt")["status"] == "pending"
+
+    job = _wait(extractor, source)
+    assert job["status"] == "completed"
+    assert (job["pages_done"], job["pages_total"]) == (1, 1)
+    assert job["text_preview"].startswith("first line")
+    assert read_text(source).startswith("first line\nsecond line")
+
+
+def test_already_extracted_file_completes_immediately(tmp_path, extractor):
+    source = tmp_path / "object"
+    source.write_bytes(b"%PDF-")
+    text_path_for(source).write_text("cached text")
+    assert extractor.submit(source, ".pdf")["status"] == "completed"
+    # No worker process was needed
+    assert extractor._executor is None
+
+
+def test_character_count_survives_restart(tmp_path):
+    source = tmp_path / "object"
+    source.write_text("naïve café ✓", encoding="utf-8")
+    first = TextExtractor(max_workers=1)
+    try:
+        first.submit(source, ".txt")
+        fresh = _wait(first, source)
+    finally:
+        first.shutdown()
+    assert fresh["chars"] == len("naïve café ✓\n")
+
+    restarted = TextExtractor(max_workers=1)
+    assert restarted.status(source)["chars"] == fresh["chars"]
+    # Text extracted before counts were stored is counted in characters, not bytes
+    stats_path_for(source).unlink()
+    assert TextExtractor(max_workers=1).submit(source, ".txt")["chars"] == fresh["chars"]
+
+
+@pytest.mark.skipif(importlib.util.find_spec("pypdf") is not None, reason="pypdf is installed")
+def test_missing_parser_fails_job(tmp_path, extractor):
+    source = tmp_path / "object"
+    source.write_bytes(b"%PDF-1.4")
+    extractor.submit(source, ".pdf")
+    job = _wait(extractor, source)
+    assert job["status"] == "failed"
+    assert "pypdf" in job["error"]
+    assert not text_path_for(source).exists()
+
+
+def test_dead_worker_is_replaced(tmp_path, extractor):
+    first = tmp_path / "first"
+    first.write_text("before")
+    extractor.submit(first, ".txt")
+    _wait(extractor, first)
+
+    broken = extractor._executor
+    for process in list(broken._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+    deadline = time.monotonic() + 30
+    while not broken._broken and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    second = tmp_path / "second"
+    second.write_text("after")
+    extractor.submit(second, ".txt")
+    assert _wait(extractor, second)["status"] == "completed"
+    assert extractor._executor is not broken
@@ -0,0 +1,32 @@
+from fastapi.testclient import TestClient
+import main
+from dependencies import set_llm_runner
+
+
+client = TestClient(main.app)
+
+
+def test_health_reports_process_uptime_from_sampler():
+    set_llm_runner(None)
+    resp = client.get("/api/health")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["status"] == "degraded"
+    # Process uptime, not the boot timestamp
+    assert 0 <= body["uptime"] < 24 * 3600
+    assert "process_rss_mb" in body["system_info"]
+
+
+def test_liveness_and_readiness_split():
+    set_llm_runner(None)
+    assert client.get("/api/health/live").json() == {"status": "alive"}
+    resp = client.get("/api/health/ready")
+    assert resp.status_code == 503
+    assert resp.json()["status"] == "degraded"
+
+    class ReadyRunner:
+        is_initialized = True
+    set_llm_runner(ReadyRunner())
+    resp = client.get("/api/health/ready")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "ready"
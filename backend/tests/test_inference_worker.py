@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import pytest
+from inference_worker import InferenceWorker, QueueFullError
+
+
+def test_jobs_run_on_single_worker_thread():
+    worker = InferenceWorker(max_queue_depth=4)
+
+    async def main():
+        return await asyncio.gather(*[worker.run(threading.get_ident) for _ in range(3)])
+
+    idents = asyncio.run(main())
+    worker.shutdown()
+    assert len(set(idents)) == 1
+    assert idents[0] != threading.get_ident()
+
+
+def test_rejects_when_queue_full():
+    worker = InferenceWorker(max_queue_depth=1)
+    release = threading.Event()
+
+    async def main():
+        running = worker.submit(release.wait)
+        while not worker.busy:
+            await asyncio.sleep(0.01)
+        waiting = worker.submit(lambda: "queued")
+        with pytest.raises(QueueFullError) as exc:
+            worker.submit(lambda: "rejected")
+        assert exc.value.retry_after >= 1
+        release.set()
+        return await running, await waiting
+
+    assert asyncio.run(main()) == (True, "queued")
+    worker.shutdown()
+
+
+def test_interactive_jobs_overtake_batch_jobs():
+    from inference_worker import PRIORITY_BATCH
+    worker = InferenceWorker(max_queue_depth=4)
+    release = threading.Event()
+    order = []
+
+    async def main():
+        running = worker.submit(release.wait)
+        while not worker.busy:
+            await asyncio.sleep(0.01)
+        jobs = [
+            worker.submit(order.append, "batch-1", priority=PRIORITY_BATCH),
+            worker.submit(order.append, "batch-2", priority=PRIORITY_BATCH),
+            worker.submit(order.append, "interactive"),
+        ]
+        release.set()
+        await asyncio.gather(running, *jobs)
+
+    asyncio.run(main())
+    worker.shutdown()
+    assert order == ["interactive", "batch-1", "batch-2"]
@@ -0,0 +1,47 @@
+import random
+from fastapi.testclient import TestClient
+import main
+from loadtest import LatencyHistogram, arrival_offsets, multipart_body, parse_mix
+
+
+def test_histogram_percentiles_within_one_percent():
+    rng = random.Random(1)
+    values = [rng.lognormvariate(-2, 1) for _ in range(5000)]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    ordered = sorted(values)
+    for pct in (50, 90, 99):
+        exact = ordered[int(pct / 100 * len(ordered)) - 1] * 1000
+        assert abs(histogram.percentile_ms(pct) - exact) <= exact * 0.01 + 0.001
+    assert histogram.percentile_ms(100) == int(max(values) * 1_000_000) / 1000
+
+    other = LatencyHistogram()
+    other.record(10.0)
+    histogram.merge(other)
+    assert histogram.total == 5001 and histogram.percentile_ms(100) == 10000.0
+    rows = histogram.distribution()
+    assert rows[0][1] == 0 and rows[-1][1] == 100 and rows[-1][2] == 5001
+
+
+def test_arrival_patterns_keep_the_mean_rate():
+    rng = random.Random(0)
+    poisson = arrival_offsets("poisson", 50, 20, 1, rng)
+    assert 900 < len(poisson) < 1100
+    assert poisson == sorted(poisson) and poisson[-1] < 20
+
+    bursts = arrival_offsets("burst", 10, 2, 5, rng)
+    assert len(bursts) == 20 and bursts[:5] == [0.0] * 5 and bursts[5] == 0.5
+
+
+def test_mix_weights_are_normalized():
+    assert parse_mix("generate=3,health=1") == {"generate": 0.75, "health": 0.25}
+
+
+def test_multipart_body_is_accepted_by_upload(monkeypatch, tmp_path):
+    import routes.context
+    monkeypatch.setattr(routes.context, "CONTEXT_DIR", tmp_path)
+    body, content_type = multipart_body("file", "notes.txt", b"load test", "text/plain")
+    resp = TestClient(main.app).post("/api/context/upload", content=body, headers={"Content-Type": content_type})
+    assert resp.status_code == 200
+    assert resp.json()["metadata"]["filename"] == "notes.txt"
@@ -0,0 +1,72 @@
+from fastapi.testclient import TestClient
+import main
+from metrics import Counter, Histogram
+
+
+client = TestClient(main.app)
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = Histogram("test_latency_seconds", "Test latency", ("route",), buckets=(0.1, 1.0))
+    hist.observe(0.05, route="/x")
+    hist.observe(0.5, route="/x")
+    text = "\n".join(hist.render())
+    assert 'test_latency_seconds_bucket{route="/x",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{route="/x",le="1"} 2' in text
+    assert 'test_latency_seconds_bucket{route="/x",le="+Inf"} 2' in text
+    assert 'test_latency_seconds_count{route="/x"} 2' in text
+
+
+def test_counter_escapes_label_values():
+    counter = Counter("test_total", "Test", ("route",))
+    counter.inc(route='a"b')
+    assert 'test_total{route="a\\"b"} 1' in counter.render()
+
+
+def test_metrics_endpoint_counts_requests_by_route():
+    client.get("/api/health/simple")
+    resp = client.get("/api/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert 'monad_http_requests_total{route="/api/health/simple",method="GET",status="200"}' in resp.text
+    assert "# TYPE monad_queue_depth gauge" in resp.text
+
+
+def test_gauges_and_session_delete_cover_every_loaded_model(tmp_path):
+    from dependencies import set_llm_runner, set_model_registry
+    from model_registry import ModelRegistry
+
+    class Sessions:
+        def __init__(self, ids):
+            self.ids = set(ids)
+        def delete(self, session_id):
+            found = session_id in self.ids
+            self.ids.discard(session_id)
+            return found
+        def stats(self):
+            return {"resident": len(self.ids), "resident_bytes": 0}
+
+    class Runner:
+        def __init__(self, path, session_ids=()):
+            self.model_path = str(path)
+            self.is_initialized = True
+            self.worker = None
+            self.response_cache = None
+            self.sessions = Sessions(session_ids)
+
+    default = Runner(tmp_path / "main.gguf")
+    other = Runner(tmp_path / "small.gguf", ["chat-1"])
+    registry = ModelRegistry(tmp_path, default.model_path, 10_000)
+    registry.register(default)
+    registry.register(other)
+    set_llm_runner(default)
+    set_model_registry(registry)
+    try:
+        text = client.get("/api/metrics").text
+        assert 'monad_model_loaded{model="small"} 1' in text
+        assert 'monad_cache_entries{model="small",cache="sessions",tier="memory"} 1' in text
+        assert client.delete("/api/generate/sessions/chat-1").status_code == 200
+        assert client.delete("/api/generate/sessions/chat-1").status_code == 404
+    finally:
+        set_llm_runner(None)
+        set_model_registry(None)
@@ -0,0 +1,203 @@
+import asyncio
+import pytest
+from dependencies import get_llm_runner, set_llm_runner
+from inference_worker import InferenceWorker
+from model_registry import ModelBudgetError, ModelNotFoundError, ModelRegistry
+from stub_llm import create_stub_runner
+
+
+class FakeRunner:
+    def __init__(self, model_path, worker=None):
+        self.model_path = model_path
+        self.worker = worker
+        self.is_initialized = False
+        self.is_initializing = False
+        self.boot_phase = "not_started"
+        self.last_error = None
+        self.cleaned_up = False
+
+    def mark_booting(self):
+        self.is_initializing = True
+        self.boot_phase = "queued"
+
+    async def initialize(self):
+        self.is_initialized = True
+        self.is_initializing = False
+        self.boot_phase = "ready"
+
+    async def cleanup(self):
+        self.cleaned_up = True
+        self.is_initialized = False
+
+
+def _models(tmp_path, *names, size=100):
+    for name in names:
+        (tmp_path / f"{name}.gguf").write_bytes(b"\0" * size)
+
+
+def _registry(tmp_path, budget):
+    registry = ModelRegistry(tmp_path, str(tmp_path / "main.gguf"), budget, runner_factory=FakeRunner)
+    default = FakeRunner(str(tmp_path / "main.gguf"))
+    default.is_initialized = True
+    registry.register(default)
+    return registry, default
+
+
+def test_discovers_gguf_files(tmp_path):
+    _models(tmp_path, "main", "small")
+    (tmp_path / "notes.txt").write_text("not a model")
+    registry, _ = _registry(tmp_path, 10_000)
+
+    models = {m["name"]: m for m in registry.list_models()}
+    assert set(models) == {"main", "small"}
+    assert models["main"]["default"] and models["main"]["resident"]
+    assert models["small"]["status"] == "unloaded"
+    with pytest.raises(ModelNotFoundError):
+        registry.acquire("../main")
+
+
+def test_loading_evicts_least_recently_used_model(tmp_path):
+    _models(tmp_path, "main", "a", "b", "c")
+    # Room for three models of ~110 bytes each
+    registry, default = _registry(tmp_path, 340)
+
+    async def main():
+        a = registry.acquire("a")
+        b = registry.acquire("b")
+        await asyncio.sleep(0)
+        registry.acquire("a")  # a is now more recently used than b
+        c = registry.acquire("c")
+        await asyncio.sleep(0.01)
+        return a, b, c
+
+    a, b, c = asyncio.run(main())
+    assert b.cleaned_up and not a.cleaned_up and not default.cleaned_up
+    assert c.is_initialized
+    assert registry.stats()["resident"] == ["main", "a", "c"]
+
+
+def test_held_model_is_not_evicted_until_released(tmp_path):
+    _models(tmp_path, "main", "a", "b")
+    # Room for two models of ~110 bytes each
+    registry, _ = _registry(tmp_path, 230)
+
+    async def main():
+        a = registry.acquire("a")
+        await asyncio.sleep(0)
+        registry.hold(a)
+        with pytest.raises(ModelBudgetError):
+            registry.acquire("b")
+        unloading = asyncio.create_task(registry.unload("a"))
+        await asyncio.sleep(0.01)
+        assert not a.cleaned_up
+        registry.release(a)
+        await unloading
+        return a
+
+    assert asyncio.run(main()).cleaned_up
+
+
+def test_model_over_budget_is_rejected(tmp_path):
+    _models(tmp_path, "main")
+    _models(tmp_path, "huge", size=1000)
+    registry, _ = _registry(tmp_path, 500)
+
+    async def main():
+        registry.acquire("huge")
+
+    with pytest.raises(ModelBudgetError):
+        asyncio.run(main())
+    assert registry.get("huge") is None
+
+
+def test_activate_swaps_default_once_loaded(tmp_path):
+    _models(tmp_path, "main", "small")
+    registry, default = _registry(tmp_path, 10_000)
+    set_llm_runner(default)
+
+    async def main():
+        runner = registry.activate("small")
+        assert get_llm_runner() is default
+        await asyncio.sleep(0.01)
+        return runner
+
+    runner = asyncio.run(main())
+    assert get_llm_runner() is runner
+    assert registry.default_name == "small"
+    set_llm_runner(None)
+
+
+def test_unload_refuses_default_model(tmp_path):
+    _models(tmp_path, "main")
+    registry, _ = _registry(tmp_path, 10_000)
+    with pytest.raises(ValueError):
+        asyncio.run(registry.unload("main"))
+
+
+def test_runners_share_one_inference_thread(tmp_path):
+    _models(tmp_path, "main", "small")
+    worker = InferenceWorker(max_queue_depth=1)
+    registry = ModelRegistry(tmp_path, str(tmp_path / "main.gguf"), 10_000, runner_factory=FakeRunner, worker=worker)
+    registry.register(FakeRunner(str(tmp_path / "main.gguf"), worker=worker))
+
+    async def main():
+        runner = registry.acquire("small")
+        await registry.shutdown()
+        return runner
+
+    assert asyncio.run(main()).worker is worker
+    with pytest.raises(RuntimeError):
+        asyncio.run(worker.run(lambda: "late"))
+
+
+def test_unloading_one_runner_keeps_shared_thread_serving_others():
+    worker = InferenceWorker(max_queue_depth=4)
+    old = create_stub_runner(1e6, 1e4, worker=worker)
+    new = create_stub_runner(1e6, 1e4, worker=worker)
+
+    async def main():
+        pending = asyncio.create_task(old.generate_response("hi", max_tokens=4, use_cache=False))
+        await asyncio.sleep(0)
+        await old.cleanup()
+        assert pending.done() and not old.is_initialized
+        result = await new.generate_response("hi", max_tokens=2, use_cache=False)
+        worker.shutdown()
+        return (await pending), result
+
+    finished, result = asyncio.run(main())
+    assert finished["metadata"]["tokens_generated"] == 4
+    assert result["metadata"]["tokens_generated"] == 2
+
+
+def test_shut_down_worker_refuses_new_jobs():
+    worker = InferenceWorker(max_queue_depth=4)
+
+    async def main():
+        assert await worker.run(lambda: "done") == "done"
+        worker.shutdown()
+        with pytest.raises(RuntimeError):
+            worker.submit(lambda: "late")
+
+    asyncio.run(main())
+
+
+def test_draft_model_counts_toward_each_model_budget(tmp_path, monkeypatch):
+    from config import Config
+
+    _models(tmp_path, "main", "a")
+    draft = tmp_path / "drafts" / "draft.gguf"
+    draft.parent.mkdir()
+    draft.write_bytes(b"\0" * 100)
+    registry, _ = _registry(tmp_path, 300)
+    assert registry.estimated_bytes(tmp_path / "a.gguf") == 110
+
+    # Every loaded model keeps its own copy of the draft model
+    monkeypatch.setattr(Config, "SPECULATIVE_DECODING", "draft_model")
+    monkeypatch.setattr(Config, "DRAFT_MODEL_PATH", str(draft))
+    assert registry.estimated_bytes(tmp_path / "a.gguf") == 220
+
+    async def main():
+        registry.acquire("a")
+
+    with pytest.raises(ModelBudgetError):
+        asyncio.run(main())
@@ -0,0 +1,15 @@
+from prompt_cache import PromptStateCache
+
+
+def test_snapshot_round_trip(tmp_path):
+    cache = PromptStateCache(tmp_path, "ab" * 32, n_ctx=4096)
+    assert cache.load("prefix") is None
+    cache.store("prefix", {"tokens": [1, 2, 3]})
+    assert cache.load("prefix") == {"tokens": [1, 2, 3]}
+
+
+def test_snapshot_keyed_by_model_and_context(tmp_path):
+    cache = PromptStateCache(tmp_path, "ab" * 32, n_ctx=4096)
+    cache.store("prefix", {"tokens": [1]})
+    assert PromptStateCache(tmp_path, "cd" * 32, n_ctx=4096).load("prefix") is None
+    assert PromptStateCache(tmp_path, "ab" * 32, n_ctx=8192).load("prefix") is None
@@ -0,0 +1,94 @@
+import time
+from response_cache import ResponseCache, cache_key, is_deterministic
+
+
+def make_cache(tmp_path, **overrides):
+    options = {"max_entries": 8, "max_bytes": 1024 * 1024, "max_age_seconds": 3600}
+    options.update(overrides)
+    return ResponseCache(tmp_path, **options)
+
+
+def test_only_deterministic_params_are_cacheable():
+    assert is_deterministic({"temperature": 0, "seed": None})
+    assert is_deterministic({"temperature": 0.7, "seed": 42})
+    assert not is_deterministic({"temperature": 0.7, "seed": None})
+
+
+def test_key_covers_prompt_and_params():
+    base = cache_key("model", "prompt", {"temperature": 0}, ["</s>"])
+    assert base == cache_key("model", "prompt", {"temperature": 0}, ["</s>"])
+    assert base != cache_key("model", "prompt", {"temperature": 0, "top_p": 0.5}, ["</s>"])
+    assert base != cache_key("other", "prompt", {"temperature": 0}, ["</s>"])
+
+
+def test_hit_survives_restart(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get("k") is None
+    cache.put("k", {"response": "4", "metadata": {}})
+    assert cache.get("k")["response"] == "4"
+
+    reopened = make_cache(tmp_path)
+    assert reopened.get("k")["response"] == "4"
+    assert reopened.stats()["hits"] == 1
+
+
+def test_expired_entries_miss(tmp_path):
+    cache = make_cache(tmp_path, max_age_seconds=0)
+    cache.put("k", {"response": "old", "metadata": {}})
+    time.sleep(0.01)
+    assert cache.get("k") is None
+    assert cache.stats()["disk_entries"] == 0
+
+
+def test_disk_size_limit_evicts_least_recent(tmp_path):
+    cache = make_cache(tmp_path, max_entries=1, max_bytes=300)
+    for key in ["a", "b", "c"]:
+        cache.put(key, {"response": key * 50, "metadata": {}})
+    stats = cache.stats()
+    assert stats["evictions"] >= 1
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+
+
+def test_memory_tier_is_not_changed_by_caller(tmp_path):
+    cache = make_cache(tmp_path)
+    result = {"response": "4", "metadata": {}}
+    cache.put("k", result)
+    result["metadata"]["context"] = {"used_chunks": 3}
+    assert cache.get("k")["metadata"] == {}
+    assert make_cache(tmp_path).get("k")["metadata"] == {}
+
+
+def test_loaded_models_share_one_cache(monkeypatch, tmp_path):
+    import asyncio
+    import dependencies
+    import llm_runner
+    from config import Config
+    from inference_worker import InferenceWorker
+    from stub_llm import StubLlama
+
+    monkeypatch.setattr(dependencies, "get_data_dir", lambda: tmp_path)
+    monkeypatch.setattr(llm_runner, "get_data_dir", lambda: tmp_path)
+    monkeypatch.setattr(dependencies, "_response_cache", None)
+    monkeypatch.setattr(Config, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(Config, "PROMPT_CACHE_ENABLED", False)
+    monkeypatch.setattr(llm_runner.LLMRunner, "_load_model", lambda runner: StubLlama(1e6, 1e6))
+    for name in ("a", "b"):
+        (tmp_path / f"{name}.gguf").write_bytes(b"GGUF")
+
+    async def run():
+        worker = InferenceWorker(max_queue_depth=4)
+        runners = [llm_runner.LLMRunner(str(tmp_path / f"{name}.gguf"), worker=worker) for name in ("a", "b")]
+        try:
+            for runner in runners:
+                await runner.initialize(max_retries=1)
+            return [runner.response_cache for runner in runners]
+        finally:
+            for runner in runners:
+                await runner.cleanup()
+            worker.shutdown()
+
+    first, second = asyncio.run(run())
+    # One disk limit and LRU for every model
+    assert first is second
+    assert first.cache_dir == tmp_path / "response_cache"
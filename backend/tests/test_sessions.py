@@ -0,0 +1,31 @@
+from sessions import Session, SessionStore
+
+
+class FakeState:
+    def __init__(self, size):
+        self.llama_state_size = size
+
+
+def test_lru_session_spills_and_reloads(tmp_path):
+    store = SessionStore(tmp_path, memory_budget_bytes=150, model_fingerprint="f" * 64)
+    store.put(Session("a", turns=[("User: hi\nAssistant:", "hello")], tokens=[1, 2], state=FakeState(100)))
+    store.put(Session("b", state=FakeState(100)))
+
+    stats = store.stats()
+    assert stats["resident"] == 1
+    assert stats["spills"] == 1
+
+    reloaded = store.get("a")
+    assert reloaded.turns == [("User: hi\nAssistant:", "hello")]
+    assert reloaded.tokens == [1, 2]
+    assert reloaded.state.llama_state_size == 100
+    assert store.stats()["reloads"] == 1
+
+
+def test_delete_removes_spilled_session(tmp_path):
+    store = SessionStore(tmp_path, memory_budget_bytes=0, model_fingerprint="f" * 64)
+    store.put(Session("a", state=FakeState(10)))
+    store.put(Session("b", state=FakeState(10)))
+    assert store.delete("a")
+    assert store.get("a") is None
+    assert not store.delete("missing")
@@ -0,0 +1,76 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from config import Config
+from speculative import DraftSource, PromptLookupDraft, prompt_lookup
+from stub_llm import create_stub_runner
+
+
+def test_prompt_lookup_copies_continuation_and_falls_back():
+    ids = np.array([5, 6, 7, 8, 9, 1, 6, 7], dtype=np.intc)
+    assert prompt_lookup(ids, 2, 3).tolist() == [8, 9, 1]
+    # The bigram 2, 7 never occurred, so the unigram 7 is used
+    ids = np.array([7, 3, 4, 2, 7], dtype=np.intc)
+    assert prompt_lookup(ids, 2, 10).tolist() == [3, 4, 2, 7]
+    assert prompt_lookup(np.array([1, 2, 3], dtype=np.intc), 2, 5).tolist() == []
+
+
+def test_acceptance_is_settled_from_the_next_call():
+    class FixedDraft(DraftSource):
+        def propose(self, input_ids):
+            return np.array([10, 11, 12], dtype=np.intc)
+
+    drafter = FixedDraft(num_pred_tokens=3)
+    drafter.begin()
+    drafter(np.array([1, 2]))
+    # Two drafted tokens accepted, the third replaced by the sampled 99
+    drafter(np.array([1, 2, 10, 11, 99]))
+    # Unverified when generation stops: not counted
+    stats = drafter.finish()
+    assert stats == {
+        "mode": "off",
+        "draft_calls": 2,
+        "drafted_tokens": 3,
+        "accepted_tokens": 2,
+        "acceptance_rate": 0.667
+    }
+    assert drafter.stats()["generations"] == 1
+
+
+def test_runner_reports_acceptance_and_output_is_unchanged():
+    # The stub always generates " word0 word1 ...", which this prompt already contains
+    prompt = "Repeat after me:" + "".join(f" word{i}" for i in range(12))
+
+    async def generate(drafter):
+        runner = create_stub_runner(prefill_tokens_per_second=1e6, decode_tokens_per_second=1e4)
+        runner.drafter = drafter
+        runner.llm.draft_model = drafter
+        try:
+            return await runner.generate_response(prompt, max_tokens=12, temperature=0.0, use_cache=False)
+        finally:
+            await runner.cleanup()
+
+    plain = asyncio.run(generate(None))
+    fast = asyncio.run(generate(PromptLookupDraft(num_pred_tokens=4, ngram_size=2)))
+    assert fast["response"] == plain["response"]
+    assert "speculative" not in plain["metadata"]
+    stats = fast["metadata"]["speculative"]
+    assert stats["mode"] == "prompt_lookup"
+    assert stats["draft_calls"] < 12
+    assert stats["accepted_tokens"] > 0
+    assert stats["accepted_tokens"] <= stats["drafted_tokens"]
+
+
+def test_validate_rejects_unknown_mode(monkeypatch, tmp_path):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    monkeypatch.setattr(Config, "MODEL_PATH", str(model))
+    monkeypatch.setattr(Config, "SPECULATIVE_DECODING", "medusa")
+    with pytest.raises(ValueError):
+        Config.validate()
+    monkeypatch.setattr(Config, "SPECULATIVE_DECODING", "draft_model")
+    monkeypatch.setattr(Config, "DRAFT_MODEL_PATH", str(tmp_path / "missing.gguf"))
+    with pytest.raises(FileNotFoundError):
+        Config.validate()
@@ -0,0 +1,44 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Boots the app with a missing model and reports startup cost from a clean interpreter
+STARTUP_SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+from fastapi.testclient import TestClient
+import main
+numpy_imported = "numpy" in sys.modules
+with TestClient(main.app) as client:
+    ready = time.perf_counter()
+    health = client.get("/api/health").json()
+    simple = client.get("/api/health/simple").status_code
+print(json.dumps({
+    "startup_seconds": main.app.state.startup_seconds,
+    "until_serving": ready - t0,
+    "llama_cpp_imported": "llama_cpp" in sys.modules,
+    "numpy_imported": numpy_imported,
+    "health_status": health["status"],
+    "simple_status": simple,
+}))
+"""
+
+
+def test_server_starts_fast_without_loading_model(tmp_path):
+    env = {"MODEL_PATH": str(tmp_path / "missing.gguf"), "HOME": str(tmp_path), "PATH": ""}
+    out = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert out.returncode == 0, out.stderr
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+
+    assert result["simple_status"] == 200
+    assert result["health_status"] in {"booting", "degraded"}
+    # Model support is only imported once a model is actually loaded
+    assert not result["llama_cpp_imported"]
+    assert not result["numpy_imported"]
+    assert result["startup_seconds"] < 1.0
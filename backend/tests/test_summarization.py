@@ -0,0 +1,83 @@
+import asyncio
+from summarization import Summarizer, SummaryCache, split_by_tokens
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def _document(n, edit=None):
+    paragraphs = [f"Paragraph {i} talks about topic {i * 7} in some detail here." for i in range(n)]
+    if edit is not None:
+        paragraphs[edit] = "This paragraph was rewritten entirely."
+    return "\n\n".join(paragraphs)
+
+
+class SummaryRunner:
+    model_path = "fake.gguf"
+
+    def __init__(self):
+        self.prompts = []
+
+    async def generate_batch(self, items, cancel=None):
+        for index, item in enumerate(items):
+            self.prompts.append(item["prompt"])
+            assert item["temperature"] == 0
+            yield index, {"response": f"summary {len(self.prompts)}" + " word" * 30, "metadata": {"stop_reason": "stop"}}
+
+
+class WordTokenizer:
+    model_path = "fake.gguf"
+
+    def count(self, text):
+        return count_words(text)
+
+
+def _summarize(summarizer, text, runner, doc_key="doc"):
+    async def run():
+        summarizer.start(doc_key, text, runner, WordTokenizer())
+        while summarizer.status(doc_key)["status"] in ("pending", "running"):
+            await asyncio.sleep(0.01)
+        return summarizer.status(doc_key)
+    return asyncio.run(run())
+
+
+def test_chunks_fit_budget_and_realign_after_edit():
+    chunks = split_by_tokens(_document(300), count_words, 200)
+    assert all(count_words(chunk) <= 200 for chunk in chunks)
+    assert "\n\n".join(chunks) == _document(300)
+
+    edited = split_by_tokens(_document(300, edit=40), count_words, 200)
+    # Only chunks around the edit differ
+    assert len(set(edited) - set(chunks)) <= 2
+
+
+def test_long_paragraph_is_split():
+    chunks = split_by_tokens("word " * 1000, count_words, 100)
+    assert len(chunks) >= 10 and all(count_words(chunk) <= 100 for chunk in chunks)
+
+
+def test_map_reduce_reuses_cached_chunk_summaries(tmp_path):
+    summarizer = Summarizer(SummaryCache(tmp_path / "summaries.db"), n_ctx=400, max_tokens=40)
+    runner = SummaryRunner()
+    job = _summarize(summarizer, _document(300), runner)
+    assert job["status"] == "completed" and job["summary"].startswith("summary")
+    assert job["chunks_done"] == job["chunks_total"] > 1
+    # 30-word summaries do not all fit one combining prompt
+    assert job["reduce_level"] >= 2 and job["cached"] == 0
+    first_calls = len(runner.prompts)
+
+    runner.prompts.clear()
+    job = _summarize(summarizer, _document(300, edit=40), runner, doc_key="doc-v2")
+    assert job["status"] == "completed"
+    assert job["cached"] >= job["chunks_total"] - 2
+    assert len(runner.prompts) < first_calls / 2
+
+    assert summarizer.cache.forget("doc") > 0
+    assert summarizer.cache.stats()["summaries"] > 0
+
+
+def test_too_small_context_fails(tmp_path):
+    summarizer = Summarizer(SummaryCache(tmp_path / "summaries.db"), n_ctx=100, max_tokens=40)
+    job = _summarize(summarizer, _document(10), SummaryRunner())
+    assert job["status"] == "failed" and "too small" in job["error"]
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import pytest
+from calibrate import thread_candidates
+from inference_worker import InferenceWorker
+from tuning import load_profile, parse_cpu_list, reserve_cpus, resolve_affinity, save_profile
+
+
+def test_parse_cpu_list():
+    assert parse_cpu_list("0-3,8,10-11") == {0, 1, 2, 3, 8, 10, 11}
+    assert parse_cpu_list("") == set()
+
+
+def test_profile_round_trip(tmp_path):
+    path = tmp_path / "tuning_profile.json"
+    assert load_profile(path) == {}
+    save_profile({"n_threads": 6, "n_batch": 256}, path)
+    assert load_profile(path)["n_threads"] == 6
+
+    path.write_text("{not json")
+    assert load_profile(path) == {}
+
+
+def test_resolve_affinity():
+    profile = {"hardware": {"performance_cpus": [0, 1, 2, 3]}}
+    assert resolve_affinity("", profile) is None
+    assert resolve_affinity("auto", profile) == {0, 1, 2, 3}
+    assert resolve_affinity("auto", {}) is None
+    assert resolve_affinity("4-5", profile) == {4, 5}
+    assert resolve_affinity("0-x", profile) is None
+
+
+def test_thread_candidates_cover_core_types():
+    hardware = {"physical_cores": 8, "logical_cores": 16, "performance_cores": 6}
+    assert thread_candidates(hardware) == [4, 6, 8, 16]
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_getaffinity"), reason="CPU affinity is Linux-only")
+def test_worker_pins_inference_thread():
+    cpus = {min(os.sched_getaffinity(0))}
+    worker = InferenceWorker(max_queue_depth=1, cpu_affinity=cpus)
+
+    async def main():
+        return await worker.run(os.sched_getaffinity, 0)
+
+    assert asyncio.run(main()) == cpus
+    worker.shutdown()
+    # Only the inference thread is pinned
+    assert os.sched_getaffinity(0) != cpus or len(os.sched_getaffinity(0)) == 1
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_getaffinity"), reason="CPU affinity is Linux-only")
+def test_reserve_cpus_moves_other_threads_off_inference_cpus():
+    import subprocess
+    import sys
+
+    cpus = os.sched_getaffinity(0)
+    # Reserving every CPU would leave nothing for request handling
+    assert reserve_cpus(cpus) is None
+    assert os.sched_getaffinity(0) == cpus
+    if len(cpus) < 2:
+        pytest.skip("needs at least two CPUs")
+
+    # In a child process, so the test runner keeps its own affinity
+    reserved = min(cpus)
+    script = (
+        "import os; from tuning import reserve_cpus; "
+        f"others = reserve_cpus({{{reserved}}}); "
+        "print(sorted(others) == sorted(os.sched_getaffinity(0)), "
+        f"all({reserved} not in os.sched_getaffinity(int(task)) for task in os.listdir('/proc/self/task')))"
+    )
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert output.stdout.split() == ["True", "True"]
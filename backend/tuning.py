@@ -0,0 +1,169 @@
+"""
+File: tuning.py
+Purpose: Hardware detection and the machine-specific tuning profile written by calibrate.py
+Privacy: The profile is stored in the local app data directory only.
+"""
+
+import json
+import logging
+import os
+import platform
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from paths import get_app_data_dir
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FILENAME = "tuning_profile.json"
+PROFILE_VERSION = 1
+
+
+def get_profile_path() -> Path:
+    """Location of the tuning profile"""
+    return get_app_data_dir() / PROFILE_FILENAME
+
+
+def load_profile(path: Optional[Path] = None) -> Dict[str, Any]:
+    """Read the tuning profile, or an empty dict if there is no usable one"""
+    path = path or get_profile_path()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Ignoring unreadable tuning profile {path}: {e}")
+        return {}
+    if profile.get("version") != PROFILE_VERSION:
+        return {}
+    return profile
+
+
+def save_profile(profile: Dict[str, Any], path: Optional[Path] = None) -> Path:
+    """Write the tuning profile atomically"""
+    path = path or get_profile_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(profile, version=PROFILE_VERSION), f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def parse_cpu_list(spec: str) -> Set[int]:
+    """Parse a CPU list such as ``0-3,8,10-11``"""
+    cpus: Set[int] = set()
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def performance_cores() -> List[int]:
+    """
+    Logical CPUs belonging to performance cores on hybrid processors
+
+    Linux exposes hybrid Intel P-cores as the ``cpu_core`` PMU; other
+    processors are treated as uniform. Returns an empty list when the
+    split is unknown, including on macOS where threads cannot be pinned.
+    """
+    if platform.system() != "Linux":
+        return []
+    try:
+        spec = Path("/sys/devices/cpu_core/cpus").read_text().strip()
+    except OSError:
+        return []
+    return sorted(parse_cpu_list(spec))
+
+
+def _macos_performance_cores() -> Optional[int]:
+    """Number of Apple Silicon performance cores, if reported"""
+    try:
+        out = subprocess.run(
+            ["sysctl", "-n", "hw.perflevel0.physicalcpu"],
+            capture_output=True, text=True, timeout=2, check=True
+        ).stdout
+        return int(out.strip())
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+
+
+def detect_hardware() -> Dict[str, Any]:
+    """Core counts and memory of this machine"""
+    import psutil
+
+    logical = psutil.cpu_count(logical=True) or os.cpu_count() or 1
+    physical = psutil.cpu_count(logical=False) or logical
+    perf_cpus = performance_cores()
+    if platform.system() == "Darwin":
+        perf_count = _macos_performance_cores()
+    else:
+        perf_count = len(perf_cpus) or None
+    mem = psutil.virtual_memory()
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "physical_cores": physical,
+        "logical_cores": logical,
+        "performance_cores": perf_count,
+        "performance_cpus": perf_cpus,
+        "memory_total_gb": round(mem.total / (1024 ** 3), 1),
+        "memory_available_gb": round(mem.available / (1024 ** 3), 1),
+    }
+
+
+def reserve_cpus(inference_cpus: Set[int]) -> Optional[Set[int]]:
+    """
+    Move every thread of this process off the CPUs reserved for inference
+
+    Called at startup, before the inference thread exists. Threads and
+    processes started later (the event loop's thread pool, extraction
+    workers, the embedding model) inherit the remaining CPUs, while the
+    inference thread pins itself to ``inference_cpus`` and llama.cpp's
+    compute threads inherit that.
+
+    Returns:
+        The CPUs left for everything else, or None if nothing was changed
+        (not supported here, or no CPUs would remain)
+    """
+    try:
+        others = os.sched_getaffinity(0) - inference_cpus
+    except AttributeError:
+        return None
+    if not others:
+        logger.warning("⚠️ INFERENCE_CPU_AFFINITY covers every CPU; request handling shares them with inference")
+        return None
+    for task in os.listdir("/proc/self/task"):
+        try:
+            os.sched_setaffinity(int(task), others)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not move thread {task} off the inference CPUs: {e}")
+    return others
+
+
+def resolve_affinity(setting: str, profile: Dict[str, Any]) -> Optional[Set[int]]:
+    """
+    CPUs the inference thread should be pinned to
+
+    ``setting`` is empty (no pinning), ``auto`` (the performance cores
+    recorded in the tuning profile) or an explicit CPU list. A malformed
+    list is logged and ignored, so a typo never stops the backend starting.
+    """
+    setting = setting.strip().lower()
+    if not setting:
+        return None
+    if setting == "auto":
+        cpus = profile.get("hardware", {}).get("performance_cpus") or []
+        return set(cpus) or None
+    try:
+        return parse_cpu_list(setting) or None
+    except ValueError:
+        logger.warning(f"⚠️ Ignoring invalid INFERENCE_CPU_AFFINITY {setting!r}; inference thread will not be pinned")
+        return None
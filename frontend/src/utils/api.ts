@@ -39,12 +39,13 @@ export async function generateText(prompt: string): Promise<string> {
 }
 
 // ✅ Send message (alias for generateText)
-export async function sendMessage(prompt: string): Promise<string> {
+// Pass a sessionId to continue a conversation server-side instead of resending history
+export async function sendMessage(prompt: string, sessionId?: string): Promise<string> {
   try {
     const res = await fetch(`${API_BASE}/api/generate`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ prompt }),
+      body: JSON.stringify(sessionId ? { prompt, session_id: sessionId } : { prompt }),
     });
 
     if (!res.ok) throw new Error(`HTTP ${res.status}`);